@@ -0,0 +1,90 @@
+"""Local stand-in for Azure AD: an RSA keypair, its JWKS and signed tokens
+
+The JWKS is written to a file which main.config picks up through JWKS_URI, so
+the benchmarks exercise the real validate_key/validate_payload path without a
+network connection.
+"""
+
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from typing import Dict
+import base64
+import json
+import os
+import tempfile
+import time
+
+# Other
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwt
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+
+def _b64_uint(value: int) -> str:
+    data = value.to_bytes((value.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+class LocalKeys:
+    """Signs access tokens with a freshly generated RS256 key"""
+
+    def __init__(self, kid: str = "benchmark"):
+        self.kid = kid
+
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self._pem = private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+        self._public_numbers = private_key.public_key().public_numbers()
+
+    def jwks(self) -> Dict:
+        """The JSON Web Key Set holding the public key"""
+        return {
+            "keys": [
+                {
+                    "kty": "RSA",
+                    "kid": self.kid,
+                    "use": "sig",
+                    "n": _b64_uint(self._public_numbers.n),
+                    "e": _b64_uint(self._public_numbers.e),
+                }
+            ]
+        }
+
+    def write_jwks(self) -> str:
+        """Writes the JWKS to a temporary file
+
+        Returns:
+            str: the path, to use as JWKS_URI
+        """
+        handle, path = tempfile.mkstemp(prefix="moshi-jwks-", suffix=".json")
+        with os.fdopen(handle, "w", encoding="utf-8") as jwks_file:
+            json.dump(self.jwks(), jwks_file)
+        return path
+
+    def token(self, sub: str, audience: str, ttl: int = 3600) -> str:
+        """Creates an access token like the ones Azure AD issues
+
+        Args:
+            sub (str): the user, becomes User.username
+            audience (str): must match AZ_CLIENT_ID
+            ttl (int, optional): seconds until the token expires
+
+        Returns:
+            str: the JWT
+        """
+        return jwt.encode(
+            {"sub": sub, "aud": audience, "exp": int(time.time()) + ttl},
+            self._pem,
+            algorithm="RS256",
+            headers={"kid": self.kid},
+        )
@@ -0,0 +1,237 @@
+"""Measures concurrent request throughput with a blocking vs an async driver
+
+"blocking" reproduces the old data path, where each database call blocked the
+event loop, by serving the routes from a synchronous client. "async" uses the
+app's own async client. Run against a local mongod with --backend mongo, or
+against the in-memory stand-in with a simulated per-operation --latency-ms.
+
+    python -m benchmarks.concurrency --backend memory --latency-ms 5
+    python -m benchmarks.concurrency --backend mongo --uri mongodb://localhost \
+        --latency-ms 0
+"""
+
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from contextlib import asynccontextmanager
+from typing import Dict, List
+import argparse
+import asyncio
+import json
+import time
+
+# Module
+from benchmarks.harness import call, configure_environment, summarise
+
+# ----------------------------------------------------------------------------
+# Database wrappers
+# ----------------------------------------------------------------------------
+
+
+class _BlockingCursor:
+    """Async cursor interface over a synchronous cursor"""
+
+    def __init__(self, cursor, delay: float):
+        self._cursor = cursor
+        self._delay = delay
+
+    async def to_list(self, length=None):  # pylint: disable=unused-argument
+        time.sleep(self._delay)
+        return list(self._cursor)
+
+
+class _BlockingCollection:
+    """Async collection interface which blocks the event loop on every call"""
+
+    def __init__(self, collection, delay: float):
+        self._collection = collection
+        self._delay = delay
+
+    def find(self, *args, **kwargs):
+        return _BlockingCursor(self._collection.find(*args, **kwargs), self._delay)
+
+    def __getattr__(self, name):
+        method = getattr(self._collection, name)
+
+        async def run(*args, **kwargs):
+            time.sleep(self._delay)
+            return method(*args, **kwargs)
+
+        return run
+
+
+class _DelayedCursor:
+    """Async cursor which awaits a simulated network delay"""
+
+    def __init__(self, cursor, delay: float):
+        self._cursor = cursor
+        self._delay = delay
+
+    async def to_list(self, length=None):
+        await asyncio.sleep(self._delay)
+        return await self._cursor.to_list(length=length)
+
+
+class _DelayedCollection:
+    """Async collection which awaits a simulated network delay on every call"""
+
+    def __init__(self, collection, delay: float):
+        self._collection = collection
+        self._delay = delay
+
+    def find(self, *args, **kwargs):
+        return _DelayedCursor(self._collection.find(*args, **kwargs), self._delay)
+
+    def __getattr__(self, name):
+        method = getattr(self._collection, name)
+
+        async def run(*args, **kwargs):
+            await asyncio.sleep(self._delay)
+            return await method(*args, **kwargs)
+
+        return run
+
+
+class WrappedRepository:
+    """Repository whose collections are wrapped by `wrapper`, every read goes
+    to the wrapped database so no session is needed"""
+
+    def __init__(self, repository, database, wrapper, delay: float):
+        self._repository = repository
+        self._database = database
+        self._wrapper = wrapper
+        self._delay = delay
+
+    def __getitem__(self, name):
+        return self._wrapper(self._database[name], self._delay)
+
+    def reads(self, name):
+        return self[name]
+
+    @asynccontextmanager
+    async def session(self):
+        yield None
+
+    def close(self):
+        self._repository.close()
+
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+
+async def run(mode: str, args: argparse.Namespace) -> Dict[str, float]:
+    """Seeds a list then fires concurrent task reads at the app
+
+    Args:
+        mode (str): "blocking" or "async"
+        args (argparse.Namespace): command line arguments
+
+    Returns:
+        Dict[str, float]: throughput and latency summary
+    """
+    # pylint: disable=import-outside-toplevel
+    from main.config import config
+    from main.dependencies.models import User
+    from main.dependencies.user import get_current_user
+    from main.server import app
+
+    username = "benchmark-" + mode
+    app.dependency_overrides[get_current_user] = lambda: User(username=username)
+    await app.router.startup()
+
+    delay = args.latency_ms / 1000
+    if mode == "blocking":
+        if args.backend == "memory":
+            import mongomock
+
+            sync_client = mongomock.MongoClient()
+        else:
+            from pymongo import MongoClient
+
+            sync_client = MongoClient(host=config["ATLAS_URI"])
+        app.repository = WrappedRepository(
+            app.repository, sync_client[config["DB_NAME"]], _BlockingCollection, delay
+        )
+    else:
+        app.repository = WrappedRepository(
+            app.repository, app.repository.database, _DelayedCollection, delay
+        )
+
+    try:
+        # Seed
+        _, body = await call(app, "POST", "/api/v1/lists", body={"name": "Benchmark"})
+        list_id = json.loads(body)["_id"]
+        for i in range(args.tasks):
+            await call(
+                app,
+                "POST",
+                "/api/v1/tasks",
+                body={"task": "Task " + str(i), "list_id": list_id},
+            )
+
+        # Fire the concurrent reads
+        semaphore = asyncio.Semaphore(args.concurrency)
+        latencies: List[float] = []
+
+        async def read():
+            async with semaphore:
+                start = time.perf_counter()
+                status, _ = await call(
+                    app,
+                    "GET",
+                    "/api/v1/tasks",
+                    params={"list_id": list_id, "complete": "false"},
+                )
+                latencies.append(time.perf_counter() - start)
+                assert status == 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*[read() for _ in range(args.requests)])
+        elapsed = time.perf_counter() - start
+
+        # Clean up
+        await call(app, "DELETE", "/api/v1/lists", params={"_id": list_id})
+    finally:
+        await app.router.shutdown()
+        app.dependency_overrides.clear()
+
+    return summarise(latencies, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", maxsplit=1)[0])
+    parser.add_argument("--backend", choices=["memory", "mongo"], default="memory")
+    parser.add_argument("--uri", default=None, help="Mongo URI for --backend mongo")
+    parser.add_argument(
+        "--latency-ms",
+        type=float,
+        default=5.0,
+        help="Simulated latency added to every database call",
+    )
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--tasks", type=int, default=20)
+    args = parser.parse_args()
+
+    configure_environment(args.backend, args.uri)
+
+    results = {mode: asyncio.run(run(mode, args)) for mode in ["blocking", "async"]}
+
+    print(f"{'mode':<10}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for mode, result in results.items():
+        print(
+            f"{mode:<10}{result['throughput_rps']:>10.1f}{result['p50_ms']:>10.2f}"
+            f"{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+        )
+    print(
+        "speed-up: "
+        + f"{results['async']['throughput_rps'] / results['blocking']['throughput_rps']:.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Helpers shared by the benchmarks
+
+Requests are sent straight to the ASGI app in-process so the numbers measure
+the API and the database rather than an HTTP client or the network.
+"""
+
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+import asyncio
+import json
+import os
+import statistics
+
+# ----------------------------------------------------------------------------
+# Set-up
+# ----------------------------------------------------------------------------
+
+
+def configure_environment(
+    db_backend: str, uri: Optional[str] = None, jwks_uri: Optional[str] = None
+) -> None:
+    """Fills in the environment main.config needs, must run before importing
+    main.server
+
+    Args:
+        db_backend (str): "mongo" or "memory"
+        uri (str, optional): the Mongo URI when using "mongo"
+        jwks_uri (str, optional): where to read the signing keys, see
+            benchmarks/auth.py
+    """
+    os.environ["DB_BACKEND"] = db_backend
+    os.environ.setdefault("ATLAS_URI", uri or "mongodb://localhost:27017")
+    if uri is not None:
+        os.environ["ATLAS_URI"] = uri
+    os.environ.setdefault("ATLAS_DB_NAME", "moshi-benchmark")
+    os.environ.setdefault("AZ_TENANT_ID", "benchmark")
+    os.environ.setdefault("AZ_CLIENT_ID", "benchmark")
+    if jwks_uri is not None:
+        os.environ["JWKS_URI"] = jwks_uri
+    # A handful of virtual users make every request, which would soon be
+    # rate limited
+    os.environ.setdefault("RATE_LIMIT_PER_SECOND", "0")
+
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+
+async def call(
+    app,
+    method: str,
+    path: str,
+    params: Optional[Dict] = None,
+    body=None,
+    headers: Optional[Dict[str, str]] = None,
+    response_headers: Optional[Dict[str, str]] = None,
+    first_chunk: bool = False,
+) -> Tuple[int, bytes]:
+    """Sends one request to an ASGI app
+
+    Args:
+        app: the ASGI app
+        method (str): HTTP method
+        path (str): request path
+        params (Dict, optional): query parameters
+        body (optional): JSON body
+        headers (Dict[str, str], optional): extra request headers
+        response_headers (Dict[str, str], optional): filled with the response
+            headers
+        first_chunk (bool, optional): disconnect once the first part of the
+            body arrives, e.g. for event streams which never end
+
+    Returns:
+        Tuple[int, bytes]: status code and response body
+    """
+    payload = b"" if body is None else json.dumps(body).encode()
+    raw_headers = [(b"host", b"benchmark"), (b"content-type", b"application/json")]
+    raw_headers += [
+        (key.lower().encode(), value.encode()) for key, value in (headers or {}).items()
+    ]
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": urlencode(params or {}).encode(),
+        "root_path": "",
+        "headers": raw_headers,
+        "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80),
+    }
+
+    request_sent = False
+    response_done = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        await response_done.wait()
+        return {"type": "http.disconnect"}
+
+    status = 500
+    chunks: List[bytes] = []
+    body_started = asyncio.Event()
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            if response_headers is not None:
+                response_headers.update(
+                    (key.decode(), value.decode())
+                    for key, value in message.get("headers", [])
+                )
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            body_started.set()
+            if not message.get("more_body", False):
+                response_done.set()
+
+    if not first_chunk:
+        await app(scope, receive, send)
+        return status, b"".join(chunks)
+
+    running = asyncio.ensure_future(app(scope, receive, send))
+    waiting = asyncio.ensure_future(body_started.wait())
+    await asyncio.wait([running, waiting], return_when=asyncio.FIRST_COMPLETED)
+    waiting.cancel()
+    # The client goes away, which ends the response
+    response_done.set()
+    await running
+
+    return status, b"".join(chunks)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile
+
+    Args:
+        samples (List[float]): the measurements
+        pct (float): 0-100
+
+    Returns:
+        float: the percentile, 0 if there are no samples
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarise(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    """Summarises latencies (seconds) of requests completed in `elapsed`
+
+    Args:
+        latencies (List[float]): per request latency in seconds
+        elapsed (float): wall clock seconds for all of the requests
+
+    Returns:
+        Dict[str, float]: throughput and latency percentiles in ms
+    """
+    return {
+        "requests": len(latencies),
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "mean_ms": statistics.mean(latencies) * 1000 if latencies else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
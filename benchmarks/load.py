@@ -0,0 +1,494 @@
+"""Drives mixed workloads at every route and reports latency per route
+
+Runs fully offline: tokens are signed with a local key (benchmarks/auth.py)
+and checked by the app's real validation, the database is the in-memory
+stand-in or a local mongod.
+
+* "polling" reads lists, tasks, the overview (with If-None-Match), syncs and
+  opens event streams
+* "burst" creates, updates and moves tasks one by one and in batches
+* "bulk-delete" deletes tasks one by one, in batches and whole lists
+* "mixed" is a blend of the three, plus searches, stats, list deletions,
+  /api/v1/batch and the health and metrics probes
+
+Searching needs Mongo's text index, so it is left out on the memory backend.
+Event streams are timed to their first event. The run fails if any response
+is neither a 2xx nor a 304.
+
+    python -m benchmarks.load --workload mixed --output results.json
+    python -m benchmarks.load --workload mixed --baseline results.json
+    python -m benchmarks.load --backend mongo --uri mongodb://localhost
+"""
+
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+# Module
+from benchmarks.auth import LocalKeys
+from benchmarks.harness import call, configure_environment, summarise
+
+# ----------------------------------------------------------------------------
+# Set-up
+# ----------------------------------------------------------------------------
+
+# Relative weights of the operations in each workload
+WORKLOADS: Dict[str, Dict[str, int]] = {
+    "polling": {
+        "poll_tasks": 50,
+        "poll_lists": 20,
+        "poll_overview": 10,
+        "sync": 15,
+        "events": 5,
+    },
+    "burst": {
+        "create_task": 50,
+        "batch_create": 20,
+        "update_task": 15,
+        "move_task": 15,
+    },
+    "bulk-delete": {
+        "batch_delete": 40,
+        "delete_task": 15,
+        "delete_list": 15,
+        "poll_deletions": 5,
+        "poll_tasks": 25,
+    },
+    "mixed": {
+        "poll_tasks": 30,
+        "poll_lists": 10,
+        "poll_overview": 5,
+        "sync": 8,
+        "events": 2,
+        "search": 3,
+        "create_task": 12,
+        "update_task": 6,
+        "move_task": 5,
+        "delete_task": 3,
+        "batch_create": 4,
+        "batch_delete": 4,
+        "batch": 3,
+        "delete_list": 2,
+        "poll_deletions": 1,
+        "stats": 1,
+        "probe": 1,
+    },
+}
+
+# Operations the memory backend cannot serve
+MEMORY_UNSUPPORTED = {"search"}
+
+# Unauthenticated routes the probe operation calls
+PROBES = ["/healthz", "/readyz", "/metrics"]
+
+# ----------------------------------------------------------------------------
+# Virtual users
+# ----------------------------------------------------------------------------
+
+
+class VirtualUser:
+    """A signed in client with its own lists, tasks and cached ETags"""
+
+    def __init__(self, app, token: str, recorder: "Recorder", rng: random.Random):
+        self.app = app
+        self.headers = {"Authorization": "Bearer " + token}
+        self.recorder = recorder
+        self.rng = rng
+
+        self.list_ids: List[str] = []
+        self.task_ids: Dict[str, List[str]] = {}
+        self.etags: Dict[str, str] = {}
+        self.version = 0
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict] = None,
+        body=None,
+        headers: Optional[Dict[str, str]] = None,
+        response_headers: Optional[Dict[str, str]] = None,
+        first_chunk: bool = False,
+    ) -> Tuple[int, bytes]:
+        start = time.perf_counter()
+        status, content = await call(
+            self.app,
+            method,
+            path,
+            params=params,
+            body=body,
+            headers={**self.headers, **(headers or {})},
+            response_headers=response_headers,
+            first_chunk=first_chunk,
+        )
+        self.recorder.record(method + " " + path, time.perf_counter() - start, status)
+        return status, content
+
+    async def seed(self, lists: int, tasks: int) -> None:
+        for _ in range(lists):
+            await self.new_list(tasks)
+
+    async def new_list(self, tasks: int, keep: bool = True) -> str:
+        _, content = await self.request(
+            "POST", "/api/v1/lists", body={"name": "Benchmark"}
+        )
+        list_id = json.loads(content)["_id"]
+        task_ids = await self.create_tasks(list_id, tasks)
+
+        # Lists about to be deleted are kept away from the other operations
+        if keep:
+            self.list_ids.append(list_id)
+            self.task_ids[list_id] = task_ids
+
+        return list_id
+
+    async def create_tasks(self, list_id: str, count: int) -> List[str]:
+        operations = [
+            {"op": "create", "task": {"task": "Task " + str(i), "list_id": list_id}}
+            for i in range(count)
+        ]
+        if not operations:
+            return []
+
+        status, content = await self.request(
+            "POST", "/api/v1/tasks:batch", body={"operations": operations}
+        )
+        if status != 200:
+            return []
+
+        return [item["_id"] for item in json.loads(content)]
+
+    # Operations, one per WORKLOADS key
+
+    async def poll_tasks(self) -> None:
+        list_id = self.rng.choice(self.list_ids)
+        await self._poll("/api/v1/tasks", {"list_id": list_id, "complete": "false"})
+
+    async def poll_lists(self) -> None:
+        await self._poll("/api/v1/lists", {})
+
+    async def poll_overview(self) -> None:
+        await self._poll("/api/v1/lists/overview", {})
+
+    async def poll_deletions(self) -> None:
+        await self.request("GET", "/api/v1/lists/deletions")
+
+    async def _poll(self, path: str, params: Dict) -> None:
+        key = path + json.dumps(params, sort_keys=True)
+        headers = {"If-None-Match": self.etags[key]} if key in self.etags else {}
+        response_headers: Dict[str, str] = {}
+        status, _ = await self.request(
+            "GET",
+            path,
+            params=params,
+            headers=headers,
+            response_headers=response_headers,
+        )
+        if status == 200 and "etag" in response_headers:
+            self.etags[key] = response_headers["etag"]
+
+    async def sync(self) -> None:
+        status, content = await self.request(
+            "GET", "/api/v1/sync", params={"since": self.version}
+        )
+        if status == 200:
+            self.version = json.loads(content)["version"]
+
+    async def events(self) -> None:
+        await self.request(
+            "GET", "/api/v1/events", params={"since": self.version}, first_chunk=True
+        )
+
+    async def search(self) -> None:
+        await self.request("GET", "/api/v1/tasks/search", params={"q": "task"})
+
+    async def stats(self) -> None:
+        await self.request("GET", "/api/v1/stats")
+
+    async def probe(self) -> None:
+        await self.request("GET", self.rng.choice(PROBES))
+
+    async def create_task(self) -> None:
+        list_id = self.rng.choice(self.list_ids)
+        status, content = await self.request(
+            "POST", "/api/v1/tasks", body={"task": "New task", "list_id": list_id}
+        )
+        if status == 200:
+            self.task_ids[list_id].append(json.loads(content)["_id"])
+
+    async def update_task(self) -> None:
+        list_id = self.rng.choice(self.list_ids)
+        if not self.task_ids[list_id]:
+            return await self.create_task()
+
+        await self.request(
+            "PUT",
+            "/api/v1/tasks",
+            params={"_id": self.rng.choice(self.task_ids[list_id])},
+            body={"complete": self.rng.random() < 0.5},
+        )
+
+    async def move_task(self) -> None:
+        list_id = self.rng.choice(self.list_ids)
+        if len(self.task_ids[list_id]) < 2:
+            return await self.create_task()
+
+        moved, after = self.rng.sample(self.task_ids[list_id], 2)
+        await self.request(
+            "POST",
+            "/api/v1/tasks:move",
+            body={"_id": moved, "after": after if self.rng.random() < 0.9 else None},
+        )
+
+    async def delete_task(self) -> None:
+        list_id = self.rng.choice(self.list_ids)
+        if not self.task_ids[list_id]:
+            return await self.create_task()
+
+        _id = self.task_ids[list_id].pop(
+            self.rng.randrange(len(self.task_ids[list_id]))
+        )
+        await self.request("DELETE", "/api/v1/tasks", params={"_id": _id})
+
+    async def batch(self) -> None:
+        list_id = self.rng.choice(self.list_ids)
+        await self.request(
+            "POST",
+            "/api/v1/batch",
+            body={
+                "requests": [
+                    {"method": "GET", "path": "/api/v1/lists"},
+                    {
+                        "method": "GET",
+                        "path": "/api/v1/tasks",
+                        "params": {"list_id": list_id, "complete": False},
+                    },
+                    {
+                        "method": "POST",
+                        "path": "/api/v1/tasks",
+                        "body": {"task": "Batched task", "list_id": list_id},
+                    },
+                ]
+            },
+        )
+
+    async def batch_create(self) -> None:
+        list_id = self.rng.choice(self.list_ids)
+        self.task_ids[list_id] += await self.create_tasks(list_id, 50)
+
+    async def batch_delete(self) -> None:
+        list_id = self.rng.choice(self.list_ids)
+        if len(self.task_ids[list_id]) < 50:
+            self.task_ids[list_id] += await self.create_tasks(list_id, 50)
+
+        deleted = self.task_ids[list_id][:50]
+        self.task_ids[list_id] = self.task_ids[list_id][50:]
+        await self.request(
+            "POST",
+            "/api/v1/tasks:batch",
+            body={
+                "operations": [{"op": "delete", "_id": _id} for _id in deleted],
+                "ordered": False,
+            },
+        )
+
+    async def delete_list(self) -> None:
+        list_id = await self.new_list(100, keep=False)
+        await self.request("DELETE", "/api/v1/lists", params={"_id": list_id})
+
+
+# ----------------------------------------------------------------------------
+# Results
+# ----------------------------------------------------------------------------
+
+
+class Recorder:
+    """Collects latencies per route, responses other than 2xx and 304 count
+    as errors"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.enabled = False
+
+    def record(self, route: str, latency: float, status: int) -> None:
+        if not self.enabled:
+            return
+        self.latencies.setdefault(route, []).append(latency)
+        if not 200 <= status < 300 and status != 304:
+            self.errors[route] = self.errors.get(route, 0) + 1
+
+    def summary(self, elapsed: float) -> Dict[str, Dict[str, float]]:
+        return {
+            route: {
+                **summarise(latencies, elapsed),
+                "errors": self.errors.get(route, 0),
+            }
+            for route, latencies in sorted(self.latencies.items())
+        }
+
+
+def compare(
+    results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float
+) -> List[str]:
+    """Routes which got slower than the baseline by more than `threshold`
+
+    Args:
+        results (Dict[str, Dict]): this run's summary per route
+        baseline (Dict[str, Dict]): a previous run's summary per route
+        threshold (float): allowed relative slow down, e.g. 0.1 for 10%
+
+    Returns:
+        List[str]: a description of each regression
+    """
+    regressions = []
+    for route, result in results.items():
+        if route not in baseline:
+            continue
+        for metric in ["p50_ms", "p95_ms", "p99_ms"]:
+            before, after = baseline[route][metric], result[metric]
+            if before and after > before * (1 + threshold):
+                regressions.append(
+                    f"{route} {metric} {before:.2f} -> {after:.2f}"
+                    f" (+{(after / before - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+
+async def run(args: argparse.Namespace, keys: LocalKeys) -> Dict[str, Dict]:
+    """Seeds the virtual users then runs the workload
+
+    Args:
+        args (argparse.Namespace): command line arguments
+        keys (LocalKeys): signs the users' tokens
+
+    Returns:
+        Dict[str, Dict]: throughput and latency summary per route
+    """
+    # pylint: disable=import-outside-toplevel
+    from main.config import config
+    from main.server import app
+
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    users = [
+        VirtualUser(
+            app,
+            keys.token(f"benchmark-{rng.getrandbits(32):08x}", config["CLIENT_ID"]),
+            recorder,
+            random.Random(rng.random()),
+        )
+        for _ in range(args.users)
+    ]
+
+    await app.router.startup()
+    try:
+        await asyncio.gather(*[user.seed(args.lists, args.tasks) for user in users])
+
+        weights = WORKLOADS[args.workload]
+        operations = [
+            operation
+            for operation in weights
+            if args.backend != "memory" or operation not in MEMORY_UNSUPPORTED
+        ]
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def step(user: VirtualUser) -> None:
+            async with semaphore:
+                name = user.rng.choices(operations, [weights[o] for o in operations])
+                operation: Callable[[], Awaitable[None]] = getattr(user, name[0])
+                await operation()
+
+        recorder.enabled = True
+        start = time.perf_counter()
+        await asyncio.gather(
+            *[step(users[i % len(users)]) for i in range(args.requests)]
+        )
+        elapsed = time.perf_counter() - start
+    finally:
+        await app.router.shutdown()
+
+    return recorder.summary(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", maxsplit=1)[0])
+    parser.add_argument("--workload", choices=list(WORKLOADS), default="mixed")
+    parser.add_argument("--backend", choices=["memory", "mongo"], default="memory")
+    parser.add_argument("--uri", default=None, help="Mongo URI for --backend mongo")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--lists", type=int, default=2, help="Lists per user")
+    parser.add_argument("--tasks", type=int, default=50, help="Tasks per list")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare with a previous --output")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative slow down vs the baseline which counts as a regression",
+    )
+    args = parser.parse_args()
+
+    keys = LocalKeys()
+    configure_environment(args.backend, args.uri, jwks_uri=keys.write_jwks())
+
+    results = asyncio.run(run(args, keys))
+
+    print(
+        f"{'route':<28}{'requests':>10}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}"
+        f"{'p99 ms':>10}{'errors':>8}"
+    )
+    for route, result in results.items():
+        print(
+            f"{route:<28}{result['requests']:>10}{result['throughput_rps']:>10.1f}"
+            f"{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+            f"{result['p99_ms']:>10.2f}{result['errors']:>8}"
+        )
+
+    failed = False
+    errors = {route: result["errors"] for route, result in results.items()}
+    if any(errors.values()):
+        for route, count in errors.items():
+            if count:
+                print(f"errors: {route} {count}")
+        failed = True
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump({"workload": args.workload, "routes": results}, output, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline:
+            regressions = compare(
+                results, json.load(baseline)["routes"], args.threshold
+            )
+        for regression in regressions:
+            print("regression: " + regression)
+        if regressions:
+            failed = True
+        else:
+            print("no regressions against " + args.baseline)
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Times encoding pages of tasks with and without validating them
+
+* "validated" is what FastAPI does with a response model: build a TaskInDB
+  per document, run jsonable_encoder then json.dumps
+* "trusted" encodes the documents straight to bytes, see TRUSTED_READS
+"""
+
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from datetime import datetime
+from typing import Callable, Dict, List
+from uuid import uuid4
+import argparse
+import json
+import time
+
+# Fast
+from fastapi.encoders import jsonable_encoder
+
+# ----------------------------------------------------------------------------
+# Set-up
+# ----------------------------------------------------------------------------
+
+from benchmarks.harness import configure_environment
+
+configure_environment("memory")
+
+# pylint: disable=wrong-import-position
+from main.dependencies.models import TaskInDB
+from main.dependencies.utils import dumps
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+
+def make_documents(count: int) -> List[Dict]:
+    """Documents shaped like the ones read_tasks reads from the database"""
+    list_id = str(uuid4())
+    return [
+        {
+            "_id": str(uuid4()),
+            "username": "benchmark",
+            "list_id": list_id,
+            "task": f"Task {i}",
+            "notes": "Some notes about the task",
+            "complete": i % 2 == 0,
+            "pinned": i % 10 == 0,
+            "version": i + 1,
+            "updated_at": datetime.utcnow(),
+        }
+        for i in range(count)
+    ]
+
+
+def validated(documents: List[Dict]) -> bytes:
+    tasks = [TaskInDB(**document) for document in documents]
+    return json.dumps(jsonable_encoder(tasks)).encode()
+
+
+def trusted(documents: List[Dict]) -> bytes:
+    return dumps(documents)
+
+
+def best_of(encode: Callable[[List[Dict]], bytes], documents, repeat: int) -> float:
+    """Fastest of `repeat` runs in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        encode(documents)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", maxsplit=1)[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'tasks':>8}{'validated ms':>15}{'trusted ms':>15}{'speed-up':>10}")
+    for size in args.sizes:
+        documents = make_documents(size)
+        slow = best_of(validated, documents, args.repeat)
+        fast = best_of(trusted, documents, args.repeat)
+        print(f"{size:>8}{slow * 1000:>15.2f}{fast * 1000:>15.2f}{slow / fast:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
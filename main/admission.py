@@ -0,0 +1,328 @@
+"""Sheds load before it reaches the routes
+
+* Each user has a token bucket refilled at RATE_LIMIT_PER_SECOND up to
+  RATE_LIMIT_BURST tokens, a request takes its route's cost from it or is
+  rejected with a 429
+* At most DB_MAX_CONCURRENCY requests which use the database run at once, the
+  others queue for up to DB_QUEUE_SECONDS, or are rejected with a 503 straight
+  away once DB_MAX_QUEUE are waiting
+* Both responses carry a Retry-After header
+
+Users are known from the token cache, so a token is only rate limited once it
+has been validated by `get_current_user`. The cost of each route, and whether
+it holds a database slot, is set in ROUTE_POLICIES.
+"""
+
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Optional, Tuple
+import asyncio
+import math
+import time
+
+# Other
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+
+# Module
+from main.metrics import ADMISSION_REJECTED
+
+# ----------------------------------------------------------------------------
+# Set-up
+# ----------------------------------------------------------------------------
+
+
+@dataclass
+class RoutePolicy:
+    # Tokens a request takes from the user's bucket
+    cost: float = 1
+    # Whether a request holds a database slot while it runs
+    database: bool = True
+
+
+# Keyed by "METHOD path", routes not listed use DEFAULT_POLICY
+DEFAULT_POLICY = RoutePolicy()
+ROUTE_POLICIES: Dict[str, RoutePolicy] = {
+    "GET /healthz": RoutePolicy(cost=0, database=False),
+    "GET /readyz": RoutePolicy(cost=0, database=False),
+    "GET /metrics": RoutePolicy(cost=0, database=False),
+    "GET /api/v1/stats": RoutePolicy(database=False),
+    # Long lived, each stream polls rarely
+    "GET /api/v1/events": RoutePolicy(database=False),
+    "GET /api/v1/tasks/search": RoutePolicy(cost=2),
+    "POST /api/v1/tasks:batch": RoutePolicy(cost=5),
+    # Its requests are admitted one by one
+    "POST /api/v1/batch": RoutePolicy(cost=0, database=False),
+    "DELETE /api/v1/lists": RoutePolicy(cost=5),
+}
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+
+class TokenBuckets:
+    """A token bucket per key, the least recently used are forgotten once
+    there are more than `max_size`, which refills them
+
+    Args:
+        rate (float): tokens added per second
+        burst (float): most tokens a bucket holds
+        max_size (int, optional): most buckets kept
+        clock (Callable[[], float], optional): monotonic seconds
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        max_size: int = 10000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_size = max_size
+        self.clock = clock
+
+        # key -> (tokens, when they were counted)
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, key: str, cost: float = 1) -> float:
+        """Takes `cost` tokens from the key's bucket if it has them
+
+        Args:
+            key (str): e.g. the username
+            cost (float, optional): tokens to take, at most `burst`
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise the seconds until
+                the bucket will have them
+        """
+        now = self.clock()
+        cost = min(cost, self.burst)
+
+        tokens, counted = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - counted) * self.rate)
+
+        wait = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            wait = (cost - tokens) / self.rate
+
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.max_size:
+            self._buckets.popitem(last=False)
+
+        return wait
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class ConcurrencyLimit:
+    """Lets `limit` holders in at once, queueing the rest in arrival order
+
+    Args:
+        limit (int): most holders at once
+        max_queue (int): most waiters, later arrivals are turned away
+        timeout (float): seconds a waiter waits before giving up
+    """
+
+    def __init__(self, limit: int, max_queue: int, timeout: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> bool:
+        """Waits for a slot, call `release` once done with it
+
+        Returns:
+            bool: whether a slot was acquired
+        """
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return True
+
+        if len(self._waiters) >= self.max_queue:
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # Shielded so a timeout never cancels a slot being handed over
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            if waiter.done():
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+        if waiter.done():
+            return True
+
+        self._waiters.remove(waiter)
+        waiter.cancel()
+        return False
+
+    def release(self) -> None:
+        """Hands the slot to the longest waiter, or frees it"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+        self.in_flight -= 1
+
+
+class Admission:
+    """The rate limits and the database slots of a server process
+
+    Args:
+        buckets (TokenBuckets | None): per user buckets, None to not rate limit
+        database (ConcurrencyLimit | None): None to not limit the database
+        policies (Dict[str, RoutePolicy], optional): see ROUTE_POLICIES
+        default (RoutePolicy, optional): the policy of routes not listed
+    """
+
+    def __init__(
+        self,
+        buckets: Optional[TokenBuckets],
+        database: Optional[ConcurrencyLimit],
+        policies: Optional[Dict[str, RoutePolicy]] = None,
+        default: RoutePolicy = DEFAULT_POLICY,
+    ):
+        self.buckets = buckets
+        self.database = database
+        self.policies = ROUTE_POLICIES if policies is None else policies
+        self.default = default
+
+        self.rate_limited = 0
+        self.shed = 0
+
+    def policy(self, method: str, path: str) -> RoutePolicy:
+        return self.policies.get(method + " " + path, self.default)
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the rejection counters and the database slot usage
+
+        Returns:
+            Dict[str, int]: counters and current sizes
+        """
+        return {
+            "rate_limited": self.rate_limited,
+            "shed": self.shed,
+            "users": len(self.buckets) if self.buckets is not None else 0,
+            "database_in_flight": (
+                self.database.in_flight if self.database is not None else 0
+            ),
+            "database_queued": (
+                self.database.queued if self.database is not None else 0
+            ),
+        }
+
+
+def _reject(status: int, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": detail},
+        status_code=status,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class AdmissionMiddleware:
+    """Rate limits users and limits the requests using the database, see the
+    module docstring. Requests which match no route are let through for the
+    router to turn away
+
+    Args:
+        app: the wrapped ASGI app
+        admission (Admission): the limits
+        token_user (Callable[[str], Optional[str]]): the username of a
+            validated token, None if it has not been validated
+    """
+
+    def __init__(
+        self,
+        app,
+        admission: Admission,
+        token_user: Callable[[str], Optional[str]],
+    ):
+        self.app = app
+        self.admission = admission
+        self.token_user = token_user
+        self._routes: Dict[Tuple[str, str], str] = {}
+
+    def _route(self, scope) -> Optional[str]:
+        # Only matches are remembered, so unknown paths cannot grow the dict
+        key = (scope["method"], scope["path"])
+        if key not in self._routes:
+            for route in scope["app"].routes:
+                match, _ = route.matches(scope)
+                if match == Match.FULL:
+                    self._routes[key] = route.path
+                    break
+        return self._routes.get(key)
+
+    def _username(self, scope) -> Optional[str]:
+        authorization = dict(scope.get("headers", [])).get(b"authorization", b"")
+        scheme, _, token = authorization.decode("latin-1").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return None
+        return self.token_user(token)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or "app" not in scope:
+            await self.app(scope, receive, send)
+            return
+
+        route = self._route(scope)
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        policy = self.admission.policy(scope["method"], route)
+
+        buckets = self.admission.buckets
+        if buckets is not None and policy.cost > 0:
+            username = self._username(scope)
+            wait = buckets.take(username, policy.cost) if username is not None else 0
+            if wait > 0:
+                self.admission.rate_limited += 1
+                ADMISSION_REJECTED.labels(route=route, reason="rate_limit").inc()
+                response = _reject(429, "Too many requests", wait)
+                await response(scope, receive, send)
+                return
+
+        database = self.admission.database
+        if database is None or not policy.database:
+            await self.app(scope, receive, send)
+            return
+
+        if not await database.acquire():
+            self.admission.shed += 1
+            ADMISSION_REJECTED.labels(route=route, reason="database").inc()
+            response = _reject(503, "Server busy", database.timeout)
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            database.release()
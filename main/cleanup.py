@@ -0,0 +1,315 @@
+"""Removes the tasks of deleted lists, and expired tombstones, in the
+background
+
+Deleting a list records a pending deletion in the `deletions` collection,
+then removes the list document, so a crash in between never leaves a deleted
+list's tasks behind. Tasks of a list with a pending deletion are hidden from
+its owner's reads. A worker in each server process then deletes the tasks a batch at
+a time, pausing between batches so the primary is not saturated, and marks the
+deletion done once none are left. Deletions live in the database so they are
+picked up again after a restart.
+
+The worker only deletes tasks once the list document is gone. A crash or a
+failed delete between the two writes leaves a record behind a list which
+still exists, the worker cancels it once it is `settle` seconds old, by when
+its request has surely finished.
+
+Tombstones older than TOMBSTONE_TTL_DAYS are removed by the same worker
+rather than a TTL index, so it can first record, per user, the highest
+version removed, see `main.dependencies.versions.changes_expired`.
+"""
+
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import asyncio
+import logging
+
+# Module
+from main.dependencies.ids import match_id, stored_id
+
+# ----------------------------------------------------------------------------
+# Set-up
+# ----------------------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+
+async def start_list_deletion(database, username: str, list_id) -> bool:
+    """Records that the tasks of a list about to be deleted need removing
+
+    Args:
+        database: the (async) database
+        username (str): the owner of the list
+        list_id: id of the list
+
+    Returns:
+        bool: whether the record is new, False if it was left by an earlier
+            attempt
+    """
+    result = await database["deletions"].update_one(
+        filter={"_id": stored_id(list_id), "username": username},
+        update={
+            "$setOnInsert": {
+                "status": "pending",
+                "deleted": 0,
+                "created_at": datetime.utcnow(),
+                "finished_at": None,
+            }
+        },
+        upsert=True,
+    )
+
+    return result.upserted_id is not None
+
+
+async def cancel_list_deletion(database, username: str, list_id) -> None:
+    """Removes the record of a deletion whose list turned out not to exist
+
+    Args:
+        database: the (async) database
+        username (str): who asked for the deletion
+        list_id: id of the list
+    """
+    await database["deletions"].delete_one(
+        filter={"_id": match_id(list_id), "username": username}
+    )
+
+
+async def expire_tombstones(database, ttl_days: float, limit: int) -> int:
+    """Removes the oldest tombstones older than `ttl_days`, after raising each
+    of their users' "expired" version to the highest version removed
+
+    Args:
+        database: the (async) database
+        ttl_days (float): how long tombstones are kept
+        limit (int): the most tombstones to remove
+
+    Returns:
+        int: the number of tombstones removed
+    """
+    tombstones = (
+        await database["tombstones"]
+        .find(
+            filter={
+                "updated_at": {"$lt": datetime.utcnow() - timedelta(days=ttl_days)}
+            },
+            projection={"username": 1, "version": 1},
+        )
+        .sort("updated_at", 1)
+        .limit(limit)
+        .to_list(length=None)
+    )
+    if not tombstones:
+        return 0
+
+    expired: Dict[str, int] = {}
+    for tombstone in tombstones:
+        username = tombstone["username"]
+        expired[username] = max(expired.get(username, 0), tombstone["version"])
+
+    # Recorded first, a crash in between only removes them later
+    for username, version in expired.items():
+        await database["versions"].update_one(
+            filter={"_id": username},
+            update={"$max": {"expired": version, "version": version}},
+            upsert=True,
+        )
+    result = await database["tombstones"].delete_many(
+        filter={"_id": {"$in": [tombstone["_id"] for tombstone in tombstones]}}
+    )
+
+    return result.deleted_count
+
+
+async def pending_list_deletions(database, username: str) -> List:
+    """Ids of the user's lists whose tasks are still being removed
+
+    Args:
+        database: the (async) database
+        username (str): the user
+
+    Returns:
+        List: the list ids, as stored
+    """
+    return [
+        deletion["_id"]
+        async for deletion in database["deletions"].find(
+            filter={"username": username, "status": "pending"}, projection={"_id": 1}
+        )
+    ]
+
+
+async def is_list_deleted(database, username: str, list_id) -> bool:
+    """Whether the user's list's tasks are still being removed
+
+    Args:
+        database: the (async) database
+        username (str): the owner of the list
+        list_id: id of the list
+
+    Returns:
+        bool: True if the tasks should be hidden
+    """
+    deletion = await database["deletions"].find_one(
+        filter={"_id": match_id(list_id), "username": username, "status": "pending"},
+        projection={"_id": 1},
+    )
+
+    return deletion is not None
+
+
+class ListCleanup:
+    """Works through the pending list deletions
+
+    * Deletes at most `batch_size` tasks per round trip, then sleeps `delay`
+    * Checks for new deletions every `poll_interval` seconds, or as soon as
+      `wake` is called
+    * Cancels deletions whose list still exists `settle` seconds after they
+      were recorded
+    * Once no deletion is pending, removes tombstones older than
+      `tombstone_ttl_days` the same way
+    """
+
+    def __init__(
+        self,
+        database,
+        batch_size: int = 1000,
+        delay: float = 0.5,
+        poll_interval: float = 30,
+        settle: float = 60,
+        tombstone_ttl_days: float = 30,
+    ):
+        self.database = database
+        self.batch_size = batch_size
+        self.delay = delay
+        self.poll_interval = poll_interval
+        self.settle = settle
+        self.tombstone_ttl_days = tombstone_ttl_days
+
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def start(self) -> None:
+        """Starts the worker on the running event loop"""
+        self._stopping = False
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stops the worker, an unfinished deletion resumes on the next start"""
+        if self._task is None:
+            return
+
+        # wait_for swallows a cancel which races with `wake`, the flag makes
+        # sure the worker still exits
+        self._stopping = True
+        self._wake.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def wake(self) -> None:
+        """Looks for pending deletions now rather than at the next poll"""
+        self._wake.set()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                while not self._stopping and await self.run_once():
+                    await asyncio.sleep(self.delay)
+                while not self._stopping and await expire_tombstones(
+                    self.database, self.tombstone_ttl_days, self.batch_size
+                ):
+                    await asyncio.sleep(self.delay)
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("List cleanup failed, retrying after the poll")
+
+            if self._stopping:
+                return
+
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run_once(self) -> bool:
+        """Deletes one batch of tasks of the oldest pending deletion
+
+        Returns:
+            bool: whether there may be more to do
+        """
+        deletion = await self.database["deletions"].find_one(
+            filter={"status": "pending"}, sort=[("created_at", 1)]
+        )
+        if deletion is None:
+            return False
+
+        # Nothing is deleted while the list exists
+        task_list = await self.database["lists"].find_one(
+            filter={"_id": match_id(deletion["_id"]), "username": deletion["username"]},
+            projection={"_id": 1},
+        )
+        if task_list is not None:
+            if deletion["created_at"] > datetime.utcnow() - timedelta(
+                seconds=self.settle
+            ):
+                # Its request may still be about to delete the list
+                return False
+
+            logger.warning(
+                "Cancelled the deletion of list %s which still exists", deletion["_id"]
+            )
+            await cancel_list_deletion(
+                self.database, deletion["username"], deletion["_id"]
+            )
+            return True
+
+        # Only the requester's tasks, the record is written before the list
+        # is known to be theirs
+        task_ids = [
+            task["_id"]
+            async for task in self.database["tasks"]
+            .find(
+                filter={
+                    "list_id": match_id(deletion["_id"]),
+                    "username": deletion["username"],
+                },
+                projection={"_id": 1},
+            )
+            .limit(self.batch_size)
+        ]
+
+        if not task_ids:
+            await self.database["deletions"].update_one(
+                filter={"_id": deletion["_id"]},
+                update={"$set": {"status": "done", "finished_at": datetime.utcnow()}},
+            )
+            logger.info(
+                "Deleted the %d tasks of list %s", deletion["deleted"], deletion["_id"]
+            )
+            return True
+
+        result = await self.database["tasks"].delete_many(
+            filter={"_id": {"$in": task_ids}}
+        )
+        await self.database["deletions"].update_one(
+            filter={"_id": deletion["_id"]},
+            update={"$inc": {"deleted": result.deleted_count}},
+        )
+
+        return True
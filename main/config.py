@@ -16,6 +16,106 @@ load_dotenv()
 config = {
     "ATLAS_URI": os.environ["ATLAS_URI"],
     "DB_NAME": os.environ["ATLAS_DB_NAME"],
+    # "mongo" or "memory" (an in-memory stand-in for tests and benchmarks)
+    "DB_BACKEND": os.environ.get("DB_BACKEND", "mongo"),
+    # Connection pool of the Mongo client, 0 keeps idle connections forever
+    "DB_MAX_POOL_SIZE": int(os.environ.get("DB_MAX_POOL_SIZE", 100)),
+    "DB_MIN_POOL_SIZE": int(os.environ.get("DB_MIN_POOL_SIZE", 0)),
+    "DB_MAX_IDLE_MS": int(os.environ.get("DB_MAX_IDLE_MS", 0)),
+    # Wire compression to offer the server, e.g. "zstd,snappy,zlib"
+    "DB_COMPRESSORS": os.environ.get("DB_COMPRESSORS", ""),
+    # Milliseconds each database operation may take, 0 for no limit
+    "DB_TIMEOUT_MS": int(os.environ.get("DB_TIMEOUT_MS", 0)),
+    # Where read-only queries go, e.g. "secondaryPreferred", see repository.py
+    "DB_READ_PREFERENCE": os.environ.get("DB_READ_PREFERENCE", "primary"),
+    # How ids are stored, "string", "uuid" or "mixed", see dependencies/ids.py
+    "ID_FORMAT": os.environ.get("ID_FORMAT", "string"),
+    # Create the indexes in main/indexes.py when the server starts
+    "CREATE_INDEXES": os.environ.get("CREATE_INDEXES", "true").lower() == "true",
     "TENANT_ID": os.environ["AZ_TENANT_ID"],
     "CLIENT_ID": os.environ["AZ_CLIENT_ID"],
+    # Where to get the JSON Web Key Set, a URL or a local file
+    "JWKS_URI": os.environ.get(
+        "JWKS_URI",
+        "https://login.microsoftonline.com/"
+        + os.environ["AZ_TENANT_ID"]
+        + "/discovery/v2.0/keys",
+    ),
+    # Seconds before the cached keys are refreshed in the background
+    "JWKS_TTL": float(os.environ.get("JWKS_TTL", 3600)),
+    # Minimum seconds between fetches caused by unknown key ids
+    "JWKS_MIN_REFRESH_INTERVAL": float(
+        os.environ.get("JWKS_MIN_REFRESH_INTERVAL", 60)
+    ),
+    # Encode reads straight from the database without validating them against
+    # the response models, the API wrote the documents so they already match
+    "TRUSTED_READS": os.environ.get("TRUSTED_READS", "true").lower() == "true",
+    # Largest page of documents a read can ask for
+    "PAGE_SIZE_MAX": int(os.environ.get("PAGE_SIZE_MAX", 1000)),
+    # Default number of results of a task search
+    "SEARCH_PAGE_SIZE": int(os.environ.get("SEARCH_PAGE_SIZE", 20)),
+    # Default number of changes returned by a sync
+    "SYNC_PAGE_SIZE": int(os.environ.get("SYNC_PAGE_SIZE", 500)),
+    # Changes younger than this are held back from syncs, see routers/sync.py.
+    # Writes which take longer than this after reserving their version can be
+    # skipped by a sync
+    "SYNC_SETTLE_SECONDS": float(os.environ.get("SYNC_SETTLE_SECONDS", 2)),
+    # How long deletes are remembered for syncing clients, older clients have
+    # to sync again from version 0
+    "TOMBSTONE_TTL_DAYS": int(os.environ.get("TOMBSTONE_TTL_DAYS", 30)),
+    # Most operations a batch request can contain
+    "BATCH_MAX_SIZE": int(os.environ.get("BATCH_MAX_SIZE", 500)),
+    # Most requests POST /api/v1/batch can contain, and run at once
+    "BATCH_MAX_REQUESTS": int(os.environ.get("BATCH_MAX_REQUESTS", 20)),
+    "BATCH_CONCURRENCY": int(os.environ.get("BATCH_CONCURRENCY", 8)),
+    # Tasks of deleted lists are removed in the background this many at a time
+    "CLEANUP_BATCH_SIZE": int(os.environ.get("CLEANUP_BATCH_SIZE", 1000)),
+    # Seconds to pause between those batches
+    "CLEANUP_DELAY_SECONDS": float(os.environ.get("CLEANUP_DELAY_SECONDS", 0.5)),
+    # Seconds between checks for deletions left by other or restarted servers
+    "CLEANUP_POLL_SECONDS": float(os.environ.get("CLEANUP_POLL_SECONDS", 30)),
+    # Seconds after which a deletion whose list still exists is cancelled
+    "CLEANUP_SETTLE_SECONDS": float(os.environ.get("CLEANUP_SETTLE_SECONDS", 60)),
+    # Connections opened to Mongo before the server takes traffic
+    "WARMUP_CONNECTIONS": int(os.environ.get("WARMUP_CONNECTIONS", 10)),
+    # Comma separated modules to import before the server takes traffic
+    "WARMUP_IMPORTS": os.environ.get("WARMUP_IMPORTS", ""),
+    # Seconds startup waits for the warm up before serving anyway
+    "WARMUP_TIMEOUT_SECONDS": float(os.environ.get("WARMUP_TIMEOUT_SECONDS", 10)),
+    # Seconds /readyz fails before the server stops accepting connections
+    "SHUTDOWN_DRAIN_SECONDS": float(os.environ.get("SHUTDOWN_DRAIN_SECONDS", 10)),
+    # Watch a change stream so event streams see other processes' writes
+    "EVENTS_CHANGE_STREAMS": os.environ.get("EVENTS_CHANGE_STREAMS", "true").lower()
+    == "true",
+    # Seconds between checks of an idle event stream, also its keep-alive
+    "EVENTS_POLL_SECONDS": float(os.environ.get("EVENTS_POLL_SECONDS", 15)),
+    # Seconds an event stream lasts before the client has to reconnect
+    "EVENTS_MAX_STREAM_SECONDS": float(
+        os.environ.get("EVENTS_MAX_STREAM_SECONDS", 300)
+    ),
+    # Lists whose task positions get longer than this are rebalanced
+    "RANK_MAX_LENGTH": int(os.environ.get("RANK_MAX_LENGTH", 12)),
+    # Requests a user can make per second on average, 0 to not rate limit
+    "RATE_LIMIT_PER_SECOND": float(os.environ.get("RATE_LIMIT_PER_SECOND", 10)),
+    # Requests a user can make at once after being idle
+    "RATE_LIMIT_BURST": float(os.environ.get("RATE_LIMIT_BURST", 40)),
+    # Most users whose rate is tracked per worker
+    "RATE_LIMIT_USERS": int(os.environ.get("RATE_LIMIT_USERS", 10000)),
+    # Requests using the database at once per worker, 0 for no limit
+    "DB_MAX_CONCURRENCY": int(os.environ.get("DB_MAX_CONCURRENCY", 64)),
+    # Requests which may wait for one of those, later ones get a 503
+    "DB_MAX_QUEUE": int(os.environ.get("DB_MAX_QUEUE", 256)),
+    # Seconds a request waits before getting a 503
+    "DB_QUEUE_SECONDS": float(os.environ.get("DB_QUEUE_SECONDS", 1)),
+    # Continue or start W3C traces and log their spans at debug level
+    "TRACING": os.environ.get("TRACING", "false").lower() == "true",
+    # Where task and list reads are cached: "memory", "redis" or "none"
+    "CACHE_BACKEND": os.environ.get("CACHE_BACKEND", "memory"),
+    "CACHE_URL": os.environ.get("CACHE_URL", "redis://localhost:6379/0"),
+    # Seconds a cached read is kept
+    "CACHE_TTL": float(os.environ.get("CACHE_TTL", 60)),
+    # Maximum number of cached reads per worker, for the "memory" backend
+    "CACHE_MAX_SIZE": int(os.environ.get("CACHE_MAX_SIZE", 10000)),
+    # Maximum number of validated tokens to remember
+    "TOKEN_CACHE_SIZE": int(os.environ.get("TOKEN_CACHE_SIZE", 10000)),
 }
@@ -0,0 +1,72 @@
+"""Creates the (async) database client"""
+
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from typing import Dict
+
+# Other
+from motor.motor_asyncio import AsyncIOMotorClient
+
+# Module
+from main.metrics import MongoCommandListener
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+
+def create_client(settings: Dict) -> AsyncIOMotorClient:
+    """Creates an async Mongo client from the config
+
+    * "mongo" connects to ATLAS_URI, e.g. Atlas or a local mongod
+    * "memory" uses an in-memory stand-in, for tests and benchmarks
+    * UUIDs are encoded as BSON binary subtype 4, see ID_FORMAT
+    * Commands are timed by a MongoCommandListener, see /metrics
+    * The pool, wire compression and timeouts are set from the DB_* config
+
+    Args:
+        settings (Dict): the app config
+
+    Returns:
+        AsyncIOMotorClient: the client (or a stand-in with the same interface)
+    """
+    if settings["DB_BACKEND"] == "memory":
+        if settings["ID_FORMAT"] != "string":
+            raise RuntimeError(
+                "DB_BACKEND=memory cannot store UUIDs, use ID_FORMAT=string"
+            )
+
+        try:
+            # pylint: disable=import-outside-toplevel
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError as exc:
+            raise RuntimeError(
+                "DB_BACKEND=memory requires mongomock-motor to be installed"
+            ) from exc
+
+        return AsyncMongoMockClient()
+
+    if settings["DB_BACKEND"] != "mongo":
+        raise ValueError("Unknown DB_BACKEND " + settings["DB_BACKEND"])
+
+    options = {
+        "maxPoolSize": settings["DB_MAX_POOL_SIZE"],
+        "minPoolSize": settings["DB_MIN_POOL_SIZE"],
+    }
+    if settings["DB_MAX_IDLE_MS"]:
+        options["maxIdleTimeMS"] = settings["DB_MAX_IDLE_MS"]
+    if settings["DB_TIMEOUT_MS"]:
+        options["timeoutMS"] = settings["DB_TIMEOUT_MS"]
+    # Compressors are negotiated with the server, missing libraries are skipped
+    if settings["DB_COMPRESSORS"]:
+        options["compressors"] = settings["DB_COMPRESSORS"]
+
+    return AsyncIOMotorClient(
+        host=settings["ATLAS_URI"],
+        uuidRepresentation="standard",
+        event_listeners=[MongoCommandListener()],
+        **options,
+    )
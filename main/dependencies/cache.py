@@ -0,0 +1,352 @@
+"""Read-through cache in front of the task and list reads
+
+Entries belong to a user and a scope (a list id for tasks, "lists" for the
+user's lists) so writes can invalidate exactly what they affect. The key of
+an entry includes the number of writes to its scope (see
+main/dependencies/versions.py), so an entry can never outlive a write even if
+its invalidation is missed, e.g. by the in-memory cache of another worker,
+while writes to the user's other scopes leave it be.
+
+Identical reads which miss the cache at the same time share a single load,
+even with the cache disabled, so duplicate fetches from a user's tabs cost
+one query.
+"""
+
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+import asyncio
+import json
+import time
+
+# Fast
+from fastapi import Request
+
+# Module
+from main.config import config
+from main.dependencies.utils import json_default
+from main.dependencies.versions import is_settled
+
+# ----------------------------------------------------------------------------
+# Backends
+# ----------------------------------------------------------------------------
+
+
+class MemoryCacheBackend:
+    """In-process LRU cache with a TTL, local to the worker"""
+
+    def __init__(self, max_size: int = 10000, ttl: float = 60):
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[Dict, float]]" = (
+            OrderedDict()
+        )
+        self._scopes: Dict[str, Dict[str, Set[str]]] = {}
+
+        self.evictions = 0
+
+    async def get(self, username: str, scope: str, key: str) -> Optional[Dict]:
+        entry = self._entries.get((username, scope, key))
+        if entry is None:
+            return None
+
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._remove((username, scope, key))
+            return None
+
+        self._entries.move_to_end((username, scope, key))
+
+        return value
+
+    async def set(self, username: str, scope: str, key: str, value: Dict) -> None:
+        self._entries[(username, scope, key)] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end((username, scope, key))
+        self._scopes.setdefault(username, {}).setdefault(scope, set()).add(key)
+
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    async def invalidate(self, username: str, scope: Optional[str] = None) -> None:
+        scopes = self._scopes.get(username, {})
+        for name in list(scopes) if scope is None else [scope]:
+            for key in list(scopes.get(name, [])):
+                self._remove((username, name, key))
+
+    def _remove(self, entry_key: Tuple[str, str, str]) -> None:
+        username, scope, key = entry_key
+        self._entries.pop(entry_key, None)
+
+        scopes = self._scopes.get(username, {})
+        scopes.get(scope, set()).discard(key)
+        if not scopes.get(scope, True):
+            del scopes[scope]
+        if not scopes:
+            self._scopes.pop(username, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"evictions": self.evictions, "size": len(self._entries)}
+
+
+class RedisCacheBackend:
+    """Cache shared by every worker, in Redis (or anything speaking its API)
+
+    * Each user and scope is a hash expiring `ttl` seconds after its last set
+    * Size based eviction is left to Redis' maxmemory policy
+    """
+
+    def __init__(self, client, ttl: float = 60, prefix: str = "moshi:cache"):
+        self.client = client
+        self.ttl = int(ttl)
+        self.prefix = prefix
+
+    def _scope_key(self, username: str, scope: str) -> str:
+        return f"{self.prefix}:{username}:{scope}"
+
+    def _user_key(self, username: str) -> str:
+        return f"{self.prefix}:{username}"
+
+    async def get(self, username: str, scope: str, key: str) -> Optional[Dict]:
+        value = await self.client.hget(self._scope_key(username, scope), key)
+        return None if value is None else json.loads(value)
+
+    async def set(self, username: str, scope: str, key: str, value: Dict) -> None:
+        scope_key = self._scope_key(username, scope)
+        user_key = self._user_key(username)
+
+        pipeline = self.client.pipeline()
+        pipeline.hset(scope_key, key, json.dumps(value, default=json_default))
+        pipeline.expire(scope_key, self.ttl)
+        pipeline.sadd(user_key, scope)
+        pipeline.expire(user_key, self.ttl)
+        await pipeline.execute()
+
+    async def invalidate(self, username: str, scope: Optional[str] = None) -> None:
+        if scope is not None:
+            await self.client.delete(self._scope_key(username, scope))
+            return
+
+        scopes = await self.client.smembers(self._user_key(username))
+        await self.client.delete(
+            self._user_key(username),
+            *[
+                self._scope_key(
+                    username, name.decode() if isinstance(name, bytes) else name
+                )
+                for name in scopes
+            ],
+        )
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+
+class ReadCache:
+    """Counts and forwards cache operations to a backend, None disables it"""
+
+    def __init__(self, backend=None):
+        self.backend = backend
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.coalesced = 0
+
+        # Loads in progress, keyed like the entries
+        self._flights: Dict[Tuple[str, str, str], asyncio.Future] = {}
+
+    async def get_or_load(
+        self,
+        username: str,
+        scope: str,
+        key: str,
+        load: Callable[[], Awaitable[Dict]],
+        store: bool = True,
+    ) -> Dict:
+        """Returns the cached value or loads (and caches) it
+
+        Args:
+            username (str): the owner of the data
+            scope (str): e.g. a list id
+            key (str): identifies the read within the scope
+            load (Callable[[], Awaitable[Dict]]): reads the value on a miss
+            store (bool, optional): whether a loaded value may be cached, and
+                so shared with identical loads running at the same time
+
+        Returns:
+            Dict: the value
+        """
+        if self.backend is not None:
+            value = await self.backend.get(username, scope, key)
+            if value is not None:
+                self.hits += 1
+                return value
+
+            self.misses += 1
+
+        if not store:
+            return await load()
+
+        return await self._load_once((username, scope, key), load)
+
+    async def _load_once(
+        self, entry_key: Tuple[str, str, str], load: Callable[[], Awaitable[Dict]]
+    ) -> Dict:
+        """Loads and stores the value, or waits for the identical load already
+        in flight
+
+        * A caller which is cancelled stops waiting
+        * The first caller's load may use its session, so it is cancelled with
+          that caller and the others load again
+        """
+        while True:
+            flight = self._flights.get(entry_key)
+            first = flight is None
+            if first:
+                flight = asyncio.ensure_future(self._load_and_store(entry_key, load))
+                self._flights[entry_key] = flight
+                flight.add_done_callback(lambda done: self._landed(entry_key, done))
+            else:
+                self.coalesced += 1
+
+            try:
+                # Unlike awaiting the flight, only cancelling this caller raises
+                await asyncio.wait({flight})
+            except asyncio.CancelledError:
+                if first:
+                    flight.cancel()
+                raise
+
+            if not flight.cancelled():
+                return flight.result()
+
+            # Its first caller went away, so this caller did not save a load
+            if not first:
+                self.coalesced -= 1
+
+    def _landed(self, entry_key: Tuple[str, str, str], flight: asyncio.Future):
+        if self._flights.get(entry_key) is flight:
+            del self._flights[entry_key]
+
+    async def _load_and_store(
+        self, entry_key: Tuple[str, str, str], load: Callable[[], Awaitable[Dict]]
+    ) -> Dict:
+        value = await load()
+        if self.backend is not None:
+            await self.backend.set(*entry_key, value)
+        return value
+
+    def read_through(
+        self, username: str, scope: str, counter: Dict, request: Request
+    ) -> Callable[[Callable[[], Awaitable[Dict]]], Awaitable[Dict]]:
+        """Binds `get_or_load` to a read of the user's data
+
+        * The key is the read's query at the scope's current version
+        * Reads are not cached or shared while that version is not settled, a
+          load started before a write could then miss it
+
+        Args:
+            username (str): the owner of the data
+            scope (str): e.g. a list id
+            counter (Dict): the user's version counter, see `current_version`
+            request (Request): the read
+
+        Returns:
+            Callable: takes the load function, returns the value
+        """
+        scope_counter = {
+            "version": 0,
+            "updated_at": None,
+            **counter.get("scopes", {}).get(scope, {}),
+        }
+        key = str(scope_counter["version"]) + "?" + request.url.query
+
+        def through(load: Callable[[], Awaitable[Dict]]) -> Awaitable[Dict]:
+            return self.get_or_load(
+                username, scope, key, load, store=is_settled(scope_counter)
+            )
+
+        return through
+
+    async def invalidate(self, username: str, scope: Optional[str] = None) -> None:
+        """Drops the user's entries in a scope, or in every scope
+
+        Args:
+            username (str): the owner of the data
+            scope (str, optional): e.g. a list id, None for every scope
+        """
+        if self.backend is None:
+            return
+
+        self.invalidations += 1
+        await self.backend.invalidate(username, scope)
+
+    def stats(self) -> Dict[str, float]:
+        """Returns the hit/miss counters, and the loads saved by sharing them
+
+        Returns:
+            Dict[str, float]: counters, hit ratio and backend counters
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "coalesced": self.coalesced,
+            **(self.backend.stats() if self.backend is not None else {}),
+        }
+
+
+def create_read_cache(settings: Dict) -> ReadCache:
+    """Creates the read cache from the config
+
+    * "memory" caches in the worker
+    * "redis" caches in CACHE_URL, shared by every worker
+    * "none" disables the cache
+
+    Args:
+        settings (Dict): the app config
+
+    Returns:
+        ReadCache: the cache
+    """
+    if settings["CACHE_BACKEND"] == "none":
+        return ReadCache()
+
+    if settings["CACHE_BACKEND"] == "memory":
+        return ReadCache(
+            MemoryCacheBackend(
+                max_size=settings["CACHE_MAX_SIZE"], ttl=settings["CACHE_TTL"]
+            )
+        )
+
+    if settings["CACHE_BACKEND"] == "redis":
+        try:
+            # pylint: disable=import-outside-toplevel
+            from redis.asyncio import Redis
+        except ImportError as exc:
+            raise RuntimeError("CACHE_BACKEND=redis requires redis>=4.2") from exc
+
+        return ReadCache(
+            RedisCacheBackend(
+                Redis.from_url(settings["CACHE_URL"]), ttl=settings["CACHE_TTL"]
+            )
+        )
+
+    raise ValueError("Unknown CACHE_BACKEND " + settings["CACHE_BACKEND"])
+
+
+# Shared by the routers, swap `read_cache.backend` to use a stand-in in tests
+read_cache = create_read_cache(config)
@@ -0,0 +1,122 @@
+"""Utilities for conditional GETs of a user's tasks and lists, and
+conditional writes of a task
+
+The ETag of a read is derived from the user's version counter (see
+main/dependencies/versions.py), which every write bumps, and the read's
+path and query. Checking it therefore costs one lookup of a tiny document
+instead of running the read.
+
+The ETag of a single task is the version of its last write, which a client
+sends back in If-Match so the write fails if someone else got there first.
+"""
+
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from typing import Dict, List, Optional
+import hashlib
+
+# Fast
+from fastapi import Request, Response
+
+# Module
+from main.dependencies.versions import is_settled
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+
+def make_etag(version: int, request: Request) -> str:
+    """Weak ETag for a read of a user's data at a given version
+
+    Args:
+        version (int): the user's current version
+        request (Request): the read, different queries get different ETags
+
+    Returns:
+        str: the ETag
+    """
+    query = hashlib.sha1(
+        (request.url.path + "?" + request.url.query).encode()
+    ).hexdigest()[:16]
+
+    return f'W/"{version}-{query}"'
+
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    """Whether an If-None-Match header matches the ETag
+
+    Args:
+        etag (str): the current ETag
+        if_none_match (str | None): the request header
+
+    Returns:
+        bool: True if the client's copy is current
+    """
+    if if_none_match is None:
+        return False
+
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+
+    return "*" in candidates or etag in candidates
+
+
+def document_etag(document: Dict) -> str:
+    """Strong ETag of a single document, from the version of its last write
+
+    Args:
+        document (Dict): e.g. a task, as stored
+
+    Returns:
+        str: the ETag
+    """
+    return f'"{document.get("version") or 0}"'
+
+
+def precondition_met(etag: str, if_match: Optional[str]) -> bool:
+    """Whether an If-Match header allows writing the document
+
+    Args:
+        etag (str): the document's current ETag, see `document_etag`
+        if_match (str | None): the request header
+
+    Returns:
+        bool: True if the write can go ahead
+    """
+    if if_match is None:
+        return True
+
+    candidates = [candidate.strip() for candidate in if_match.split(",")]
+
+    return "*" in candidates or etag in candidates
+
+
+def conditional_get(
+    request: Request, response: Response, counter: Dict
+) -> Optional[Response]:
+    """Short-circuits a read the client already has a current copy of
+
+    * Sets the ETag on `response` so the client can revalidate next time
+    * Right after a write the ETag is never matched, as the write may have
+      reserved its version without having finished yet
+
+    Args:
+        request (Request): the read
+        response (Response): the route's response, to set headers on
+        counter (Dict): the user's version counter, see `current_version`
+
+    Returns:
+        Response | None: a 304 to return straight away, None to run the read
+    """
+    etag = make_etag(counter["version"], request)
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+
+    if is_settled(counter) and etag_matches(etag, request.headers.get("If-None-Match")):
+        return Response(status_code=304, headers=dict(response.headers))
+
+    return None
@@ -0,0 +1,87 @@
+"""How task and list ids are stored and matched, see ID_FORMAT
+
+* "string" stores ids as 36 character strings
+* "uuid" stores them as BSON binary UUIDs (subtype 4), a third of the size
+* "mixed" writes binary UUIDs but matches both forms, run the app like this
+  while `python -m main.migrate_ids` converts the existing documents
+"""
+
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from typing import Dict, Iterable, Union
+from uuid import UUID
+
+# Module
+from main.config import config
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+
+def stored_id(value: Union[str, UUID]) -> Union[str, UUID]:
+    """The id as it is written to the database
+
+    Args:
+        value (str | UUID): the id
+
+    Returns:
+        str | UUID: the id in the stored form
+    """
+    if config["ID_FORMAT"] == "string":
+        return str(value)
+
+    return value if isinstance(value, UUID) else UUID(value)
+
+
+def match_id(value: Union[str, UUID]):
+    """Filter value matching the id
+
+    Args:
+        value (str | UUID): the id
+
+    Returns:
+        the id in the stored form, or an $in of both forms when "mixed"
+    """
+    if config["ID_FORMAT"] == "mixed":
+        return {"$in": [stored_id(value), str(value)]}
+
+    return stored_id(value)
+
+
+def match_ids(values: Iterable[Union[str, UUID]]) -> Dict:
+    """Filter value matching any of the ids
+
+    Args:
+        values (Iterable[str | UUID]): the ids
+
+    Returns:
+        Dict: an $in of the ids, in both forms when "mixed"
+    """
+    values = list(values)
+    matches = [stored_id(value) for value in values]
+    if config["ID_FORMAT"] == "mixed":
+        matches += [str(value) for value in values]
+
+    return {"$in": matches}
+
+
+def after_id(value: Union[str, UUID]) -> Dict:
+    """Filter matching the documents after the id in _id order
+
+    Strings sort before binary data, so when "mixed" every binary id comes
+    after a string id
+
+    Args:
+        value (str | UUID): the id of the last document of a page
+
+    Returns:
+        Dict: the filter to add to the read
+    """
+    if config["ID_FORMAT"] == "mixed" and not isinstance(value, UUID):
+        return {"$or": [{"_id": {"$gt": value}}, {"_id": {"$type": "binData"}}]}
+
+    return {"_id": {"$gt": stored_id(value)}}
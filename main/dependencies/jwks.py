@@ -0,0 +1,237 @@
+"""Caches the JSON Web Key Set (JWKS) used to verify access tokens"""
+
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from typing import Callable, Dict, List, Optional
+import json
+import logging
+import threading
+import time
+from urllib.parse import urlparse
+from urllib.request import urlopen
+
+# ----------------------------------------------------------------------------
+# Set-up
+# ----------------------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+
+# A key source returns a JWKS document i.e. {"keys": [...]}
+KeySource = Callable[[], Dict]
+
+# ----------------------------------------------------------------------------
+# Key sources
+# ----------------------------------------------------------------------------
+
+
+def url_key_source(url: str, timeout: float = 5.0) -> KeySource:
+    """Fetches the JWKS over HTTP(S), e.g. from MSFT or a stub JWKS server
+
+    Args:
+        url (str): the JWKS endpoint
+        timeout (float, optional): seconds to wait for the endpoint
+
+    Returns:
+        KeySource: callable returning the JWKS
+    """
+
+    def fetch() -> Dict:
+        with urlopen(url, timeout=timeout) as jsonurl:
+            return json.loads(jsonurl.read())
+
+    return fetch
+
+
+def file_key_source(path: str) -> KeySource:
+    """Reads the JWKS from a local JSON file
+
+    Args:
+        path (str): path to the JWKS file
+
+    Returns:
+        KeySource: callable returning the JWKS
+    """
+
+    def fetch() -> Dict:
+        with open(path, encoding="utf-8") as jwks_file:
+            return json.load(jwks_file)
+
+    return fetch
+
+
+def static_key_source(jwks: Dict) -> KeySource:
+    """Serves a fixed JWKS held in memory
+
+    Args:
+        jwks (Dict): the JWKS
+
+    Returns:
+        KeySource: callable returning the JWKS
+    """
+    return lambda: jwks
+
+
+def key_source_from_uri(uri: str) -> KeySource:
+    """Picks a key source based on the scheme of the URI
+
+    * http(s)://... is fetched over the network
+    * file://... or a bare path is read from disk
+
+    Args:
+        uri (str): location of the JWKS
+
+    Returns:
+        KeySource: callable returning the JWKS
+    """
+    parsed = urlparse(uri)
+
+    if parsed.scheme in ["http", "https"]:
+        return url_key_source(uri)
+
+    if parsed.scheme == "file":
+        return file_key_source(parsed.path)
+
+    return file_key_source(uri)
+
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+
+class JWKSUnavailable(Exception):
+    """Raised when no key set has ever been loaded"""
+
+
+class JWKSCache:
+    """Thread safe in-process cache of a JWKS
+
+    * Keys are served from memory until they are older than `ttl`, after
+      which they are still served while a background refresh runs
+    * An unknown `kid` forces a refresh, at most once per
+      `min_refresh_interval` so bad tokens cannot cause a fetch storm
+    * If a refresh fails the stale keys keep being served
+    * Listeners are called whenever a refresh changes the key set
+    """
+
+    def __init__(
+        self, source: KeySource, ttl: float = 3600, min_refresh_interval: float = 60
+    ):
+        self.source = source
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+
+        self._keys: Dict[str, Dict] = {}
+        self._fetched_at: Optional[float] = None
+        self._last_attempt: Optional[float] = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._listeners: List[Callable[[], None]] = []
+
+    @property
+    def loaded(self) -> bool:
+        """Whether a key set has been loaded"""
+        return self._fetched_at is not None
+
+    def add_listener(self, callback: Callable[[], None]) -> None:
+        """Registers a callback for when the keys rotate
+
+        Args:
+            callback (Callable[[], None]): called with no arguments
+        """
+        self._listeners.append(callback)
+
+    def get_key(self, kid: str) -> Optional[Dict]:
+        """Returns the key with the given id
+
+        Args:
+            kid (str): the key id from the JWT header
+
+        Raises:
+            JWKSUnavailable: if the key set could never be loaded
+
+        Returns:
+            Dict | None: the key, None if the key set does not contain it
+        """
+        if self._fetched_at is None:
+            self._refresh(force=False)
+            if self._fetched_at is None:
+                raise JWKSUnavailable("Unable to load the JWKS")
+
+        elif time.monotonic() - self._fetched_at > self.ttl:
+            self._refresh_in_background()
+
+        key = self._keys.get(kid)
+
+        # The keys may have been rotated since the last fetch
+        if key is None:
+            self._refresh(force=False)
+            key = self._keys.get(kid)
+
+        return key
+
+    def refresh(self) -> bool:
+        """Fetches the key set from the source now, ignoring the rate limit
+
+        Returns:
+            bool: whether the refresh succeeded
+        """
+        return self._refresh(force=True)
+
+    def _refresh(self, force: bool) -> bool:
+        """Fetches the key set from the source, keeping the old keys on failure
+
+        Args:
+            force (bool): skip the rate limit on fetches
+
+        Returns:
+            bool: whether a fetch happened and succeeded
+        """
+        with self._lock:
+            # Concurrent callers queue on the lock, only the first one fetches
+            if not force and not self._may_refresh():
+                return False
+
+            self._last_attempt = time.monotonic()
+
+            try:
+                jwks = self.source()
+                keys = {key["kid"]: key for key in jwks["keys"]}
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Unable to refresh the JWKS, serving stale keys")
+                return False
+
+            rotated = self._fetched_at is not None and keys != self._keys
+            self._keys = keys
+            self._fetched_at = time.monotonic()
+
+        if rotated:
+            for callback in self._listeners:
+                callback()
+
+        return True
+
+    def _may_refresh(self) -> bool:
+        """Rate limits fetches so bad tokens cannot cause a fetch storm"""
+        return (
+            self._last_attempt is None
+            or time.monotonic() - self._last_attempt >= self.min_refresh_interval
+        )
+
+    def _refresh_in_background(self) -> None:
+        """Starts a refresh on a daemon thread unless one is running already"""
+        with self._lock:
+            if self._refreshing or not self._may_refresh():
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self._refresh(force=False)
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, daemon=True).start()
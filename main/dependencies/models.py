@@ -4,9 +4,15 @@
 # Imports
 # ----------------------------------------------------------------------------
 
-from typing import Optional
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional, Union
 from uuid import UUID, uuid4
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, constr, root_validator, validator
+
+from main.dependencies.ranks import RANK_PATTERN
+
+# A key ordering tasks by hand, see main/dependencies/ranks.py
+Position = constr(regex=RANK_PATTERN, max_length=256)
 
 
 # ----------------------------------------------------------------------------
@@ -29,6 +35,7 @@ class Task(BaseModel):
     notes: Optional[str]
     complete: bool = False
     pinned: bool = False
+    position: Optional[Position]  # Set to the end of the list if not given
 
     class Config:
         schema_extra = {
@@ -49,6 +56,15 @@ class TaskInDB(Task):
     # -> use alias
     id: UUID = Field(default_factory=uuid4, alias="_id")
 
+    # Set by the server on every write, see main/dependencies/versions.py
+    version: Optional[int]
+    updated_at: Optional[datetime]
+
+
+class TaskSearchResult(TaskInDB):
+    # Relevance to the search, results are returned highest first
+    score: float
+
 
 class TaskUpdate(BaseModel):
     task: Optional[str]
@@ -56,6 +72,7 @@ class TaskUpdate(BaseModel):
     notes: Optional[str]
     complete: Optional[bool]
     pinned: Optional[bool]
+    position: Optional[Position]
 
     class Config:
         schema_extra = {
@@ -67,6 +84,67 @@ class TaskUpdate(BaseModel):
         }
 
 
+class TaskMove(BaseModel):
+    id: UUID = Field(alias="_id")
+    # The task to place it after, None for the top of the task's list
+    after: Optional[UUID]
+
+
+class TaskBatchOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    id: Optional[UUID] = Field(alias="_id")  # For update and delete
+    task: Optional[Task]  # For create
+    update: Optional[TaskUpdate]  # For update
+
+    @root_validator(skip_on_failure=True)
+    def check_operation_fields(cls, values):  # pylint: disable=no-self-argument
+        if values["op"] == "create" and values.get("task") is None:
+            raise ValueError("create operations need a task")
+        if values["op"] == "update" and (
+            values.get("id") is None or values.get("update") is None
+        ):
+            raise ValueError("update operations need an _id and an update")
+        if values["op"] == "delete" and values.get("id") is None:
+            raise ValueError("delete operations need an _id")
+        return values
+
+
+class TaskBatch(BaseModel):
+    operations: List[TaskBatchOperation]
+    # Stop at the first failing operation
+    ordered: bool = True
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "operations": [
+                    {
+                        "op": "create",
+                        "task": {
+                            "task": "Water the plants",
+                            "list_id": "4c2bb70c-31df-4193-9dc5-6405c5dc21c8",
+                        },
+                    },
+                    {
+                        "op": "update",
+                        "_id": "0b8e8a47-0d55-4f7c-9f4e-6c4d5e0f8a61",
+                        "update": {"complete": True},
+                    },
+                    {"op": "delete", "_id": "9d1f6c2e-3f0a-4b7e-8a3c-2e5b7d9c1f40"},
+                ],
+                "ordered": False,
+            }
+        }
+
+
+class TaskBatchResult(BaseModel):
+    index: int  # Position of the operation in the batch
+    status: int  # HTTP status code of the operation
+    id: Optional[UUID] = Field(alias="_id")
+    detail: Optional[str]
+    task: Optional[TaskInDB]  # The entry after a create or update
+
+
 # ----------------------------------------------------------------------------
 # List
 # ----------------------------------------------------------------------------
@@ -79,3 +157,99 @@ class TaskList(BaseModel):
 class TaskListInDB(TaskList):
     username: str
     id: UUID = Field(default_factory=uuid4, alias="_id")
+    version: Optional[int]
+    updated_at: Optional[datetime]
+
+
+class TaskListOverview(TaskListInDB):
+    # Task counts of the list
+    total: int
+    complete: int
+    incomplete: int
+    pinned: int
+
+
+class ListDeletion(BaseModel):
+    id: UUID = Field(alias="_id")  # Of the deleted list
+    # "pending" while the tasks of the list are being removed
+    status: Literal["pending", "done"]
+    # Number of tasks removed so far
+    deleted: int
+    created_at: datetime
+    finished_at: Optional[datetime]
+
+
+# ----------------------------------------------------------------------------
+# Sync
+# ----------------------------------------------------------------------------
+
+
+class Tombstone(BaseModel):
+    id: UUID = Field(alias="_id")  # Of the deleted task or list
+    kind: Literal["task", "list"]
+    version: int
+    updated_at: datetime
+
+
+class SyncResponse(BaseModel):
+    tasks: List[TaskInDB]
+    lists: List[TaskListInDB]
+    # Tasks of a deleted list are deleted with it and have no tombstones
+    deleted: List[Tombstone]
+    # Pass as `since` to get the next changes
+    version: int
+    # Whether there are more changes after `version`
+    more: bool
+
+
+# ----------------------------------------------------------------------------
+# Batch
+# ----------------------------------------------------------------------------
+
+
+class BatchRequest(BaseModel):
+    method: Literal["GET", "POST", "PUT", "DELETE"]
+    # A task or list route, e.g. /api/v1/tasks
+    path: str
+    params: Dict[str, Union[str, int, float, bool]] = {}  # Query parameters
+    headers: Dict[str, str] = {}  # e.g. If-None-Match
+    body: Optional[Any]
+
+    @validator("headers")
+    def check_headers(cls, headers):  # pylint: disable=no-self-argument
+        # HTTP headers are latin-1
+        for key, value in headers.items():
+            try:
+                key.encode("latin-1")
+                value.encode("latin-1")
+            except UnicodeEncodeError as exc:
+                raise ValueError("headers must be latin-1, got " + repr(key)) from exc
+        return headers
+
+
+class RequestBatch(BaseModel):
+    requests: List[BatchRequest] = Field(..., min_items=1)
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "requests": [
+                    {"method": "GET", "path": "/api/v1/lists"},
+                    {
+                        "method": "GET",
+                        "path": "/api/v1/tasks",
+                        "params": {
+                            "list_id": "4c2bb70c-31df-4193-9dc5-6405c5dc21c8",
+                            "complete": False,
+                        },
+                    },
+                ]
+            }
+        }
+
+
+class BatchResponse(BaseModel):
+    index: int  # Position of the request in the batch
+    status: int  # HTTP status code of the request
+    headers: Dict[str, str]  # e.g. ETag, X-Next-Cursor
+    body: Optional[Any]
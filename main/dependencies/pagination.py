@@ -0,0 +1,356 @@
+"""Utilities for paginating, projecting and streaming reads"""
+
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+from uuid import UUID
+import base64
+import binascii
+import json
+
+# Fast
+from fastapi import HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+
+# Module
+from main.config import config
+from main.dependencies.ids import after_id
+from main.dependencies.utils import dumps
+from main.metrics import span
+
+# ----------------------------------------------------------------------------
+# Set-up
+# ----------------------------------------------------------------------------
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+
+class Page:
+    """Query parameters controlling how a read is returned"""
+
+    def __init__(
+        self,
+        limit: Optional[int] = Query(
+            None, ge=1, le=config["PAGE_SIZE_MAX"], description="Page size"
+        ),
+        cursor: Optional[str] = Query(
+            None, description="The X-Next-Cursor of the previous page"
+        ),
+        fields: Optional[str] = Query(
+            None, description="Comma separated fields to return, e.g. task,complete"
+        ),
+        stream: bool = Query(
+            False, description="Stream the documents as NDJSON as they are read"
+        ),
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.fields = fields
+        self.stream = stream
+
+
+def encode_cursor(last_id, key: Optional[str] = None) -> str:
+    """Creates an opaque cursor pointing after the given document
+
+    Args:
+        last_id: _id of the last document of the page
+        key (str, optional): its value of the field the read is sorted by
+
+    Returns:
+        str: the cursor
+    """
+    position = {"_id": str(last_id)}
+    if isinstance(last_id, UUID):
+        position["uuid"] = True
+    if key is not None:
+        position["key"] = key
+
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Union[str, UUID]:
+    """Reads a cursor created by `encode_cursor`
+
+    Args:
+        cursor (str): the cursor
+
+    Raises:
+        HTTPException: if the cursor is malformed
+
+    Returns:
+        str | UUID: _id of the last document of the previous page
+    """
+    return _decode_position(cursor)[0]
+
+
+def _decode_position(cursor: str) -> Tuple[Union[str, UUID], Optional[str]]:
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        _id = UUID(position["_id"]) if position.get("uuid") else position["_id"]
+        key = position.get("key")
+        if key is not None and not isinstance(key, str):
+            raise TypeError("Cursor key must be a string")
+        return _id, key
+    except (
+        binascii.Error,
+        ValueError,
+        KeyError,
+        TypeError,
+        AttributeError,
+    ) as exc:
+        raise HTTPException(400, "Invalid cursor") from exc
+
+
+def encode_offset(offset: int) -> str:
+    """Creates an opaque cursor for results which are not in _id order, e.g.
+    ranked search results
+
+    Args:
+        offset (int): number of results already returned
+
+    Returns:
+        str: the cursor
+    """
+    return base64.urlsafe_b64encode(json.dumps({"offset": offset}).encode()).decode()
+
+
+def decode_offset(cursor: str) -> int:
+    """Reads a cursor created by `encode_offset`
+
+    Args:
+        cursor (str): the cursor
+
+    Raises:
+        HTTPException: if the cursor is malformed
+
+    Returns:
+        int: number of results to skip
+    """
+    try:
+        offset = json.loads(base64.urlsafe_b64decode(cursor.encode()))["offset"]
+    except (
+        binascii.Error,
+        ValueError,
+        KeyError,
+        TypeError,
+    ) as exc:
+        raise HTTPException(400, "Invalid cursor") from exc
+
+    if not isinstance(offset, int) or offset < 0:
+        raise HTTPException(400, "Invalid cursor")
+
+    return offset
+
+
+def parse_fields(fields: Optional[str], allowed: Set[str]) -> Optional[Dict]:
+    """Turns a comma separated list of fields into a Mongo projection
+
+    Args:
+        fields (str | None): e.g. "task,complete"
+        allowed (Set[str]): the fields that can be requested
+
+    Raises:
+        HTTPException: if an unknown field is requested
+
+    Returns:
+        Dict | None: the projection, None to return whole documents
+    """
+    if not fields:
+        return None
+
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - allowed
+    if unknown:
+        raise HTTPException(400, "Unknown fields: " + ", ".join(sorted(unknown)))
+
+    # _id is always returned so the documents can be identified and paginated
+    return {field: 1 for field in requested | {"_id"}}
+
+
+async def _ndjson(cursor) -> AsyncIterator[bytes]:
+    async for document in cursor:
+        yield dumps(document) + b"\n"
+
+
+async def read_page(
+    collection,
+    database_filter: Dict,
+    page: Page,
+    projection: Optional[Dict],
+    session=None,
+    order_by: Optional[str] = None,
+) -> Dict:
+    """Reads one (non-streamed) page of documents
+
+    Args:
+        collection: the (async) collection to read
+        database_filter (Dict): the filter selecting the documents
+        page (Page): pagination options
+        projection (Dict | None): the fields to return
+        session (optional): the session to read in, see Repository.session
+        order_by (str, optional): a string field to sort by before _id
+
+    Returns:
+        Dict: "documents" and the "next" cursor, None on the last page
+    """
+    if order_by is not None and projection is not None:
+        projection = {**projection, order_by: 1}
+
+    cursor = _find(collection, database_filter, page, projection, session, order_by)
+
+    # Read one extra document to find out whether there is a next page
+    next_cursor = None
+    if page.limit is not None:
+        documents = await cursor.limit(page.limit + 1).to_list(length=None)
+        if len(documents) > page.limit:
+            documents = documents[: page.limit]
+            next_cursor = encode_cursor(
+                documents[-1]["_id"],
+                key=documents[-1].get(order_by) if order_by is not None else None,
+            )
+    else:
+        documents = await cursor.to_list(length=None)
+
+    return {"documents": documents, "next": next_cursor}
+
+
+def _find(
+    collection,
+    database_filter: Dict,
+    page: Page,
+    projection: Optional[Dict],
+    session=None,
+    order_by: Optional[str] = None,
+):
+    if page.cursor is not None:
+        last_id, key = _decode_position(page.cursor)
+        database_filter = {**database_filter, **_after(last_id, key, order_by)}
+
+    cursor = collection.find(
+        filter=database_filter, projection=projection, session=session
+    )
+    if order_by is not None:
+        cursor = cursor.sort([(order_by, 1), ("_id", 1)])
+    elif page.limit is not None or page.cursor is not None:
+        cursor = cursor.sort("_id", 1)
+
+    return cursor
+
+
+def _after(last_id, key: Optional[str], order_by: Optional[str]) -> Dict:
+    """Filter matching the documents after a cursor, in `order_by` then _id
+    order. Documents without the field sort first"""
+    if order_by is None:
+        return after_id(last_id)
+
+    if key is None:
+        return {
+            "$or": [
+                {order_by: {"$type": "string"}},
+                {order_by: None, **after_id(last_id)},
+            ]
+        }
+
+    return {
+        "$or": [
+            {order_by: {"$gt": key}},
+            {order_by: key, **after_id(last_id)},
+        ]
+    }
+
+
+async def find_page(
+    collection,
+    database_filter: Dict,
+    page: Page,
+    allowed_fields: Set[str],
+    response: Response,
+    read_through: Optional[
+        Callable[[Callable[[], Awaitable[Dict]]], Awaitable[Dict]]
+    ] = None,
+    session=None,
+    order_by: Optional[str] = None,
+) -> Union[List[Dict], Response]:
+    """Runs a find for one page of documents in _id order, or `order_by` then
+    _id order
+
+    * Without a limit every matching document is returned
+    * With a limit the cursor of the next page is set in the X-Next-Cursor
+      header, which is absent on the last page
+    * Streamed responses are written as the database cursor yields documents,
+      the next cursor is not known up front so it is never set
+
+    Args:
+        collection: the (async) collection to read
+        database_filter (Dict): the filter selecting the documents
+        page (Page): pagination, projection and streaming options
+        allowed_fields (Set[str]): the fields that can be projected
+        response (Response): the route's response, its headers are kept
+        read_through (optional): called with the read of the page, e.g. to
+            serve it from a cache, streamed reads are never passed to it
+        session (optional): the session to read in, see Repository.session.
+            Streamed reads outlive the route so they are read without it
+        order_by (str, optional): a string field to sort by before _id, the
+            read should be backed by an index on the filter then this field
+
+    Returns:
+        List[Dict] | Response: the documents, or a ready made response if
+            they are partial or TRUSTED_READS skips validating them against
+            the route's response model
+    """
+    projection = parse_fields(page.fields, allowed_fields)
+
+    if page.stream:
+        cursor = _find(collection, database_filter, page, projection, order_by=order_by)
+        if page.limit is not None:
+            cursor = cursor.limit(page.limit)
+        return StreamingResponse(
+            _ndjson(cursor),
+            media_type="application/x-ndjson",
+            headers=dict(response.headers),
+        )
+
+    async def read() -> Dict:
+        return await read_page(
+            collection,
+            database_filter,
+            page,
+            projection,
+            session=session,
+            order_by=order_by,
+        )
+
+    result = await (read() if read_through is None else read_through(read))
+
+    if result["next"] is not None:
+        response.headers[NEXT_CURSOR_HEADER] = result["next"]
+
+    if projection is None and not config["TRUSTED_READS"]:
+        return result["documents"]
+
+    # The documents were written by the API so they already match the model
+    with span("serialize"):
+        content = dumps(result["documents"])
+
+    return Response(
+        content=content,
+        media_type="application/json",
+        headers=dict(response.headers),
+    )
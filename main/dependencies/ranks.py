@@ -0,0 +1,134 @@
+"""Rank keys for ordering tasks by hand
+
+A task's `position` is a string of base 62 digits and tasks are listed in
+string order. A key can always be made between any two others, so moving a
+task rewrites only that task. Keys grow longer as tasks are squeezed into the
+same gap, when one gets longer than RANK_MAX_LENGTH the list is rebalanced in
+the background, see main/rebalance.py.
+"""
+
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from typing import List, Optional
+import math
+
+# Module
+from main.dependencies.ids import match_id
+
+# ----------------------------------------------------------------------------
+# Set-up
+# ----------------------------------------------------------------------------
+
+# In ASCII order so keys compare the same in Python and Mongo
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+
+# Valid keys, a trailing "0" would leave no room before the key
+RANK_PATTERN = "^[0-9A-Za-z]*[1-9A-Za-z]$"
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+
+def rank_between(before: Optional[str], after: Optional[str]) -> str:
+    """A key which sorts strictly between two others
+
+    * Between two keys the middle digit is used, so repeated inserts into the
+      same gap grow the key by a digit every five or six inserts
+    * Before the first or after the last key a digit is stepped by one, so
+      prepending or appending grows the key by a digit every 30 or so
+
+    Args:
+        before (str | None): the key to come after, None for the start
+        after (str | None): the key to come before, None for the end
+
+    Raises:
+        ValueError: if `before` does not sort before `after`
+
+    Returns:
+        str: the new key
+    """
+    if before is not None and after is not None and before >= after:
+        raise ValueError(f"{before!r} does not sort before {after!r}")
+
+    lower = before or ""
+    key = ""
+    for i in range(len(lower) + len(after or "") + 1):
+        low = DIGITS.index(lower[i]) if i < len(lower) else 0
+        high = DIGITS.index(after[i]) if after is not None and i < len(after) else 62
+
+        if low == high:
+            key += DIGITS[low]
+            continue
+
+        if after is None and i < len(lower):
+            middle = low + 1
+        elif before is None and after is not None:
+            middle = high - 1
+        else:
+            middle = (low + high) // 2
+
+        if middle > low and middle < high:
+            return key + DIGITS[middle]
+
+        # No digit fits, anything longer starting with `low` sorts before
+        # `after` so only `before` bounds the rest
+        key += DIGITS[low]
+        after = None
+
+    # Unreachable, every pass either returns or leaves the top unbounded
+    raise AssertionError("No key between " + repr(before) + " and " + repr(after))
+
+
+def evenly_spaced(count: int) -> List[str]:
+    """`count` ascending keys spread over the key space, as short as possible
+
+    Args:
+        count (int): the number of keys
+
+    Returns:
+        List[str]: the keys
+    """
+    width = max(1, math.ceil(math.log(count + 1, 62)))
+    step = 62**width / (count + 1)
+
+    keys = []
+    for i in range(1, count + 1):
+        value = int(step * i)
+        digits = ""
+        for _ in range(width):
+            value, digit = divmod(value, 62)
+            digits = DIGITS[digit] + digits
+        keys.append(digits.rstrip("0"))
+    return keys
+
+
+async def last_position(collection, username: str, list_id) -> Optional[str]:
+    """The key of the last task of a list
+
+    Args:
+        collection: the (async) tasks collection
+        username (str): the owner of the list
+        list_id: id of the list
+
+    Returns:
+        str | None: the key, None if no task of the list has one
+    """
+    tasks = (
+        await collection.find(
+            filter={
+                "list_id": match_id(list_id),
+                "username": username,
+                "position": {"$type": "string"},
+            },
+            projection={"position": 1},
+        )
+        .sort("position", -1)
+        .limit(1)
+        .to_list(length=None)
+    )
+
+    return tasks[0]["position"] if tasks else None
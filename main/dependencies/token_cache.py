@@ -0,0 +1,127 @@
+"""Caches validated access tokens so repeat requests skip RS256 verification"""
+
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import hashlib
+import threading
+import time
+
+# Module
+from main.dependencies.models import User
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+
+class TokenCache:
+    """Thread safe LRU cache of token hash -> (User, claims)
+
+    * Entries expire at the `exp` claim of their token
+    * Tokens are stored hashed so the cache never holds usable credentials
+    """
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+
+        self._entries: "OrderedDict[str, Tuple[User, Dict, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _hash(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[Tuple[User, Dict]]:
+        """Returns the user and claims of a previously validated token
+
+        Args:
+            token (str): JWT
+
+        Returns:
+            Tuple[User, Dict] | None: None if not cached or expired
+        """
+        token_hash = self._hash(token)
+
+        with self._lock:
+            entry = self._entries.get(token_hash)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            user, claims, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[token_hash]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(token_hash)
+            self.hits += 1
+
+            return user, claims
+
+    def peek(self, token: str) -> Optional[User]:
+        """Returns the user of a previously validated token without counting
+        a hit or a miss, or refreshing its place in the LRU
+
+        Args:
+            token (str): JWT
+
+        Returns:
+            User | None: None if not cached or expired
+        """
+        with self._lock:
+            entry = self._entries.get(self._hash(token))
+
+        if entry is None or entry[2] <= time.time():
+            return None
+        return entry[0]
+
+    def put(self, token: str, user: User, claims: Dict) -> None:
+        """Caches a validated token until its `exp` claim
+
+        Args:
+            token (str): JWT
+            user (User): the user the token identifies
+            claims (Dict): the validated payload
+        """
+        expires_at = claims.get("exp")
+        if expires_at is None:
+            return
+
+        token_hash = self._hash(token)
+
+        with self._lock:
+            self._entries[token_hash] = (user, claims, float(expires_at))
+            self._entries.move_to_end(token_hash)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drops every entry, e.g. when the signing keys rotate"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the hit/miss counters
+
+        Returns:
+            Dict[str, int]: counters and current size
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+        }
@@ -6,8 +6,6 @@
 
 # Core
 from typing import Dict
-import json
-from urllib.request import urlopen
 
 # Fast
 from fastapi.security import OAuth2PasswordBearer
@@ -19,7 +17,10 @@ from jose.backends.base import Key
 
 # Module
 from main.config import config
+from main.dependencies.jwks import JWKSCache, JWKSUnavailable, key_source_from_uri
 from main.dependencies.models import User
+from main.dependencies.token_cache import TokenCache
+from main.metrics import span
 
 # ----------------------------------------------------------------------------
 # Set-up
@@ -27,6 +28,17 @@ from main.dependencies.models import User
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="fuckoff")
 
+# Swap `jwks_cache.source` to use a local file or stub JWKS server in tests
+jwks_cache = JWKSCache(
+    source=key_source_from_uri(config["JWKS_URI"]),
+    ttl=config["JWKS_TTL"],
+    min_refresh_interval=config["JWKS_MIN_REFRESH_INTERVAL"],
+)
+
+# Tokens validated against keys which have since rotated must be re-checked
+token_cache = TokenCache(max_size=config["TOKEN_CACHE_SIZE"])
+jwks_cache.add_listener(token_cache.clear)
+
 # ----------------------------------------------------------------------------
 # Main
 # ----------------------------------------------------------------------------
@@ -43,20 +55,32 @@ def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
     Returns:
         User: Identifies the token sender to the backend
     """
-    # Validate the key
-    key = validate_key(token=token)
+    # Skip the verification if the token has been validated before
+    with span("auth.token_cache"):
+        cached = token_cache.get(token)
+    if cached is not None:
+        return cached[0]
+
+    # Validate the key, fetching the JWKS if needed
+    with span("auth.validate_key"):
+        key = validate_key(token=token)
 
     # Validate the payload
-    payload = validate_payload(
-        token=token,
-        key=key,
-    )
+    with span("auth.validate_payload"):
+        payload = validate_payload(
+            token=token,
+            key=key,
+        )
+
+    user = User(username=payload.get("sub"))
+    token_cache.put(token=token, user=user, claims=payload)
 
-    return User(username=payload.get("sub"))
+    return user
 
 
 def validate_key(token: str) -> Dict[str, str]:
-    """Cross references MSFT JWKS with the key provided in the JWT header
+    """Cross references the (cached) MSFT JWKS with the key provided in the JWT
+    header
 
     Args:
         token (str): JWT
@@ -69,25 +93,21 @@ def validate_key(token: str) -> Dict[str, str]:
     except jwt.JWTError as exc:
         raise HTTPException(401, "Unable to decode token header") from exc
 
-    # Get the JSON Web Key Set from MSFT for the tenant
-    with urlopen(
-        "https://login.microsoftonline.com/"
-        + config["TENANT_ID"]
-        + "/discovery/v2.0/keys"
-    ) as jsonurl:
-        jwks = json.loads(jsonurl.read())
+    # Find the key that was used in the JSON Web Key Set from MSFT
+    try:
+        key = jwks_cache.get_key(unverified_header.get("kid"))
+    except JWKSUnavailable as exc:
+        raise HTTPException(503, "Unable to fetch signing keys") from exc
 
-    # Iterate through the keys to see which one was used and save it
     rsa_key = {}
-    for key in jwks["keys"]:
-        if key["kid"] == unverified_header["kid"]:
-            rsa_key = {
-                "kty": key["kty"],
-                "kid": key["kid"],
-                "use": key["use"],
-                "n": key["n"],
-                "e": key["e"],
-            }
+    if key is not None:
+        rsa_key = {
+            "kty": key["kty"],
+            "kid": key["kid"],
+            "use": key["use"],
+            "n": key["n"],
+            "e": key["e"],
+        }
     if not rsa_key:
         raise HTTPException(401, "Unable to find appropriate key")
 
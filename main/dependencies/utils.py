@@ -5,19 +5,81 @@
 # ----------------------------------------------------------------------------
 
 # Core
+from datetime import datetime
 from typing import Dict, Union
+from uuid import UUID
+
+# Other
+import orjson
 
 # Fast
 from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
 
 # Module
-from main.dependencies.models import User
+from main.config import config
+from main.dependencies.ids import stored_id
+from main.dependencies.models import TaskUpdate, User
 
 # ----------------------------------------------------------------------------
 # Main
 # ----------------------------------------------------------------------------
 
 
+def to_document(model: BaseModel) -> Dict:
+    """Converts a model into the document stored in the database
+
+    * UUIDs are stored as strings, or as BSON UUIDs, see ID_FORMAT
+    * datetimes are kept as BSON dates so they can be compared in queries
+
+    Args:
+        model (BaseModel): e.g. a TaskInDB
+
+    Returns:
+        Dict: the document
+    """
+    custom_encoder = {datetime: lambda value: value}
+    if config["ID_FORMAT"] != "string":
+        custom_encoder[UUID] = lambda value: value
+
+    return jsonable_encoder(model, custom_encoder=custom_encoder)
+
+
+def json_default(value):
+    """JSON encodes the BSON types the API stores, for use as `default` in
+    json.dumps"""
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value) -> bytes:
+    """Encodes documents read from the database straight to JSON bytes
+
+    Args:
+        value: e.g. a list of documents
+
+    Returns:
+        bytes: the JSON
+    """
+    return orjson.dumps(value, default=json_default)
+
+
+def invalid_document() -> HTTPException:
+    """The error for a document which does not exist or belongs to someone else
+
+    Returns:
+        HTTPException: the exception to raise in the route
+    """
+    return HTTPException(
+        status_code=400,
+        detail="Invalid document, ensure the document exists and you are the owner",
+    )
+
+
 def validate_document_owner(
     user: User, mongo_result: Dict
 ) -> Union[HTTPException, None]:
@@ -33,10 +95,7 @@ def validate_document_owner(
     Returns:
         HTTPException | None: An exception to raise in the route if required
     """
-    invalid_id = HTTPException(
-        status_code=400,
-        detail="Invalid document, ensure the document exists and you are the owner",
-    )
+    invalid_id = invalid_document()
 
     if mongo_result is None:
         return invalid_id
@@ -47,6 +106,29 @@ def validate_document_owner(
     return None
 
 
+def task_changes(task_update: TaskUpdate) -> Dict:
+    """The fields a task update would set in the database
+
+    * Ignores empty text (for example no entry to notes)
+    * Ignores fields which were not sent
+
+    Args:
+        task_update (TaskUpdate): the changes in the request
+
+    Returns:
+        Dict: JSON encoded values keyed by field, can be empty
+    """
+    changes = {
+        key: item
+        for key, item in jsonable_encoder(task_update).items()
+        if item not in ["", None]
+    }
+    if "list_id" in changes:
+        changes["list_id"] = stored_id(changes["list_id"])
+
+    return changes
+
+
 def repeated_entry(old_document: Dict, key: str, new_value) -> bool:
     """Checks the update is actually an update
 
@@ -0,0 +1,234 @@
+"""Utilities for the per-user change versions behind delta sync
+
+Every write reserves a version from a per-user counter and stamps it, with
+the time, on the documents it touches. Deletes leave a tombstone carrying the
+version of the delete. A client which has seen version N can then ask for
+everything with a higher version.
+
+Tombstones are kept for TOMBSTONE_TTL_DAYS. The cleanup worker removes older
+ones and records the highest version it removed as the user's "expired"
+version, a client which has not synced since then has to load everything
+again.
+
+The counter also counts the writes to each scope, a list id for its tasks or
+"lists" for the user's lists, which key the read cache (see
+main/dependencies/cache.py) so a write only moves the keys of what it
+touched.
+"""
+
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List
+import asyncio
+
+# Other
+from pymongo import ReturnDocument
+
+# Module
+from main.cleanup import pending_list_deletions
+from main.config import config
+from main.dependencies.ids import match_ids, stored_id
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+
+async def reserve_versions(
+    database, username: str, count: int = 1, scopes: Iterable[str] = ()
+) -> int:
+    """Reserves `count` consecutive versions for the user's next writes
+
+    Args:
+        database: the (async) database
+        username (str): the user making the writes
+        count (int, optional): how many versions to reserve
+        scopes (Iterable[str], optional): what the writes touch, the id of
+            each list whose tasks they change and "lists" if they change lists
+
+    Returns:
+        int: the first reserved version
+    """
+    now = datetime.utcnow()
+    update: Dict = {"$inc": {"version": count}, "$set": {"updated_at": now}}
+    for scope in set(scopes):
+        update["$inc"]["scopes." + scope + ".version"] = 1
+        update["$set"]["scopes." + scope + ".updated_at"] = now
+
+    counter = await database["versions"].find_one_and_update(
+        filter={"_id": username},
+        update=update,
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+
+    return counter["version"] - count + 1
+
+
+async def current_version(database, username: str, session=None) -> Dict:
+    """The user's latest reserved version and when it was reserved
+
+    Args:
+        database: the (async) database
+        username (str): the user
+        session (optional): the session to read in, see Repository.session
+
+    Returns:
+        Dict: "version", 0 if the user never wrote, "updated_at" and
+            "scopes", the same per scope passed to `reserve_versions`
+    """
+    counter = await database["versions"].find_one(
+        filter={"_id": username}, session=session
+    )
+
+    if counter is None:
+        return {"version": 0, "updated_at": None, "scopes": {}}
+
+    return {
+        "version": counter["version"],
+        "updated_at": counter.get("updated_at"),
+        "scopes": counter.get("scopes", {}),
+    }
+
+
+def is_settled(counter: Dict) -> bool:
+    """Whether every write up to the counter's version has surely finished
+
+    A version is reserved before its write runs, so for SYNC_SETTLE_SECONDS
+    after a reservation data read at that version may still be missing it.
+
+    Args:
+        counter (Dict): as returned by `current_version`
+
+    Returns:
+        bool: True if data read now is complete up to the version
+    """
+    return counter["updated_at"] is None or counter["updated_at"] <= (
+        datetime.utcnow() - timedelta(seconds=config["SYNC_SETTLE_SECONDS"])
+    )
+
+
+def stamp(version: int) -> Dict:
+    """The fields marking a document as written at `version`
+
+    Args:
+        version (int): a reserved version
+
+    Returns:
+        Dict: the version and the time of the write
+    """
+    return {"version": version, "updated_at": datetime.utcnow()}
+
+
+async def write_tombstones(
+    database, username: str, kind: str, deletes: Dict[str, int]
+) -> None:
+    """Records deletes so delta sync can report them
+
+    Args:
+        database: the (async) database
+        username (str): the owner of the deleted documents
+        kind (str): "task" or "list"
+        deletes (Dict[str, int]): the version of each delete keyed by the id
+            of the deleted document
+    """
+    if not deletes:
+        return
+
+    await database["tombstones"].insert_many(
+        [
+            {
+                "_id": stored_id(_id),
+                "kind": kind,
+                "username": username,
+                **stamp(version),
+            }
+            for _id, version in deletes.items()
+        ]
+    )
+
+
+async def changes_expired(database, username: str, since: int) -> bool:
+    """Whether deletes after `since` may have been forgotten, see
+    `main.cleanup.expire_tombstones`
+
+    Args:
+        database: the (async) database
+        username (str): the user
+        since (int): the version the client has seen, 0 to load everything
+
+    Returns:
+        bool: True if the client has to sync again from version 0
+    """
+    if since == 0:
+        return False
+
+    counter = await database["versions"].find_one(
+        filter={"_id": username}, projection={"expired": 1}
+    )
+
+    return counter is not None and since < counter.get("expired", 0)
+
+
+async def read_changes(
+    database, username: str, since: int, limit: int, settled: bool = True
+) -> Dict:
+    """The user's tasks, lists and tombstones written after `since`
+
+    * At most `limit` changes are returned, the ones with the lowest versions
+    * The tasks of deleted lists are hidden until they are removed
+
+    Args:
+        database: the (async) database
+        username (str): the user
+        since (int): only changes with a higher version are returned
+        limit (int): the most changes to return
+        settled (bool, optional): hold back changes from the last
+            SYNC_SETTLE_SECONDS, see `is_settled`
+
+    Returns:
+        Dict: "tasks", "lists" and "deleted", the highest returned "version"
+            (`since` if there are none) and whether there are "more"
+    """
+    database_filter: Dict = {"username": username, "version": {"$gt": since}}
+    if settled:
+        database_filter["updated_at"] = {
+            "$lte": datetime.utcnow() - timedelta(seconds=config["SYNC_SETTLE_SECONDS"])
+        }
+
+    pending = await pending_list_deletions(database, username)
+    task_filter = dict(database_filter)
+    if pending:
+        task_filter["list_id"] = {"$nin": match_ids(pending)["$in"]}
+
+    async def changes(collection: str) -> List[Dict]:
+        return (
+            await database[collection]
+            .find(filter=task_filter if collection == "tasks" else database_filter)
+            .sort("version", 1)
+            .limit(limit + 1)
+            .to_list(length=None)
+        )
+
+    tasks, lists, deleted = await asyncio.gather(
+        changes("tasks"), changes("lists"), changes("tombstones")
+    )
+
+    # Keep the `limit` lowest versions across the collections
+    versions = sorted(document["version"] for document in tasks + lists + deleted)
+    more = len(versions) > limit
+    version = versions[:limit][-1] if versions else since
+
+    return {
+        "tasks": [task for task in tasks if task["version"] <= version],
+        "lists": [task_list for task_list in lists if task_list["version"] <= version],
+        "deleted": [
+            tombstone for tombstone in deleted if tombstone["version"] <= version
+        ],
+        "version": version,
+        "more": more,
+    }
@@ -0,0 +1,155 @@
+"""Wakes the event streams of users whose tasks or lists changed
+
+Event streams (see main/routers/events.py) read the changes themselves, by
+version as sync does, so the feed only has to say whose data changed:
+
+* The write routes notify the feed of their own writes straight away
+* On a replica set a change stream also reports the writes of other server
+  processes
+* Without one, e.g. on a standalone server or the in-memory backend, streams
+  still see other processes' writes every EVENTS_POLL_SECONDS
+"""
+
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Set
+import asyncio
+import logging
+
+# Other
+from pymongo.errors import OperationFailure, PyMongoError
+
+# ----------------------------------------------------------------------------
+# Set-up
+# ----------------------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+
+# Error code of a server which is not part of a replica set
+NO_CHANGE_STREAMS = 40573
+
+# Only the owner of a changed document is needed
+CHANGE_PIPELINE = [
+    {
+        "$match": {
+            "ns.coll": {"$in": ["tasks", "lists", "tombstones"]},
+            "operationType": {"$in": ["insert", "update", "replace"]},
+        }
+    },
+    {"$project": {"fullDocument.username": 1}},
+]
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+
+class EventFeed:
+    """Tells each user's open event streams when to look for changes
+
+    Args:
+        repository (Repository): watched for changes if `change_streams`
+        change_streams (bool, optional): use a change stream if the server
+            supports them
+        retry_interval (float, optional): seconds before reopening a change
+            stream which failed
+    """
+
+    def __init__(
+        self, repository, change_streams: bool = True, retry_interval: float = 15
+    ):
+        self.repository = repository
+        self.change_streams = change_streams
+        self.retry_interval = retry_interval
+
+        self.closed = False
+        self.watching = False
+        self._subscribers: Dict[str, Set[asyncio.Event]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Starts watching the change stream on the running event loop"""
+        self.closed = False
+        if self.change_streams:
+            self._task = asyncio.get_running_loop().create_task(self._watch())
+
+    async def stop(self) -> None:
+        """Ends every event stream and stops watching"""
+        self.closed = True
+        for events in self._subscribers.values():
+            for event in events:
+                event.set()
+
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    @contextmanager
+    def subscribe(self, username: str) -> Iterator[asyncio.Event]:
+        """Registers an event stream of the user
+
+        Args:
+            username (str): the user
+
+        Yields:
+            asyncio.Event: set when the user's data may have changed, or the
+                feed is closing
+        """
+        event = asyncio.Event()
+        self._subscribers.setdefault(username, set()).add(event)
+        try:
+            yield event
+        finally:
+            self._subscribers[username].discard(event)
+            if not self._subscribers[username]:
+                del self._subscribers[username]
+
+    def notify(self, username: str) -> None:
+        """Wakes the user's event streams
+
+        Args:
+            username (str): the user whose tasks or lists changed
+        """
+        for event in self._subscribers.get(username, ()):
+            event.set()
+
+    def subscribers(self) -> int:
+        """Number of open event streams"""
+        return sum(len(events) for events in self._subscribers.values())
+
+    async def _watch(self) -> None:
+        while not self.closed:
+            try:
+                async with self.repository.watch(
+                    CHANGE_PIPELINE, full_document="updateLookup"
+                ) as stream:
+                    self.watching = True
+                    async for change in stream:
+                        document = change.get("fullDocument") or {}
+                        if "username" in document:
+                            self.notify(document["username"])
+            except asyncio.CancelledError:
+                raise
+            except NotImplementedError as exc:
+                logger.info("Not watching for changes: %s", exc)
+                return
+            except OperationFailure as exc:
+                if exc.code == NO_CHANGE_STREAMS:
+                    logger.info("Not watching for changes: %s", exc)
+                    return
+                logger.exception("Change stream failed, reopening it")
+            except PyMongoError:
+                logger.exception("Change stream failed, reopening it")
+
+            self.watching = False
+            await asyncio.sleep(self.retry_interval)
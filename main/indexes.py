@@ -0,0 +1,279 @@
+"""Declares the indexes the routes rely on and keeps the database in line
+
+Run as a module to report missing, extra or unused indexes:
+
+    python -m main.indexes [--apply]
+"""
+
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple, Union
+import argparse
+import asyncio
+import json
+import logging
+import sys
+
+# Other
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+
+# Module
+from main.config import config
+
+# ----------------------------------------------------------------------------
+# Set-up
+# ----------------------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Index:
+    collection: str
+    name: str
+    keys: List[Tuple[str, Union[int, str]]]
+    options: Dict = field(default_factory=dict)
+
+    def model(self) -> IndexModel:
+        return IndexModel(self.keys, name=self.name, **self.options)
+
+    def stored_keys(self) -> List[Tuple[str, Union[int, str]]]:
+        """The keys as MongoDB reports them, text fields are stored as one
+        _fts/_ftsx pair (the in-memory backend reports the declared keys)"""
+        keys: List[Tuple[str, Union[int, str]]] = []
+        for name, kind in self.keys:
+            if kind != "text":
+                keys.append((name, kind))
+            elif ("_fts", "text") not in keys:
+                keys += [("_fts", "text"), ("_ftsx", 1)]
+        return keys
+
+
+# ----------------------------------------------------------------------------
+# Registry
+# ----------------------------------------------------------------------------
+
+INDEXES: List[Index] = [
+    # read_tasks filters on all of these (pinned is optional) and pages by _id,
+    # list_id leads so the cascade delete of a list's tasks uses it too. The
+    # list overview counts the tasks of a user's lists from this index alone
+    Index(
+        collection="tasks",
+        name="tasks_by_list",
+        keys=[
+            ("list_id", 1),
+            ("username", 1),
+            ("complete", 1),
+            ("pinned", 1),
+            ("_id", 1),
+        ],
+    ),
+    # read_tasks sorted by hand, the rebalance reads a list in this order too
+    Index(
+        collection="tasks",
+        name="tasks_by_position",
+        keys=[
+            ("list_id", 1),
+            ("username", 1),
+            ("complete", 1),
+            ("position", 1),
+            ("_id", 1),
+        ],
+    ),
+    # Task search, username leads so each search only scans the user's entries
+    Index(
+        collection="tasks",
+        name="tasks_text",
+        keys=[("username", 1), ("task", "text"), ("notes", "text")],
+        options={"weights": {"task": 3, "notes": 1}},
+    ),
+    # get_task_lists filters on username and pages by _id
+    Index(
+        collection="lists",
+        name="lists_by_user",
+        keys=[("username", 1), ("_id", 1)],
+    ),
+    # sync reads each user's changes in version order
+    Index(
+        collection="tasks",
+        name="tasks_by_version",
+        keys=[("username", 1), ("version", 1)],
+    ),
+    Index(
+        collection="lists",
+        name="lists_by_version",
+        keys=[("username", 1), ("version", 1)],
+    ),
+    Index(
+        collection="tombstones",
+        name="tombstones_by_version",
+        keys=[("username", 1), ("version", 1)],
+    ),
+    # The cleanup forgets deletes oldest first, see expire_tombstones
+    Index(
+        collection="tombstones",
+        name="tombstones_by_time",
+        keys=[("updated_at", 1)],
+    ),
+    # Reads hide the tasks of each user's pending list deletions, the cleanup
+    # works through them oldest first
+    Index(
+        collection="deletions",
+        name="deletions_by_user",
+        keys=[("username", 1), ("status", 1)],
+    ),
+    Index(
+        collection="deletions",
+        name="deletions_by_status",
+        keys=[("status", 1), ("created_at", 1)],
+    ),
+    # Finished deletions are reported for as long as tombstones are kept
+    Index(
+        collection="deletions",
+        name="deletions_ttl",
+        keys=[("finished_at", 1)],
+        options={"expireAfterSeconds": config["TOMBSTONE_TTL_DAYS"] * 24 * 60 * 60},
+    ),
+]
+
+# Indexes the registry no longer has which must not be left in place, as
+# (collection, name)
+RETIRED_INDEXES: List[Tuple[str, str]] = [
+    # Removed tombstones without recording it, see expire_tombstones
+    ("tombstones", "tombstones_ttl"),
+]
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+
+def _by_collection(indexes: List[Index]) -> Dict[str, List[Index]]:
+    collections: Dict[str, List[Index]] = {}
+    for index in indexes:
+        collections.setdefault(index.collection, []).append(index)
+    return collections
+
+
+async def apply_indexes(database, indexes: List[Index] = None) -> None:
+    """Creates the registered indexes, indexes which already exist are left as
+    they are so this is safe to run on every startup. With the registry, the
+    retired indexes are dropped too
+
+    Args:
+        database: the (async) database
+        indexes (List[Index], optional): defaults to the registry
+    """
+    if indexes is None:
+        for collection, name in RETIRED_INDEXES:
+            if name in await database[collection].index_information():
+                await database[collection].drop_index(name)
+
+    for collection, registered in _by_collection(indexes or INDEXES).items():
+        await database[collection].create_indexes(
+            [index.model() for index in registered]
+        )
+
+
+async def _index_usage(collection) -> Dict[str, int]:
+    """Number of operations per index since the server started, empty if the
+    server does not support $indexStats"""
+    try:
+        stats = await collection.aggregate([{"$indexStats": {}}]).to_list(length=None)
+    except (OperationFailure, NotImplementedError):
+        return {}
+
+    return {stat["name"]: stat["accesses"]["ops"] for stat in stats}
+
+
+async def check_indexes(database, indexes: List[Index] = None) -> Dict[str, Dict]:
+    """Compares the indexes in the database with the registry
+
+    Args:
+        database: the (async) database
+        indexes (List[Index], optional): defaults to the registry
+
+    Returns:
+        Dict[str, Dict]: per collection, the names of the missing indexes
+            (absent or with different keys), extra indexes (not in the
+            registry) and unused indexes (no operations since the server
+            started)
+    """
+    report = {}
+
+    for collection, registered in _by_collection(indexes or INDEXES).items():
+        existing = await database[collection].index_information()
+        usage = await _index_usage(database[collection])
+
+        missing = [
+            index.name
+            for index in registered
+            if index.name not in existing
+            or [tuple(key) for key in existing[index.name]["key"]]
+            not in [index.keys, index.stored_keys()]
+        ]
+        extra = [
+            name
+            for name in existing
+            if name != "_id_" and name not in {index.name for index in registered}
+        ]
+        unused = [name for name, ops in usage.items() if ops == 0 and name != "_id_"]
+
+        report[collection] = {"missing": missing, "extra": extra, "unused": unused}
+
+    return report
+
+
+async def verify_indexes(database) -> None:
+    """Applies the registry then logs anything which is still out of line
+
+    Args:
+        database: the (async) database
+    """
+    await apply_indexes(database)
+
+    for collection, result in (await check_indexes(database)).items():
+        if result["missing"]:
+            logger.warning(
+                "Indexes missing on %s: %s", collection, ", ".join(result["missing"])
+            )
+        if result["extra"]:
+            logger.info(
+                "Indexes not in the registry on %s: %s",
+                collection,
+                ", ".join(result["extra"]),
+            )
+
+
+async def _cli(apply: bool) -> int:
+    # pylint: disable=import-outside-toplevel
+    from main.database import create_client
+
+    client = create_client(config)
+    database = client[config["DB_NAME"]]
+
+    try:
+        if apply:
+            await apply_indexes(database)
+        report = await check_indexes(database)
+    finally:
+        client.close()
+
+    print(json.dumps(report, indent=2))
+
+    return 1 if any(result["missing"] for result in report.values()) else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Report missing, extra or unused indexes"
+    )
+    parser.add_argument(
+        "--apply", action="store_true", help="Create missing indexes first"
+    )
+    sys.exit(asyncio.run(_cli(apply=parser.parse_args().apply)))
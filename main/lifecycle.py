@@ -0,0 +1,117 @@
+"""Warms a server process up before it takes traffic and drains it on exit
+
+* Startup opens Mongo connections, loads the JWKS and imports modules so the
+  first requests do not pay for them
+* `/readyz` fails until then and again as soon as the process is asked to
+  stop, while `/healthz` only says the process is up
+* Once asked to stop the process keeps serving for a while, so the load
+  balancer sees `/readyz` fail and moves traffic away before the server stops
+  accepting connections, see main/serve.py
+"""
+
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from typing import List
+import asyncio
+import importlib
+import logging
+
+# ----------------------------------------------------------------------------
+# Set-up
+# ----------------------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+
+class Lifecycle:
+    """Whether the process is ready for traffic, and its in-flight requests"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.reset()
+
+    def reset(self) -> None:
+        """Back to starting up, called on startup as the app may be restarted
+        on a new event loop"""
+        self.warm = False
+        self.draining = False
+
+    def request_started(self) -> None:
+        self.in_flight += 1
+
+    def request_finished(self) -> None:
+        self.in_flight -= 1
+
+    async def drain(self, delay: float) -> None:
+        """Stops reporting ready straight away, then keeps serving for `delay`
+        seconds so the load balancer stops sending requests before the server
+        stops accepting them
+
+        Args:
+            delay (float): seconds to keep serving
+        """
+        self.draining = True
+        await asyncio.sleep(delay)
+        logger.info("Drained, %d requests still in flight", self.in_flight)
+
+
+class LifecycleMiddleware:
+    """Counts in-flight requests, and asks clients to reconnect elsewhere
+    once the process is draining"""
+
+    def __init__(self, app, lifecycle: Lifecycle):
+        self.app = app
+        self.lifecycle = lifecycle
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_close(message):
+            if message["type"] == "http.response.start" and self.lifecycle.draining:
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"connection", b"close")
+                ]
+            await send(message)
+
+        self.lifecycle.request_started()
+        try:
+            await self.app(scope, receive, send_with_close)
+        finally:
+            self.lifecycle.request_finished()
+
+
+def _import_modules(modules: List[str]) -> None:
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            logger.warning("Unable to pre-import %s", module)
+
+
+async def warm_up(repository, jwks_cache, connections: int, imports: List[str]) -> None:
+    """Does the work the first requests would otherwise wait for
+
+    Args:
+        repository (Repository): its pool is filled with `connections`
+            connections, concurrent pings each need their own
+        jwks_cache (JWKSCache): loaded so the first token is checked locally
+        connections (int): how many connections to open
+        imports (List[str]): modules to import, e.g. "jose.backends"
+    """
+    loop = asyncio.get_running_loop()
+
+    # Fetching the keys and importing block, so they run off the event loop
+    await asyncio.gather(
+        loop.run_in_executor(None, jwks_cache.refresh),
+        loop.run_in_executor(None, _import_modules, imports),
+        *[repository.ping() for _ in range(connections)],
+    )
@@ -0,0 +1,375 @@
+"""Prometheus metrics and lightweight tracing for the API
+
+* `MetricsMiddleware` times every request per route and counts those in flight
+* `MongoCommandListener` times every Mongo command per collection and counts
+  the documents it returned or wrote
+* `span` times a block of code, e.g. the steps of get_current_user
+* With tracing on, a W3C `traceparent` header is continued (or a trace is
+  started), carried through the spans and Mongo commands, logged at debug
+  level and returned on the response
+
+Everything is registered on `registry`, which the /metrics route exposes in
+the Prometheus text format.
+"""
+
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional, Tuple
+import logging
+import re
+import secrets
+import threading
+import time
+
+# Other
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+from pymongo import monitoring
+
+# ----------------------------------------------------------------------------
+# Set-up
+# ----------------------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+# ----------------------------------------------------------------------------
+# Metrics
+# ----------------------------------------------------------------------------
+
+registry = CollectorRegistry()
+
+HTTP_REQUESTS = Counter(
+    "moshi_http_requests_total",
+    "Requests handled",
+    ["method", "route", "status"],
+    registry=registry,
+)
+HTTP_DURATION = Histogram(
+    "moshi_http_request_duration_seconds",
+    "Time to handle a request, including streaming the response",
+    ["method", "route"],
+    buckets=DEFAULT_BUCKETS,
+    registry=registry,
+)
+HTTP_IN_FLIGHT = Gauge(
+    "moshi_http_requests_in_flight",
+    "Requests being handled",
+    ["method"],
+    registry=registry,
+)
+MONGO_DURATION = Histogram(
+    "moshi_mongo_command_duration_seconds",
+    "Round trip time of Mongo commands",
+    ["collection", "command"],
+    buckets=DEFAULT_BUCKETS,
+    registry=registry,
+)
+MONGO_DOCUMENTS = Counter(
+    "moshi_mongo_command_documents_total",
+    "Documents returned, inserted, updated or deleted by Mongo commands",
+    ["collection", "command"],
+    registry=registry,
+)
+MONGO_FAILURES = Counter(
+    "moshi_mongo_command_failures_total",
+    "Mongo commands which failed",
+    ["collection", "command"],
+    registry=registry,
+)
+SPAN_DURATION = Histogram(
+    "moshi_span_duration_seconds",
+    "Time spent in named steps of a request, e.g. auth.validate_key",
+    ["span"],
+    buckets=DEFAULT_BUCKETS,
+    registry=registry,
+)
+WRITES_SKIPPED = Counter(
+    "moshi_writes_skipped_total",
+    "Updates which would not change the document so were not written",
+    ["route"],
+    registry=registry,
+)
+WRITE_CONFLICTS = Counter(
+    "moshi_write_conflicts_total",
+    "Updates refused as the document changed since the client's If-Match",
+    ["route"],
+    registry=registry,
+)
+ADMISSION_REJECTED = Counter(
+    "moshi_admission_rejected_total",
+    "Requests turned away before reaching their route, see main/admission.py",
+    ["route", "reason"],
+    registry=registry,
+)
+ADMISSION_STATS = Gauge(
+    "moshi_admission",
+    "Rate limited users and database slot usage, see main/admission.py",
+    ["stat"],
+    registry=registry,
+)
+CACHE_STATS = Gauge(
+    "moshi_cache",
+    "Counters of the in-process caches",
+    ["cache", "stat"],
+    registry=registry,
+)
+
+
+def total(counter: Counter) -> float:
+    """The sum of a counter over every label value
+
+    Args:
+        counter (Counter): e.g. WRITES_SKIPPED
+
+    Returns:
+        float: the sum
+    """
+    return sum(
+        sample.value
+        for metric in counter.collect()
+        for sample in metric.samples
+        if sample.name.endswith("_total")
+    )
+
+
+# ----------------------------------------------------------------------------
+# Tracing
+# ----------------------------------------------------------------------------
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+@dataclass
+class TraceContext:
+    trace_id: str
+    span_id: str
+    flags: str = "01"
+
+    def child(self) -> "TraceContext":
+        return TraceContext(self.trace_id, secrets.token_hex(8), self.flags)
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{self.flags}"
+
+
+# The span running in this task (and the threads motor runs commands on)
+current_trace: ContextVar[Optional[TraceContext]] = ContextVar(
+    "current_trace", default=None
+)
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[TraceContext]:
+    """Reads a W3C traceparent header, None if it is absent or malformed"""
+    if not header:
+        return None
+
+    match = _TRACEPARENT.match(header.strip().lower())
+    if match is None or set(match.group(1)) == {"0"}:
+        return None
+
+    return TraceContext(match.group(1), match.group(2), match.group(3))
+
+
+@contextmanager
+def span(name: str) -> Iterator[Optional[TraceContext]]:
+    """Times a block of code, as a child span of the current trace if any
+
+    Args:
+        name (str): e.g. "auth.validate_key"
+
+    Yields:
+        TraceContext | None: the span, None when not tracing
+    """
+    parent = current_trace.get()
+    context = parent.child() if parent is not None else None
+    token = current_trace.set(context) if context is not None else None
+
+    start = time.perf_counter()
+    try:
+        yield context
+    finally:
+        duration = time.perf_counter() - start
+        SPAN_DURATION.labels(span=name).observe(duration)
+
+        if token is not None:
+            current_trace.reset(token)
+            logger.debug(
+                "span %s trace=%s span=%s parent=%s %.3fms",
+                name,
+                context.trace_id,
+                context.span_id,
+                parent.span_id,
+                duration * 1000,
+            )
+
+
+# ----------------------------------------------------------------------------
+# Middleware
+# ----------------------------------------------------------------------------
+
+
+class MetricsMiddleware:
+    """Records the latency, status and concurrency of every request
+
+    Requests are labelled by route template (e.g. /api/v1/tasks), requests
+    which match no route share the "unmatched" label
+    """
+
+    def __init__(self, app, tracing: bool = False):
+        self.app = app
+        self.tracing = tracing
+        self._routes: Optional[Dict] = None
+
+    def _route(self, scope) -> str:
+        if self._routes is None and "app" in scope:
+            self._routes = {
+                route.endpoint: route.path
+                for route in scope["app"].routes
+                if hasattr(route, "endpoint")
+            }
+        return (self._routes or {}).get(scope.get("endpoint"), "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        context = None
+        token = None
+
+        if self.tracing:
+            headers = dict(scope.get("headers", []))
+            parent = parse_traceparent(headers.get(b"traceparent", b"").decode())
+            context = (
+                parent.child()
+                if parent is not None
+                else TraceContext(secrets.token_hex(16), secrets.token_hex(8))
+            )
+            token = current_trace.set(context)
+
+        async def send_with_metrics(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if context is not None:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"traceparent", context.traceparent().encode())
+                    ]
+            await send(message)
+
+        HTTP_IN_FLIGHT.labels(method=method).inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            duration = time.perf_counter() - start
+            route = self._route(scope)
+            HTTP_IN_FLIGHT.labels(method=method).dec()
+            HTTP_DURATION.labels(method=method, route=route).observe(duration)
+            HTTP_REQUESTS.labels(method=method, route=route, status=str(status)).inc()
+
+            if token is not None:
+                current_trace.reset(token)
+                logger.debug(
+                    "request %s %s %d trace=%s span=%s %.3fms",
+                    method,
+                    route,
+                    status,
+                    context.trace_id,
+                    context.span_id,
+                    duration * 1000,
+                )
+
+
+# ----------------------------------------------------------------------------
+# Mongo
+# ----------------------------------------------------------------------------
+
+
+def _documents(command_name: str, reply: Dict) -> int:
+    cursor = reply.get("cursor")
+    if cursor is not None:
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    if command_name == "findAndModify":
+        return 1 if reply.get("value") is not None else 0
+    return int(reply.get("n", 0))
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Times every Mongo command the client sends, register it on the client
+    with `event_listeners=[...]`"""
+
+    def __init__(self):
+        self._collections: Dict[Tuple, str] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(event) -> Tuple:
+        return (event.connection_id, event.request_id)
+
+    def started(self, event) -> None:
+        collection = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        if not isinstance(collection, str):
+            collection = ""
+
+        with self._lock:
+            self._collections[self._key(event)] = collection
+
+    def _finish(self, event) -> str:
+        with self._lock:
+            return self._collections.pop(self._key(event), "")
+
+    def succeeded(self, event) -> None:
+        collection = self._finish(event)
+        duration = event.duration_micros / 1e6
+
+        MONGO_DURATION.labels(
+            collection=collection, command=event.command_name
+        ).observe(duration)
+        MONGO_DOCUMENTS.labels(collection=collection, command=event.command_name).inc(
+            _documents(event.command_name, event.reply)
+        )
+
+        context = current_trace.get()
+        if context is not None:
+            logger.debug(
+                "mongo %s %s trace=%s parent=%s %.3fms",
+                event.command_name,
+                collection,
+                context.trace_id,
+                context.span_id,
+                duration * 1000,
+            )
+
+    def failed(self, event) -> None:
+        collection = self._finish(event)
+
+        MONGO_DURATION.labels(
+            collection=collection, command=event.command_name
+        ).observe(event.duration_micros / 1e6)
+        MONGO_FAILURES.labels(collection=collection, command=event.command_name).inc()
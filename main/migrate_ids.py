@@ -0,0 +1,251 @@
+"""Converts string ids to BSON UUIDs in place, see main/dependencies/ids.py
+
+Switch the app to ID_FORMAT=mixed, run
+
+    python -m main.migrate_ids [--batch-size 500]
+
+then switch the app to ID_FORMAT=uuid. Only documents which still have a
+string id are read, so the command can be stopped and rerun at any point.
+Documents are swapped in transactions, which need a replica set, e.g. Atlas.
+The storage and index sizes of each collection are reported before and after.
+"""
+
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from typing import Dict, List, Optional
+from uuid import UUID
+import argparse
+import asyncio
+import json
+import logging
+import sys
+
+# Other
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure
+
+# Module
+from main.config import config
+
+# ----------------------------------------------------------------------------
+# Set-up
+# ----------------------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+
+# The collections keyed by their ids, and the other fields holding ids
+COLLECTIONS: Dict[str, List[str]] = {
+    "tasks": ["list_id"],
+    "lists": [],
+    "tombstones": [],
+    "deletions": [],
+}
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+
+def _as_uuid(value) -> Optional[UUID]:
+    try:
+        return UUID(value)
+    except (TypeError, ValueError):
+        return None
+
+
+async def _convert_document(
+    database, collection: str, document: Dict, fields: List[str]
+) -> bool:
+    """Swaps a document keyed by a string for a copy keyed by its UUID
+
+    The original is deleted and the copy written in one transaction, so the
+    app never reads both (or neither), and a delete matching either form
+    removes the document for good. A copy the app already wrote is only
+    overwritten if it is not newer than the original.
+
+    Returns:
+        bool: False if the id is not a UUID or the app changed the original
+            since it was read, a later run tries again
+    """
+    new_id = _as_uuid(document["_id"])
+    if new_id is None:
+        return False
+
+    copy = {**document, "_id": new_id}
+    for field in fields:
+        if _as_uuid(document.get(field)) is not None:
+            copy[field] = _as_uuid(document[field])
+
+    async def swap(session) -> bool:
+        result = await database[collection].delete_one(
+            {"_id": document["_id"], "version": document.get("version")},
+            session=session,
+        )
+        if result.deleted_count == 0:
+            return False
+
+        existing = await database[collection].find_one(
+            {"_id": new_id}, projection={"version": 1}, session=session
+        )
+        if existing is None:
+            await database[collection].insert_one(copy, session=session)
+        elif (existing.get("version") or 0) <= (document.get("version") or 0):
+            await database[collection].replace_one(
+                {"_id": new_id}, copy, session=session
+            )
+        # Otherwise the app already wrote a newer copy, the original was stale
+
+        return True
+
+    # Retried on write conflicts with the app
+    async with await database.client.start_session() as session:
+        return await session.with_transaction(swap)
+
+
+async def storage_report(database) -> Dict[str, Dict]:
+    """Document, storage and index sizes in bytes per collection
+
+    Args:
+        database: the (async) database
+
+    Returns:
+        Dict[str, Dict]: the sizes, empty if the server has no collStats
+    """
+    report = {}
+
+    for collection in COLLECTIONS:
+        try:
+            stats = await database.command("collStats", collection)
+        except (OperationFailure, NotImplementedError):
+            continue
+
+        report[collection] = {
+            "count": stats.get("count", 0),
+            "size": stats.get("size", 0),
+            "storageSize": stats.get("storageSize", 0),
+            "totalIndexSize": stats.get("totalIndexSize", 0),
+            "indexSizes": stats.get("indexSizes", {}),
+        }
+
+    return report
+
+
+async def migrate_ids(database, collection: str, batch_size: int = 500) -> Dict:
+    """Converts the string ids of one collection, a batch at a time
+
+    * A document with a string _id is swapped for a copy under its UUID in a
+      transaction, unless the app changed it in the meantime in which case
+      the next run copies it again
+    * Other id fields are converted in place
+    * Strings which are not UUIDs are left as they are
+
+    Args:
+        database: the (async) database
+        collection (str): e.g. "tasks"
+        batch_size (int, optional): documents read at a time
+
+    Returns:
+        Dict: the number of documents "converted" and "skipped"
+    """
+    fields = COLLECTIONS[collection]
+    converted = 0
+    skipped = 0
+
+    # Documents keyed by a string _id, in _id order so unconvertible ids are
+    # passed over rather than read again
+    last_id = None
+    while True:
+        database_filter = {"_id": {"$type": "string"}}
+        if last_id is not None:
+            database_filter["_id"]["$gt"] = last_id
+
+        documents = (
+            await database[collection]
+            .find(filter=database_filter)
+            .sort("_id", 1)
+            .limit(batch_size)
+            .to_list(length=None)
+        )
+        if not documents:
+            break
+        last_id = documents[-1]["_id"]
+
+        for document in documents:
+            if await _convert_document(database, collection, document, fields):
+                converted += 1
+            else:
+                skipped += 1
+
+        logger.info("%s: %d converted, %d skipped", collection, converted, skipped)
+
+    # Id fields of documents already keyed by a UUID
+    for field in fields:
+        last_id = None
+        while True:
+            database_filter = {field: {"$type": "string"}}
+            if last_id is not None:
+                database_filter["_id"] = {"$gt": last_id}
+
+            documents = (
+                await database[collection]
+                .find(filter=database_filter, projection={field: 1})
+                .sort("_id", 1)
+                .limit(batch_size)
+                .to_list(length=None)
+            )
+            if not documents:
+                break
+            last_id = documents[-1]["_id"]
+
+            writes = [
+                UpdateOne(
+                    {"_id": document["_id"], field: document[field]},
+                    {"$set": {field: _as_uuid(document[field])}},
+                )
+                for document in documents
+                if _as_uuid(document[field]) is not None
+            ]
+            skipped += len(documents) - len(writes)
+
+            if writes:
+                result = await database[collection].bulk_write(writes, ordered=False)
+                converted += result.modified_count
+
+    return {"converted": converted, "skipped": skipped}
+
+
+async def _cli(batch_size: int) -> int:
+    # pylint: disable=import-outside-toplevel
+    from main.database import create_client
+
+    client = create_client(config)
+    database = client[config["DB_NAME"]]
+
+    try:
+        before = await storage_report(database)
+        results = {
+            collection: await migrate_ids(database, collection, batch_size)
+            for collection in COLLECTIONS
+        }
+        after = await storage_report(database)
+    finally:
+        client.close()
+
+    print(json.dumps({"before": before, "results": results, "after": after}, indent=2))
+
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(
+        description="Convert string ids to BSON UUIDs in place"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=500, help="Documents per bulk write"
+    )
+    sys.exit(asyncio.run(_cli(batch_size=parser.parse_args().batch_size)))
@@ -0,0 +1,281 @@
+"""Respaces the task positions of lists whose keys grew too long
+
+Moving a task makes its key longer when it lands between two close keys, see
+main/dependencies/ranks.py. Once a key is longer than RANK_MAX_LENGTH the
+routes ask a worker in their server process to give every task of the list a
+short, evenly spaced key, keeping their order. Tasks written before positions
+existed get one the same way.
+
+A move computes its key from its neighbours' keys, which a rebalance running
+at the same time may be rewriting. Each rebalance counts itself and holds a
+lease in the user's `reorders` document while it runs, and moves run through
+`without_reorders`, which places the task again if a rebalance of the user's
+lists overlapped it.
+"""
+
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional, Set, Tuple, TypeVar
+from uuid import uuid4
+import asyncio
+import logging
+
+# Other
+from pymongo import UpdateOne
+
+# Module
+from main.dependencies.cache import read_cache
+from main.dependencies.ids import match_id
+from main.dependencies.ranks import evenly_spaced
+from main.dependencies.versions import reserve_versions, stamp
+
+# ----------------------------------------------------------------------------
+# Set-up
+# ----------------------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Seconds a rebalance holds back moves, in case its process dies mid-way
+REORDER_LEASE_SECONDS = 30
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+
+class ListReordering(Exception):
+    """Raised when a move kept overlapping rebalances of the user's lists"""
+
+
+async def reorder_fence(database, username: str) -> Optional[int]:
+    """How many rebalances of the user's lists have started
+
+    Args:
+        database: the (async) database
+        username (str): the owner of the lists
+
+    Returns:
+        int | None: the count, None while a rebalance is running
+    """
+    reorders = await database["reorders"].find_one(filter={"_id": username})
+    if reorders is None:
+        return 0
+
+    now = datetime.utcnow()
+    if any(lease["until"] > now for lease in reorders.get("leases", [])):
+        return None
+
+    return reorders.get("started", 0)
+
+
+async def without_reorders(
+    database,
+    username: str,
+    place: Callable[[], Awaitable[T]],
+    attempts: int = 5,
+    wait: float = 0.1,
+) -> T:
+    """Runs `place`, which writes a task at a key computed from its
+    neighbours' keys, again until no rebalance overlapped it
+
+    Args:
+        database: the (async) database
+        username (str): the owner of the task
+        place (Callable[[], Awaitable[T]]): reads the neighbours and writes
+            the task, safe to run more than once
+        attempts (int, optional): runs of `place` before giving up
+        wait (float, optional): seconds to wait for a running rebalance
+
+    Raises:
+        ListReordering: if every attempt overlapped a rebalance
+
+    Returns:
+        T: what the last run of `place` returned
+    """
+    for _ in range(attempts):
+        fence = await reorder_fence(database, username)
+        if fence is None:
+            await asyncio.sleep(wait)
+            continue
+
+        result = await place()
+        if await reorder_fence(database, username) == fence:
+            return result
+
+    raise ListReordering("The list is being reordered, try again")
+
+
+class ListRebalancer:
+    """Works through the lists the routes asked to be rebalanced
+
+    * One list at a time, sleeping `delay` between lists
+    * Requests are held in memory, a list missed because of a restart is
+      rebalanced when its keys next grow too long
+    """
+
+    def __init__(self, repository, events, delay: float = 0.5):
+        self.repository = repository
+        self.events = events
+        self.delay = delay
+
+        self._pending: Set[Tuple[str, str]] = set()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def start(self) -> None:
+        """Starts the worker on the running event loop"""
+        self._stopping = False
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stops the worker, pending lists are dropped"""
+        if self._task is None:
+            return
+
+        # See ListCleanup.stop
+        self._stopping = True
+        self._wake.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def request(self, username: str, list_id) -> None:
+        """Rebalances the list in the background
+
+        Args:
+            username (str): the owner of the list
+            list_id: id of the list, as stored
+        """
+        self._pending.add((username, str(list_id)))
+        self._wake.set()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            self._wake.clear()
+            while self._pending and not self._stopping:
+                username, list_id = self._pending.pop()
+                try:
+                    await self.rebalance(username, list_id)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:  # pylint: disable=broad-except
+                    logger.exception("Rebalancing list %s failed", list_id)
+                await asyncio.sleep(self.delay)
+
+            if not self._stopping:
+                await self._wake.wait()
+
+    async def rebalance(self, username: str, list_id) -> int:
+        """Gives the tasks of a list evenly spaced keys in their current order
+
+        * Each rewritten task gets a new version so syncing clients see it
+        * Moves wait for it to finish, a task moved while it runs is not
+          rewritten and is placed again by its move, see `without_reorders`
+
+        Args:
+            username (str): the owner of the list
+            list_id: id of the list
+
+        Returns:
+            int: the number of tasks rewritten
+        """
+        lease = await self._start_reordering(username)
+        try:
+            return await self._rebalance(username, list_id)
+        finally:
+            await self.repository["reorders"].update_one(
+                filter={"_id": username}, update={"$pull": {"leases": {"_id": lease}}}
+            )
+
+    async def _start_reordering(self, username: str) -> str:
+        """Counts a rebalance of the user's lists and takes a lease holding
+        back their moves, see `reorder_fence`
+
+        Returns:
+            str: id of the lease, to release once done
+        """
+        now = datetime.utcnow()
+        reorders = self.repository["reorders"]
+
+        # Leases of rebalances whose process died
+        await reorders.update_one(
+            filter={"_id": username},
+            update={"$pull": {"leases": {"until": {"$lte": now}}}},
+        )
+
+        lease = uuid4().hex
+        await reorders.update_one(
+            filter={"_id": username},
+            update={
+                "$inc": {"started": 1},
+                "$push": {
+                    "leases": {
+                        "_id": lease,
+                        "until": now + timedelta(seconds=REORDER_LEASE_SECONDS),
+                    }
+                },
+            },
+            upsert=True,
+        )
+
+        return lease
+
+    async def _rebalance(self, username: str, list_id) -> int:
+        tasks = self.repository["tasks"]
+
+        # Listing both values of complete lets the tasks_by_position index
+        # return the tasks in order
+        ordered = (
+            await tasks.find(
+                filter={
+                    "list_id": match_id(list_id),
+                    "username": username,
+                    "complete": {"$in": [False, True]},
+                },
+                projection={"position": 1},
+            )
+            .sort([("position", 1), ("_id", 1)])
+            .to_list(length=None)
+        )
+
+        changed = [
+            (task, key)
+            for task, key in zip(ordered, evenly_spaced(len(ordered)))
+            if task.get("position") != key
+        ]
+        if not changed:
+            return 0
+
+        first_version = await reserve_versions(
+            self.repository, username, count=len(changed), scopes=[str(list_id)]
+        )
+        result = await tasks.bulk_write(
+            [
+                UpdateOne(
+                    {
+                        "_id": task["_id"],
+                        "username": username,
+                        "position": task.get("position"),
+                    },
+                    {"$set": {"position": key, **stamp(first_version + index)}},
+                )
+                for index, (task, key) in enumerate(changed)
+            ],
+            ordered=False,
+        )
+
+        await read_cache.invalidate(username, str(list_id))
+        self.events.notify(username)
+        logger.info("Rebalanced %d tasks of list %s", result.modified_count, list_id)
+
+        return result.modified_count
@@ -0,0 +1,159 @@
+"""The layer between the routers and Mongo
+
+The routers get collections from the repository rather than the client:
+
+* `repository["tasks"]` reads and writes on the primary
+* `repository.reads("tasks")` is for reads which may be served by a
+  secondary, see DB_READ_PREFERENCE
+* `repository.session()` groups operations into a causally consistent
+  session, so a secondary read made after a primary read sees at least the
+  writes the primary read saw
+
+Pool sizes, wire compression and timeouts are set on the client, see
+main/database.py. `MemoryRepository` runs on the in-memory stand-in.
+"""
+
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List
+
+# Other
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import (
+    Nearest,
+    Primary,
+    PrimaryPreferred,
+    Secondary,
+    SecondaryPreferred,
+)
+
+# Module
+from main.database import create_client
+
+# ----------------------------------------------------------------------------
+# Set-up
+# ----------------------------------------------------------------------------
+
+READ_PREFERENCES = {
+    "primary": Primary(),
+    "primaryPreferred": PrimaryPreferred(),
+    "secondary": Secondary(),
+    "secondaryPreferred": SecondaryPreferred(),
+    "nearest": Nearest(),
+}
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+
+class Repository:
+    """Hands out collections with the read routing set in the config
+
+    Args:
+        client: the (async) Mongo client
+        database_name (str): the database to use
+        read_preference (str, optional): e.g. "secondaryPreferred", for the
+            collections returned by `reads`
+    """
+
+    def __init__(self, client, database_name: str, read_preference: str = "primary"):
+        if read_preference not in READ_PREFERENCES:
+            raise ValueError("Unknown DB_READ_PREFERENCE " + read_preference)
+
+        self.client = client
+        self.database = client[database_name]
+        self.read_preference = read_preference
+
+    def __getitem__(self, name: str):
+        """The collection, reading and writing on the primary"""
+        return self.database[name]
+
+    def reads(self, name: str):
+        """The collection for reads which may go to a secondary
+
+        Secondary reads use the majority read concern, which lets them take
+        part in causally consistent sessions
+
+        Args:
+            name (str): e.g. "tasks"
+
+        Returns:
+            the (async) collection
+        """
+        if self.read_preference == "primary":
+            return self.database[name]
+
+        return self.database.get_collection(
+            name,
+            read_preference=READ_PREFERENCES[self.read_preference],
+            read_concern=ReadConcern("majority"),
+        )
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator:
+        """A causally consistent session, pass it as `session=` to each
+        operation. Operations in a session must not run concurrently
+
+        Yields:
+            the session, None if reads all go to the primary anyway
+        """
+        if self.read_preference == "primary":
+            yield None
+            return
+
+        async with await self.client.start_session(causal_consistency=True) as session:
+            yield session
+
+    def watch(self, pipeline: List[Dict], **kwargs):
+        """A change stream over the whole database
+
+        Args:
+            pipeline (List[Dict]): filters and shapes the change events
+            **kwargs: passed to the driver, e.g. full_document
+
+        Returns:
+            the (async) change stream, an async context manager
+        """
+        return self.database.watch(pipeline, **kwargs)
+
+    async def ping(self) -> None:
+        """Round trip to the primary, opening a connection if none is free"""
+        await self.database.command("ping")
+
+    def close(self) -> None:
+        self.client.close()
+
+
+class MemoryRepository(Repository):
+    """Repository on the in-memory stand-in, which has a single node so reads
+    are never routed and sessions are not needed"""
+
+    def __init__(self, client, database_name: str):
+        super().__init__(client, database_name, read_preference="primary")
+
+    def watch(self, pipeline: List[Dict], **kwargs):
+        raise NotImplementedError("The in-memory backend has no change streams")
+
+
+def create_repository(settings: Dict) -> Repository:
+    """Creates the repository from the config
+
+    Args:
+        settings (Dict): the app config
+
+    Returns:
+        Repository: the repository for DB_BACKEND
+    """
+    client = create_client(settings)
+
+    if settings["DB_BACKEND"] == "memory":
+        return MemoryRepository(client, settings["DB_NAME"])
+
+    return Repository(
+        client, settings["DB_NAME"], read_preference=settings["DB_READ_PREFERENCE"]
+    )
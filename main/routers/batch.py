@@ -0,0 +1,189 @@
+"""Handles the route running many task and list requests at once"""
+
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from typing import List, Tuple
+from urllib.parse import urlencode
+import asyncio
+import logging
+
+# Fast
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+
+# Module
+from main.config import config
+from main.dependencies.models import BatchRequest, BatchResponse, RequestBatch, User
+from main.dependencies.user import get_current_user
+from main.dependencies.utils import dumps
+
+# ----------------------------------------------------------------------------
+# Set-up
+# ----------------------------------------------------------------------------
+
+router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+# Routes a batch can call
+BATCH_PATHS = ("/api/v1/tasks", "/api/v1/lists")
+
+# Request headers set by the batch itself
+RESERVED_HEADERS = {"authorization", "content-length", "content-type", "host"}
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+
+async def _call(
+    request: Request, batched: BatchRequest
+) -> Tuple[int, List[Tuple[bytes, bytes]], bytes]:
+    """Runs one request of the batch through the app's routes
+
+    Returns:
+        Tuple: status code, response headers and body
+    """
+    payload = b"" if batched.body is None else dumps(batched.body)
+    headers = [
+        (key.lower().encode("latin-1"), value.encode("latin-1"))
+        for key, value in batched.headers.items()
+        if key.lower() not in RESERVED_HEADERS
+    ]
+    headers += [
+        (key, value)
+        for key, value in request.scope["headers"]
+        if key in {b"authorization", b"host"}
+    ]
+    headers.append((b"content-type", b"application/json"))
+    headers.append((b"content-length", str(len(payload)).encode()))
+
+    scope = {
+        **request.scope,
+        "method": batched.method,
+        "path": batched.path,
+        "raw_path": batched.path.encode(),
+        "query_string": urlencode(batched.params).encode(),
+        "headers": headers,
+    }
+    for key in ["endpoint", "path_params", "route", "router"]:
+        scope.pop(key, None)
+
+    request_sent = False
+    response_done = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        await response_done.wait()
+        return {"type": "http.disconnect"}
+
+    status = 500
+    response_headers: List[Tuple[bytes, bytes]] = []
+    chunks: List[bytes] = []
+
+    async def send(message):
+        nonlocal status, response_headers
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers = list(message.get("headers", []))
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                response_done.set()
+
+    try:
+        await request.app.batch_app(scope, receive, send)
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("Batched %s %s failed", batched.method, batched.path)
+        return 500, [], dumps({"detail": "Internal Server Error"})
+
+    return status, response_headers, b"".join(chunks)
+
+
+def _item(
+    index: int, status: int, headers: List[Tuple[bytes, bytes]], body: bytes
+) -> bytes:
+    """One response of the batch, the JSON body of the route is embedded as is
+    rather than parsed and encoded again"""
+    content_type = b""
+    kept = {}
+    for key, value in headers:
+        if key == b"content-type":
+            content_type = value
+        if key != b"content-length":
+            kept[key.decode("latin-1")] = value.decode("latin-1")
+
+    if not body:
+        body = b"null"
+    elif not content_type.startswith(b"application/json"):
+        body = dumps(body.decode())
+
+    return (
+        dumps({"index": index, "status": status, "headers": kept})[:-1]
+        + b',"body":'
+        + body
+        + b"}"
+    )
+
+
+@router.post(
+    path="/api/v1/batch",
+    response_description="Runs many task and list requests, returns each response",
+    response_model=List[BatchResponse],
+)
+async def run_batch(
+    batch: RequestBatch,
+    request: Request,
+    current_user: User = Depends(get_current_user),  # pylint: disable=unused-argument
+) -> Response:
+    """Runs task and list requests as if they had been sent one by one
+
+    * The token is validated once, for the batch
+    * Requests run concurrently, at most BATCH_CONCURRENCY at a time, in no
+      particular order, so they should not depend on each other
+    * Each request is rate limited and admitted on its own, see
+      main/admission.py, and has its own status code
+    * Requests for other routes fail with a 400
+
+    Args:
+        batch (RequestBatch): the requests to run
+        request (Request): request object to run the requests through the app
+        current_user (User, optional): the signed in user
+
+    Returns:
+        Response: the response of each request, in batch order
+    """
+    if len(batch.requests) > config["BATCH_MAX_REQUESTS"]:
+        raise HTTPException(
+            400,
+            "Batches can contain at most "
+            + str(config["BATCH_MAX_REQUESTS"])
+            + " requests",
+        )
+
+    semaphore = asyncio.Semaphore(config["BATCH_CONCURRENCY"])
+
+    async def run(index: int, batched: BatchRequest) -> bytes:
+        if not batched.path.startswith(BATCH_PATHS):
+            return _item(
+                index,
+                400,
+                [(b"content-type", b"application/json")],
+                dumps({"detail": "Only task and list routes can be batched"}),
+            )
+
+        async with semaphore:
+            return _item(index, *await _call(request, batched))
+
+    items = await asyncio.gather(
+        *[run(index, batched) for index, batched in enumerate(batch.requests)]
+    )
+
+    return Response(
+        content=b"[" + b",".join(items) + b"]", media_type="application/json"
+    )
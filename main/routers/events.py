@@ -0,0 +1,180 @@
+"""Handles the route streaming changes to clients as they happen"""
+
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+import time
+
+# Fast
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+# Module
+from main.config import config
+from main.dependencies.models import User
+from main.dependencies.user import get_current_user
+from main.dependencies.utils import dumps
+from main.dependencies.versions import (
+    changes_expired,
+    current_version,
+    read_changes,
+)
+
+# ----------------------------------------------------------------------------
+# Set-up
+# ----------------------------------------------------------------------------
+
+router = APIRouter()
+
+# Milliseconds a disconnected client waits before reconnecting
+RETRY_MS = 3000
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+
+def _event(kind: str, document: Dict, resume: int) -> str:
+    return f"id: {resume}\nevent: {kind}\ndata: {dumps(document).decode()}\n\n"
+
+
+def _resume_version(changes: List[Tuple[str, Dict]], since: int) -> int:
+    """The version a reconnecting client can resume from: every change up to
+    it has been sent, and no write can still add one below it"""
+    settled_before = datetime.utcnow() - timedelta(
+        seconds=config["SYNC_SETTLE_SECONDS"]
+    )
+
+    resume = since
+    for _, document in changes:
+        if document["updated_at"] > settled_before:
+            break
+        resume = document["version"]
+    return resume
+
+
+async def _wait(event: asyncio.Event, timeout: float) -> bool:
+    try:
+        await asyncio.wait_for(event.wait(), timeout=timeout)
+    except asyncio.TimeoutError:
+        return False
+    return True
+
+
+async def _stream(request: Request, username: str, since: int) -> AsyncIterator[str]:
+    feed = request.app.events
+    resume = since
+    # Versions of the changes sent after `resume`, so they are not sent twice
+    sent: Dict[Tuple[str, str], int] = {}
+    # Ended after a while so clients reconnect, possibly to another process
+    ends = time.monotonic() + config["EVENTS_MAX_STREAM_SECONDS"]
+
+    yield f"retry: {RETRY_MS}\nid: {resume}\n\n"
+
+    with feed.subscribe(username) as wake:
+        while not feed.closed and time.monotonic() < ends:
+            wake.clear()
+
+            # Unsettled changes are sent straight away, but only settled ones
+            # move the resume version on
+            result = await read_changes(
+                request.app.repository,
+                username,
+                since=resume,
+                limit=config["SYNC_PAGE_SIZE"],
+                settled=False,
+            )
+            changes = sorted(
+                [("task", task) for task in result["tasks"]]
+                + [("list", task_list) for task_list in result["lists"]]
+                + [("deleted", tombstone) for tombstone in result["deleted"]],
+                key=lambda change: change[1]["version"],
+            )
+            previous, resume = resume, _resume_version(changes, resume)
+
+            events = []
+            for kind, document in changes:
+                key = (kind, str(document["_id"]))
+                if sent.get(key) != document["version"]:
+                    sent[key] = document["version"]
+                    events.append(_event(kind, document, resume))
+            sent = {key: version for key, version in sent.items() if version > resume}
+
+            if events:
+                yield "".join(events)
+            elif resume != previous:
+                yield f"id: {resume}\n\n"
+
+            # Catch up on a backlog straight away
+            if result["more"] and resume != previous:
+                continue
+
+            # Check again once the changes sent early have settled
+            remaining = ends - time.monotonic()
+            if sent:
+                await _wait(wake, min(config["SYNC_SETTLE_SECONDS"], remaining))
+            elif not await _wait(wake, min(config["EVENTS_POLL_SECONDS"], remaining)):
+                yield ": keep-alive\n\n"
+
+
+@router.get(
+    path="/api/v1/events",
+    response_description="Streams the user's task and list changes",
+    response_class=StreamingResponse,
+)
+async def stream_events(
+    request: Request,
+    since: Optional[int] = Query(
+        None, ge=0, description="A sync version, defaults to the current one"
+    ),
+    last_event_id: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+) -> StreamingResponse:
+    """Streams the user's changes as Server-Sent Events
+
+    * "task" and "list" events carry the created or updated document,
+      "deleted" events the tombstone of a delete
+    * The id of each event is a sync version, a client which reconnects with
+      it as Last-Event-ID (or `since`) is sent every change after it, so it
+      never needs to reload. Changes may be sent again after a reconnect
+    * A comment is sent every EVENTS_POLL_SECONDS to keep the connection open
+    * The stream ends after EVENTS_MAX_STREAM_SECONDS, or as soon as the
+      process is asked to stop, and the client reconnects with Last-Event-ID
+    * A client which reconnects after TOMBSTONE_TTL_DAYS gets a 410, see the
+      sync route
+
+    Args:
+        request (Request): request object to get the database client
+        since (int, optional): the version to stream changes after
+        last_event_id (str, optional): the Last-Event-ID header, takes
+            precedence over `since`
+        current_user (User, optional): the signed in user
+
+    Raises:
+        HTTPException: 400 if Last-Event-ID is not a version, 410 if deletes
+            after it may have been forgotten
+
+    Returns:
+        StreamingResponse: the text/event-stream
+    """
+    if last_event_id is not None:
+        if not last_event_id.isdigit():
+            raise HTTPException(400, "Invalid Last-Event-ID")
+        since = int(last_event_id)
+
+    if since is None:
+        counter = await current_version(request.app.repository, current_user.username)
+        since = counter["version"]
+    elif await changes_expired(request.app.repository, current_user.username, since):
+        raise HTTPException(410, "Changes since this version expired, sync from 0")
+
+    return StreamingResponse(
+        _stream(request, current_user.username, since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
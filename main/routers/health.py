@@ -0,0 +1,77 @@
+"""Handles the liveness and readiness probes"""
+
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+import asyncio
+import logging
+
+# Fast
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+
+# Module
+from main.dependencies.user import jwks_cache
+
+# ----------------------------------------------------------------------------
+# Set-up
+# ----------------------------------------------------------------------------
+
+router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+# Seconds the readiness probe waits for the database
+PING_TIMEOUT = 2
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+
+@router.get(
+    path="/healthz",
+    response_description="Returns 200 while the process is running",
+    include_in_schema=False,
+)
+async def get_health() -> JSONResponse:
+    """Liveness, the process is up and its event loop is responsive
+
+    Returns:
+        JSONResponse: always {"status": "ok"}
+    """
+    return JSONResponse({"status": "ok"})
+
+
+@router.get(
+    path="/readyz",
+    response_description="Returns 200 when the process can serve requests",
+    include_in_schema=False,
+)
+async def get_readiness(request: Request) -> JSONResponse:
+    """Readiness, the process is warm, not draining and can reach its
+    dependencies
+
+    Args:
+        request (Request): request object to get the database client
+
+    Returns:
+        JSONResponse: {"status": ...} with 200 if ready, 503 if not
+    """
+    lifecycle = request.app.lifecycle
+
+    if lifecycle.draining:
+        return JSONResponse({"status": "draining"}, status_code=503)
+
+    if not lifecycle.warm or not jwks_cache.loaded:
+        return JSONResponse({"status": "starting"}, status_code=503)
+
+    try:
+        await asyncio.wait_for(request.app.repository.ping(), timeout=PING_TIMEOUT)
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("Readiness check could not reach the database")
+        return JSONResponse({"status": "database unavailable"}, status_code=503)
+
+    return JSONResponse({"status": "ok"})
@@ -5,17 +5,34 @@
 # ----------------------------------------------------------------------------
 
 # Core
-from typing import List, Dict
+from typing import Dict, List, Union
 from uuid import UUID
 
 # Fast
-from fastapi import APIRouter, Depends, Request
-from fastapi.encoders import jsonable_encoder
+from fastapi import APIRouter, Depends, Request, Response
 
 # Module
-from main.dependencies.models import User, TaskList, TaskListInDB
+from main.cleanup import cancel_list_deletion, start_list_deletion
+from main.config import config
+from main.dependencies.cache import read_cache
+from main.dependencies.etag import conditional_get
+from main.dependencies.ids import match_id, match_ids
+from main.dependencies.models import (
+    ListDeletion,
+    User,
+    TaskList,
+    TaskListInDB,
+    TaskListOverview,
+)
+from main.dependencies.pagination import Page, find_page
 from main.dependencies.user import get_current_user
-from main.dependencies.utils import validate_document_owner
+from main.dependencies.utils import dumps, invalid_document, to_document
+from main.dependencies.versions import (
+    current_version,
+    reserve_versions,
+    stamp,
+    write_tombstones,
+)
 
 # ----------------------------------------------------------------------------
 # Set-up
@@ -23,6 +40,22 @@ from main.dependencies.utils import validate_document_owner
 
 router = APIRouter()
 
+# Fields a read can project
+TASK_LIST_FIELDS = {field.alias for field in TaskListInDB.__fields__.values()}
+
+# Counts each of a user's lists' tasks, after a $match on username and
+# list_id it reads only the tasks_by_list index
+TASK_COUNTS_PIPELINE = [
+    {
+        "$group": {
+            "_id": "$list_id",
+            "total": {"$sum": 1},
+            "complete": {"$sum": {"$cond": ["$complete", 1, 0]}},
+            "pinned": {"$sum": {"$cond": ["$pinned", 1, 0]}},
+        }
+    },
+]
+
 # ----------------------------------------------------------------------------
 # Main
 # ----------------------------------------------------------------------------
@@ -48,20 +81,22 @@ async def create_task_list(
     Returns:
         TaskListInDB: the newly created database entry
     """
+    version = await reserve_versions(
+        request.app.repository, current_user.username, scopes=["lists"]
+    )
+
     new_task_list = task_list.dict()
     new_task_list["username"] = current_user.username
-    new_task_list = TaskListInDB(**new_task_list)
-    new_task_list_json = jsonable_encoder(new_task_list)
-
-    # Add to DB
-    request.app.database["lists"].insert_one(new_task_list_json)
+    new_task_list = TaskListInDB(**new_task_list, **stamp(version))
+    new_task_list_json = to_document(new_task_list)
 
-    result = request.app.database["lists"].find_one(
-        filter={"_id": str(new_task_list.dict()["id"])}
-    )
+    # Add to DB, the entry is exactly what was sent so there is no need to
+    # read it back
+    await request.app.repository["lists"].insert_one(new_task_list_json)
+    await read_cache.invalidate(current_user.username, "lists")
+    request.app.events.notify(current_user.username)
 
-    # Return the DB instance
-    return TaskListInDB(**result)
+    return new_task_list
 
 
 @router.delete(path="/api/v1/lists", response_description="Delete a new task list")
@@ -77,15 +112,36 @@ async def delete_task_list(
         request (Request): request object to get the database client
         current_user (User, optional): the signed in user
     """
-    task_mongo: Dict = request.app.database["lists"].find_one(filter={"_id": str(_id)})
+    # Record the deletion before deleting the list (if the user owns it), so a
+    # crash in between still removes its tasks. They are hidden straight away
+    # and removed in the background once the list is gone, a record left
+    # behind a list which still exists is cancelled, see main/cleanup.py
+    created = await start_list_deletion(
+        request.app.repository, current_user.username, _id
+    )
+    result = await request.app.repository["lists"].delete_one(
+        filter={"_id": match_id(_id), "username": current_user.username}
+    )
 
-    result = validate_document_owner(user=current_user, mongo_result=task_mongo)
-    if result is not None:
-        raise result
+    if result.deleted_count == 0:
+        if created:
+            await cancel_list_deletion(
+                request.app.repository, current_user.username, _id
+            )
+        raise invalid_document()
 
-    # Delete the list and the tasks that were in that list
-    request.app.database["lists"].delete_one(filter={"_id": str(_id)})
-    request.app.database["tasks"].delete_many(filter={"list_id": str(_id)})
+    request.app.cleanup.wake()
+    await read_cache.invalidate(current_user.username, "lists")
+    await read_cache.invalidate(current_user.username, str(_id))
+
+    # The tasks are implied to be deleted with the list
+    version = await reserve_versions(
+        request.app.repository, current_user.username, scopes=["lists", str(_id)]
+    )
+    await write_tombstones(
+        request.app.repository, current_user.username, "list", {str(_id): version}
+    )
+    request.app.events.notify(current_user.username)
 
     return
 
@@ -96,18 +152,158 @@ async def delete_task_list(
     response_model=List[TaskListInDB],
 )
 async def get_task_lists(
-    request: Request, current_user: User = Depends(get_current_user)
-) -> List[TaskListInDB]:
+    request: Request,
+    response: Response,
+    page: Page = Depends(),
+    current_user: User = Depends(get_current_user),
+) -> Union[List[TaskListInDB], Response]:
     """Returns all task lists of a user
 
     Args:
         request (Request): request object to get the database client
+        response (Response): to set the ETag and X-Next-Cursor headers on
+        page (Page, optional): pagination, projection and streaming options
+        current_user (User, optional): the signed in user
+
+    Returns:
+        List[TaskListInDB] | Response: the users task lists
+    """
+    repository = request.app.repository
+
+    # The lists read after the counter are at least as new, see read_tasks
+    async with repository.session() as session:
+        counter = await current_version(
+            repository, current_user.username, session=session
+        )
+
+        # Nothing to do if the client's copy is current
+        not_modified = conditional_get(request, response, counter)
+        if not_modified is not None:
+            return not_modified
+
+        return await find_page(
+            collection=repository.reads("lists"),
+            database_filter={"username": current_user.username},
+            page=page,
+            allowed_fields=TASK_LIST_FIELDS,
+            response=response,
+            read_through=read_cache.read_through(
+                current_user.username, "lists", counter, request
+            ),
+            session=session,
+        )
+
+
+@router.get(
+    path="/api/v1/lists/overview",
+    response_description="Return all task lists of a user with their task counts",
+    response_model=List[TaskListOverview],
+)
+async def get_task_list_overview(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+) -> Union[List[TaskListOverview], Response]:
+    """Returns all task lists of a user, in _id order, with the number of
+    tasks, complete tasks, incomplete tasks and pinned tasks in each
+
+    * The counts come from one aggregation grouping the tasks of the lists by
+      list, which is joined to the lists here so lists without tasks are
+      included
+
+    Args:
+        request (Request): request object to get the database client
+        response (Response): to set the ETag header on
         current_user (User, optional): the signed in user
 
     Returns:
-        List[TaskListInDB]: the users task lists
+        List[TaskListOverview] | Response: the lists with their counts
     """
-    task_lists_mongo: List[Dict] = list(
-        request.app.database["lists"].find(filter={"username": current_user.username})
+    repository = request.app.repository
+
+    # The reads after the counter are at least as new, see read_tasks
+    async with repository.session() as session:
+        counter = await current_version(
+            repository, current_user.username, session=session
+        )
+
+        # Nothing to do if the client's copy is current
+        not_modified = conditional_get(request, response, counter)
+        if not_modified is not None:
+            return not_modified
+
+        task_lists = (
+            await repository.reads("lists")
+            .find(filter={"username": current_user.username}, session=session)
+            .sort("_id", 1)
+            .to_list(length=None)
+        )
+        counts: Dict = {
+            str(count["_id"]): count
+            async for count in repository.reads("tasks").aggregate(
+                [
+                    {
+                        "$match": {
+                            "list_id": match_ids(
+                                task_list["_id"] for task_list in task_lists
+                            ),
+                            "username": current_user.username,
+                        }
+                    }
+                ]
+                + TASK_COUNTS_PIPELINE,
+                session=session,
+            )
+        }
+
+    overview = []
+    for task_list in task_lists:
+        count = counts.get(str(task_list["_id"]), {"total": 0, "complete": 0})
+        overview.append(
+            {
+                **task_list,
+                "total": count["total"],
+                "complete": count["complete"],
+                "incomplete": count["total"] - count["complete"],
+                "pinned": count.get("pinned", 0),
+            }
+        )
+
+    if not config["TRUSTED_READS"]:
+        return overview
+
+    return Response(
+        content=dumps(overview),
+        media_type="application/json",
+        headers=dict(response.headers),
     )
-    return list(map(lambda x: TaskListInDB(**x), task_lists_mongo))
+
+
+@router.get(
+    path="/api/v1/lists/deletions",
+    response_description="Return the progress of removing deleted lists' tasks",
+    response_model=List[ListDeletion],
+)
+async def get_list_deletions(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+) -> List[ListDeletion]:
+    """Returns the user's list deletions, pending ones first
+
+    * Finished deletions are kept for TOMBSTONE_TTL_DAYS
+
+    Args:
+        request (Request): request object to get the database client
+        current_user (User, optional): the signed in user
+
+    Returns:
+        List[ListDeletion]: the deletions and the number of tasks removed
+    """
+    deletions = (
+        await request.app.repository["deletions"]
+        .find(filter={"username": current_user.username})
+        .sort([("status", -1), ("created_at", 1)])
+        .to_list(length=None)
+    )
+
+    return deletions
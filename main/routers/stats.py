@@ -0,0 +1,92 @@
+"""Handles routes exposing internal counters"""
+
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from typing import Dict
+
+# Fast
+from fastapi import APIRouter, Depends, Request, Response
+from fastapi.responses import PlainTextResponse
+
+# Other
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+# Module
+from main.dependencies.cache import read_cache
+from main.dependencies.models import User
+from main.dependencies.user import get_current_user, token_cache
+from main.metrics import (
+    ADMISSION_STATS,
+    CACHE_STATS,
+    WRITE_CONFLICTS,
+    WRITES_SKIPPED,
+    registry,
+    total,
+)
+
+# ----------------------------------------------------------------------------
+# Set-up
+# ----------------------------------------------------------------------------
+
+router = APIRouter()
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+
+@router.get(path="/api/v1/stats", response_description="Returns cache counters")
+async def get_stats(
+    request: Request,
+    current_user: User = Depends(get_current_user),  # pylint: disable=unused-argument
+) -> Dict:
+    """Returns the counters of the in-process caches, of admission control and
+    of task updates which were not written
+
+    Args:
+        request (Request): request object to get the admission counters
+        current_user (User, optional): the signed in user
+
+    Returns:
+        Dict: counters keyed by cache name, "admission" and "writes"
+    """
+    return {
+        "token_cache": token_cache.stats(),
+        "read_cache": read_cache.stats(),
+        "admission": request.app.admission.stats(),
+        "writes": {
+            "skipped": total(WRITES_SKIPPED),
+            "conflicts": total(WRITE_CONFLICTS),
+        },
+    }
+
+
+@router.get(
+    path="/metrics",
+    response_description="Returns metrics in the Prometheus text format",
+    response_class=PlainTextResponse,
+    include_in_schema=False,
+)
+async def get_metrics(request: Request) -> Response:
+    """Returns request, Mongo command, span, cache and admission metrics for
+    scraping
+
+    Args:
+        request (Request): request object to get the admission counters
+
+    Returns:
+        Response: the metrics
+    """
+    for cache, stats in [("token", token_cache.stats()), ("read", read_cache.stats())]:
+        for stat, value in stats.items():
+            CACHE_STATS.labels(cache=cache, stat=stat).set(value)
+    for stat in ["users", "database_in_flight", "database_queued"]:
+        ADMISSION_STATS.labels(stat=stat).set(request.app.admission.stats()[stat])
+
+    # Set as a header, PlainTextResponse would append a second charset
+    return Response(
+        generate_latest(registry), headers={"Content-Type": CONTENT_TYPE_LATEST}
+    )
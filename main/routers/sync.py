@@ -0,0 +1,69 @@
+"""Handles routes for syncing changes to clients"""
+
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Fast
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+
+# Module
+from main.config import config
+from main.dependencies.models import SyncResponse, User
+from main.dependencies.user import get_current_user
+from main.dependencies.versions import changes_expired, read_changes
+
+# ----------------------------------------------------------------------------
+# Set-up
+# ----------------------------------------------------------------------------
+
+router = APIRouter()
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+
+@router.get(
+    path="/api/v1/sync",
+    response_description="Returns the tasks and lists changed since a version",
+    response_model=SyncResponse,
+)
+async def sync(
+    request: Request,
+    since: int = Query(0, ge=0, description="The version of the previous sync"),
+    limit: int = Query(config["SYNC_PAGE_SIZE"], ge=1, le=config["PAGE_SIZE_MAX"]),
+    current_user: User = Depends(get_current_user),
+) -> SyncResponse:
+    """Returns the tasks and lists created, updated or deleted after `since`
+
+    * Changes come in version order, at most `limit` at a time, keep passing
+      the returned version as `since` while there are `more`
+    * Changes from the last SYNC_SETTLE_SECONDS are held back, so a write
+      which reserved a lower version but finished later is not skipped, as
+      long as it finished within SYNC_SETTLE_SECONDS of reserving it
+    * Deletes are remembered for TOMBSTONE_TTL_DAYS, a client which has not
+      synced since gets a 410 and has to sync again from version 0
+    * Documents last written before versions were introduced have no version
+      and are not returned, load them with the read routes
+
+    Args:
+        request (Request): request object to get the database client
+        since (int, optional): the version returned by the previous sync
+        limit (int, optional): the most changes to return
+        current_user (User, optional): the signed in user
+
+    Raises:
+        HTTPException: 410 if deletes after `since` may have been forgotten
+
+    Returns:
+        SyncResponse: the changes and the version to sync from next
+    """
+    if await changes_expired(request.app.repository, current_user.username, since):
+        raise HTTPException(410, "Changes since this version expired, sync from 0")
+
+    changes = await read_changes(
+        request.app.repository, current_user.username, since=since, limit=limit
+    )
+
+    return SyncResponse(**changes)
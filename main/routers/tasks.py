@@ -5,17 +5,66 @@
 # ----------------------------------------------------------------------------
 
 # Core
-from typing import List, Dict, Optional
+from typing import Dict, List, Literal, Optional, Union
 from uuid import UUID
+import asyncio
 
 # Fast
-from fastapi import Depends, APIRouter, Request
-from fastapi.encoders import jsonable_encoder
+from fastapi import (
+    Depends,
+    APIRouter,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
+
+# Other
+from pymongo import DeleteOne, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
 
 # Module
-from main.dependencies.models import Task, TaskInDB, TaskUpdate, User
+from main.cleanup import is_list_deleted, pending_list_deletions
+from main.config import config
+from main.dependencies.cache import read_cache
+from main.dependencies.etag import conditional_get, document_etag, precondition_met
+from main.dependencies.ids import match_id, match_ids
+from main.dependencies.models import (
+    Task,
+    TaskBatch,
+    TaskBatchResult,
+    TaskInDB,
+    TaskMove,
+    TaskSearchResult,
+    TaskUpdate,
+    User,
+)
+from main.dependencies.pagination import (
+    NEXT_CURSOR_HEADER,
+    Page,
+    decode_offset,
+    encode_offset,
+    find_page,
+    parse_fields,
+)
+from main.dependencies.ranks import last_position, rank_between
 from main.dependencies.user import get_current_user
-from main.dependencies.utils import validate_document_owner, repeated_entry
+from main.dependencies.utils import (
+    dumps,
+    invalid_document,
+    repeated_entry,
+    task_changes,
+    to_document,
+)
+from main.dependencies.versions import (
+    current_version,
+    reserve_versions,
+    stamp,
+    write_tombstones,
+)
+from main.metrics import WRITE_CONFLICTS, WRITES_SKIPPED
+from main.rebalance import ListReordering, without_reorders
 
 # ----------------------------------------------------------------------------
 # Set-up
@@ -23,6 +72,74 @@ from main.dependencies.utils import validate_document_owner, repeated_entry
 
 router = APIRouter(prefix="/api/v1/tasks")
 
+# Fields a read can project
+TASK_FIELDS = {field.alias for field in TaskInDB.__fields__.values()}
+
+# ----------------------------------------------------------------------------
+# Positions
+# ----------------------------------------------------------------------------
+
+
+def _check_position(request: Request, username: str, list_id, position) -> None:
+    """Asks for the list to be rebalanced if the key has grown too long"""
+    if position is not None and len(position) > config["RANK_MAX_LENGTH"]:
+        request.app.rebalancer.request(username, list_id)
+
+
+async def _position_after(
+    collection, username: str, list_id, after: Optional[UUID], moved: UUID
+) -> Optional[str]:
+    """A key placing the moved task right after `after` in the list
+
+    Args:
+        collection: the (async) tasks collection
+        username (str): the owner of the list
+        list_id: id of the list
+        after (UUID | None): the task to follow, None for the top of the list
+        moved (UUID): the task being moved
+
+    Raises:
+        HTTPException: if `after` is not a task of the user in the list
+
+    Returns:
+        str | None: the key, None if the neighbours have no usable keys and
+            the list needs rebalancing first
+    """
+    # Listing both values of complete lets the tasks_by_position index return
+    # the neighbours in order
+    neighbours = {
+        "list_id": match_id(list_id),
+        "username": username,
+        "complete": {"$in": [False, True]},
+        "_id": {"$nin": match_ids([moved])["$in"]},
+    }
+
+    before = None
+    if after is not None:
+        previous = await collection.find_one(
+            filter={**neighbours, "_id": match_id(after)}, projection={"position": 1}
+        )
+        if previous is None:
+            raise invalid_document()
+        if previous.get("position") is None:
+            return None
+        before = previous["position"]
+        neighbours["position"] = {"$gt": before}
+
+    following = (
+        await collection.find(filter=neighbours, projection={"position": 1})
+        .sort([("position", 1), ("_id", 1)])
+        .limit(1)
+        .to_list(length=None)
+    )
+    if not following:
+        return rank_between(before, None)
+    if following[0].get("position") is None:
+        return None
+
+    return rank_between(before, following[0]["position"])
+
+
 # ----------------------------------------------------------------------------
 # Main
 # ----------------------------------------------------------------------------
@@ -37,34 +154,175 @@ async def read_tasks(
     list_id: UUID,
     complete: bool,
     request: Request,
+    response: Response,
     pinned: Optional[bool] = None,
+    sort: Optional[Literal["position"]] = Query(
+        None, description="position to return the tasks in their manual order"
+    ),
+    page: Page = Depends(),
     current_user: User = Depends(get_current_user),
-) -> List[TaskInDB]:
+) -> Union[List[TaskInDB], Response]:
     """Returns tasks relating to a certain list (list_id) for a current user
 
     Args:
         list_id (UUID): PK of the list
         complete (bool): if true returns tasks that are complete
         request (Request): request object to get the database client
+        response (Response): to set the ETag and X-Next-Cursor headers on
+        pinned (bool, optional): if given only returns tasks with this status
+        sort (str, optional): "position" to order by position rather than _id,
+            tasks without a position come first
+        page (Page, optional): pagination, projection and streaming options
         current_user (User, optional): the signed in user
 
     Returns:
-        List[TaskInDB]: the tasks for the given list
+        List[TaskInDB] | Response: the tasks for the given list
     """
     database_filter = {
         "username": current_user.username,
-        "list_id": str(list_id),
+        "list_id": match_id(list_id),
         "complete": complete
     }
 
     if pinned is not None:
         database_filter['pinned'] = pinned
 
-    tasks = list(
-        request.app.database["tasks"].find(filter=database_filter)
-    )
+    repository = request.app.repository
+
+    # The counter is read on the primary, the session makes sure the tasks
+    # read after it are at least as new even if a secondary serves them
+    async with repository.session() as session:
+        counter, list_deleted = await asyncio.gather(
+            current_version(repository, current_user.username, session=session),
+            is_list_deleted(repository, current_user.username, list_id),
+        )
+
+        # Nothing to do if the client's copy is current
+        not_modified = conditional_get(request, response, counter)
+        if not_modified is not None:
+            return not_modified
+
+        # The tasks of a deleted list are hidden until they are removed
+        if list_deleted:
+            return []
+
+        return await find_page(
+            collection=repository.reads("tasks"),
+            database_filter=database_filter,
+            page=page,
+            allowed_fields=TASK_FIELDS,
+            response=response,
+            read_through=read_cache.read_through(
+                current_user.username, str(list_id), counter, request
+            ),
+            session=session,
+            order_by=sort,
+        )
+
+
+@router.get(
+    path="/search",
+    response_description="Returns the user's tasks matching a search, best first",
+    response_model=List[TaskSearchResult],
+)
+async def search_tasks(
+    request: Request,
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200, description="Search terms"),
+    list_id: Optional[UUID] = None,
+    complete: Optional[bool] = None,
+    limit: int = Query(
+        config["SEARCH_PAGE_SIZE"],
+        ge=1,
+        le=config["PAGE_SIZE_MAX"],
+        description="Page size",
+    ),
+    cursor: Optional[str] = Query(
+        None, description="The X-Next-Cursor of the previous page"
+    ),
+    fields: Optional[str] = Query(
+        None, description="Comma separated fields to return, e.g. task,complete"
+    ),
+    current_user: User = Depends(get_current_user),
+) -> Union[List[TaskSearchResult], Response]:
+    """Searches the task and notes of the user's tasks using the text index
+
+    * Terms are matched on their stem, "quoted phrases" must match exactly and
+      -term excludes tasks containing term
+    * Results are ranked by relevance, a match in the task counts for more
+      than one in the notes, then by _id
+    * The cursor of the next page is set in the X-Next-Cursor header, which is
+      absent on the last page
+
+    Args:
+        request (Request): request object to get the database client
+        response (Response): to set the ETag and X-Next-Cursor headers on
+        q (str): the search terms
+        list_id (UUID, optional): if given only searches this list
+        complete (bool, optional): if given only returns tasks with this status
+        limit (int, optional): page size
+        cursor (str, optional): the X-Next-Cursor of the previous page
+        fields (str, optional): the fields to return, "score" is always set
+        current_user (User, optional): the signed in user
 
-    return tasks
+    Returns:
+        List[TaskSearchResult] | Response: the matching tasks
+    """
+    projection = parse_fields(fields, TASK_FIELDS) or {}
+    projection["score"] = {"$meta": "textScore"}
+    offset = decode_offset(cursor) if cursor is not None else 0
+
+    database_filter: Dict = {
+        "username": current_user.username,
+        "$text": {"$search": q},
+    }
+    if list_id is not None:
+        database_filter["list_id"] = match_id(list_id)
+    if complete is not None:
+        database_filter["complete"] = complete
+
+    repository = request.app.repository
+
+    # The reads after the counter are at least as new, see read_tasks
+    async with repository.session() as session:
+        counter = await current_version(
+            repository, current_user.username, session=session
+        )
+
+        # Nothing to do if the client's copy is current
+        not_modified = conditional_get(request, response, counter)
+        if not_modified is not None:
+            return not_modified
+
+        # The tasks of deleted lists are hidden until they are removed
+        pending = await pending_list_deletions(repository, current_user.username)
+        if pending and list_id is None:
+            database_filter["list_id"] = {"$nin": match_ids(pending)["$in"]}
+        elif pending and str(list_id) in {str(_id) for _id in pending}:
+            return []
+
+        # Read one extra result to find out whether there is a next page
+        results = (
+            await repository.reads("tasks")
+            .find(filter=database_filter, projection=projection, session=session)
+            .sort([("score", {"$meta": "textScore"}), ("_id", 1)])
+            .skip(offset)
+            .limit(limit + 1)
+            .to_list(length=None)
+        )
+
+    if len(results) > limit:
+        results = results[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_offset(offset + limit)
+
+    if fields is None and not config["TRUSTED_READS"]:
+        return results
+
+    return Response(
+        content=dumps(results),
+        media_type="application/json",
+        headers=dict(response.headers),
+    )
 
 
 @router.post(
@@ -85,20 +343,28 @@ async def create_task(
     Returns:
         TaskInDB: the newly created task database entry
     """
+    version = await reserve_versions(
+        request.app.repository, current_user.username, scopes=[str(task.list_id)]
+    )
+
     new_task = task.dict()
     new_task["username"] = current_user.username
-    new_task = TaskInDB(**new_task)
-    new_task_json = jsonable_encoder(new_task)
+    if new_task["position"] is None:
+        last = await last_position(
+            request.app.repository["tasks"], current_user.username, task.list_id
+        )
+        new_task["position"] = rank_between(last, None)
+    new_task = TaskInDB(**new_task, **stamp(version))
+    new_task_json = to_document(new_task)
 
-    # Add to DB
-    request.app.database["tasks"].insert_one(new_task_json)
+    # Add to DB, the entry is exactly what was sent so there is no need to
+    # read it back
+    await request.app.repository["tasks"].insert_one(new_task_json)
+    await read_cache.invalidate(current_user.username, str(task.list_id))
+    request.app.events.notify(current_user.username)
+    _check_position(request, current_user.username, task.list_id, new_task.position)
 
-    result = request.app.database["tasks"].find_one(
-        filter={"_id": str(new_task.dict()["id"])}
-    )
-
-    # Return the DB instance
-    return TaskInDB(**result)
+    return new_task
 
 
 @router.put(path="", response_description="Updates a task", response_model=TaskInDB)
@@ -106,48 +372,187 @@ async def update_task(
     _id: UUID,
     task_update: TaskUpdate,
     request: Request,
+    response: Response,
+    if_match: Optional[str] = Header(
+        None, description='The task\'s ETag, e.g. "12", to not overwrite newer changes'
+    ),
     current_user: User = Depends(get_current_user),
 ) -> TaskInDB:
     """Updates a task
 
+    * Fields which already have the requested value are left alone, and an
+      update which changes nothing is not written at all
+    * With If-Match the update fails with a 412 if the task has been written
+      since the client read it. The task's ETag is set on the response and
+      is its `version` in quotes
+
     Args:
         _id (UUID): id of the task to update
         task_update (TaskUpdate): the changes to make
         request (Request): request object to get the database client
+        response (Response): to set the ETag on
+        if_match (str, optional): ETags the task must still have
         current_user (User, optional): the signed in user
 
+    Raises:
+        HTTPException: 412 if the task no longer matches If-Match
+
     Returns:
         TaskInDB: the newly updated task database entry
     """
-    old_task_mongo: Dict = request.app.database["tasks"].find_one(
-        filter={"_id": str(_id)}
-    )
+    collection = request.app.repository["tasks"]
+
+    # Only touch the entry if the requesting user owns it
+    owned_task = {"_id": match_id(_id), "username": current_user.username}
+
+    # Read first so an update which changes nothing, e.g. an autosave of
+    # unchanged notes, writes nothing, not even the user's version counter
+    current = await collection.find_one(filter=owned_task)
+    previous = None
+    while previous is None:
+        if current is None:
+            raise invalid_document()
+
+        if not precondition_met(document_etag(current), if_match):
+            WRITE_CONFLICTS.labels(route="/api/v1/tasks").inc()
+            raise HTTPException(412, "The task has changed since it was read")
+
+        changes = {
+            key: value
+            for key, value in task_changes(task_update).items()
+            if not repeated_entry(current, key, value)
+        }
+        if not changes:
+            WRITES_SKIPPED.labels(route="/api/v1/tasks").inc()
+            response.headers["ETag"] = document_etag(current)
+            return TaskInDB(**current)
+
+        # Only lands on the version read, otherwise it is read and checked
+        # again
+        version = await reserve_versions(
+            request.app.repository,
+            current_user.username,
+            scopes={
+                str(current["list_id"]),
+                str(changes.get("list_id", current["list_id"])),
+            },
+        )
+        changes.update(stamp(version))
+        previous = await collection.find_one_and_update(
+            filter={**owned_task, "version": current.get("version")},
+            update={"$set": changes},
+        )
+        if previous is None:
+            current = await collection.find_one(filter=owned_task)
+
+    result = {**previous, **changes}
+
+    # Moving the task changes the list it left too
+    await read_cache.invalidate(current_user.username, str(result["list_id"]))
+    if str(previous["list_id"]) != str(result["list_id"]):
+        await read_cache.invalidate(current_user.username, str(previous["list_id"]))
+    request.app.events.notify(current_user.username)
+    if previous.get("position") != result.get("position"):
+        _check_position(
+            request, current_user.username, result["list_id"], result["position"]
+        )
 
-    result = validate_document_owner(user=current_user, mongo_result=old_task_mongo)
-    if result is not None:
-        raise result
+    # Return the DB instance
+    response.headers["ETag"] = document_etag(result)
+    return TaskInDB(**result)
 
-    # Make the necessary adjustments to the entry
-    # > Ignore empty text (for example no entry to notes)
-    # > Ignore non-changing requests
-    request.app.database["tasks"].update_one(
-        {"_id": str(_id)},
-        {
-            "$set": {
-                key: item
-                for key, item in dict(task_update).items()
-                if (
-                    (item not in ["", None])
-                    and not repeated_entry(
-                        old_document=old_task_mongo, key=key, new_value=item
-                    )
-                )
-            }
-        },
-    )
 
-    # Return the DB instance
-    return TaskInDB(**request.app.database["tasks"].find_one(filter={"_id": str(_id)}))
+@router.post(
+    path=":move",
+    response_description="Moves a task to just after another one",
+    response_model=TaskInDB,
+)
+async def move_task(
+    move: TaskMove,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+) -> TaskInDB:
+    """Moves a task within its list, or into the list of the `after` task
+
+    Only the moved task is written: it gets a position between those of its
+    new neighbours. Lists whose positions have grown long are rebalanced in
+    the background
+
+    Args:
+        move (TaskMove): the task to move and the task to put it after
+        request (Request): request object to get the database client
+        current_user (User, optional): the signed in user
+
+    Raises:
+        HTTPException: if either task is not the user's, or the list could not
+            make room for the task
+
+    Returns:
+        TaskInDB: the moved task
+    """
+    if move.after == move.id:
+        raise HTTPException(400, "A task cannot be moved after itself")
+
+    collection = request.app.repository["tasks"]
+    owned_task = {"_id": match_id(move.id), "username": current_user.username}
+
+    task = await collection.find_one(filter=owned_task, projection={"list_id": 1})
+    if task is None:
+        raise invalid_document()
+
+    list_id = task["list_id"]
+    if move.after is not None:
+        after = await collection.find_one(
+            filter={"_id": match_id(move.after), "username": current_user.username},
+            projection={"list_id": 1},
+        )
+        if after is None:
+            raise invalid_document()
+        list_id = after["list_id"]
+
+    async def place() -> Dict:
+        position = await _position_after(
+            collection, current_user.username, list_id, move.after, move.id
+        )
+        # Neighbours without positions get them from a rebalance, which makes
+        # this run again
+        if position is None:
+            await request.app.rebalancer.rebalance(current_user.username, list_id)
+            return {}
+
+        version = await reserve_versions(
+            request.app.repository,
+            current_user.username,
+            scopes={str(list_id), str(task["list_id"])},
+        )
+        moved = await collection.find_one_and_update(
+            filter=owned_task,
+            update={
+                "$set": {"position": position, "list_id": list_id, **stamp(version)}
+            },
+            return_document=ReturnDocument.AFTER,
+        )
+        if moved is None:
+            raise invalid_document()
+        return moved
+
+    # The neighbours' keys may be rewritten by a rebalance while this runs
+    try:
+        result = await without_reorders(
+            request.app.repository, current_user.username, place
+        )
+    except ListReordering as exc:
+        raise HTTPException(409, "The list is being reordered, try again") from exc
+    position = result["position"]
+
+    if str(list_id) != str(task["list_id"]):
+        await read_cache.invalidate(current_user.username)
+    else:
+        await read_cache.invalidate(current_user.username, str(list_id))
+    request.app.events.notify(current_user.username)
+    _check_position(request, current_user.username, list_id, position)
+
+    return TaskInDB(**result)
 
 
 @router.delete(path="", response_description="Delete a task")
@@ -161,12 +566,230 @@ async def delete_task(
         request (Request): request object to get the database client
         current_user (User, optional): the signed in user
     """
-    task_mongo: Dict = request.app.database["tasks"].find_one(filter={"_id": str(_id)})
+    result = await request.app.repository["tasks"].find_one_and_delete(
+        filter={"_id": match_id(_id), "username": current_user.username},
+        projection={"list_id": 1},
+    )
+
+    if result is None:
+        raise invalid_document()
 
-    result = validate_document_owner(user=current_user, mongo_result=task_mongo)
-    if result is not None:
-        raise result
+    await read_cache.invalidate(current_user.username, str(result["list_id"]))
 
-    request.app.database["tasks"].delete_one(filter={"_id": str(_id)})
+    version = await reserve_versions(
+        request.app.repository,
+        current_user.username,
+        scopes=[str(result["list_id"])],
+    )
+    await write_tombstones(
+        request.app.repository, current_user.username, "task", {str(_id): version}
+    )
+    request.app.events.notify(current_user.username)
 
     return
+
+
+@router.post(
+    path=":batch",
+    response_description="Creates, updates and deletes many tasks",
+    response_model=List[TaskBatchResult],
+)
+async def batch_tasks(
+    batch: TaskBatch,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+) -> List[TaskBatchResult]:
+    """Creates, updates and deletes many tasks with a single bulk write
+
+    * Operations can only touch tasks the user owns, others fail with a 400
+    * Ordered batches stop at the first failing operation, the operations
+      after it are not run and fail with a 424
+
+    Args:
+        batch (TaskBatch): the operations to run
+        request (Request): request object to get the database client
+        current_user (User, optional): the signed in user
+
+    Returns:
+        List[TaskBatchResult]: the outcome of each operation, in batch order
+    """
+    if len(batch.operations) > config["BATCH_MAX_SIZE"]:
+        raise HTTPException(
+            400,
+            "Batches can contain at most "
+            + str(config["BATCH_MAX_SIZE"])
+            + " operations",
+        )
+
+    collection = request.app.repository["tasks"]
+    failed: Dict[int, str] = {}
+
+    # Find which of the referenced tasks the user owns in one query, updates
+    # are compared with them to skip those which change nothing
+    referenced = [op.id for op in batch.operations if op.op != "create"]
+    owned: Dict[str, Dict] = {}
+    if referenced:
+        owned = {
+            str(document["_id"]): document
+            async for document in collection.find(
+                filter={
+                    "_id": match_ids(referenced),
+                    "username": current_user.username,
+                },
+            )
+        }
+
+    # Every list the operations may change, a task's own and the one it moves
+    # or is added to
+    scopes = {
+        str(operation.task.list_id)
+        for operation in batch.operations
+        if operation.op == "create"
+    }
+    for operation in batch.operations:
+        if operation.op != "create" and str(operation.id) in owned:
+            scopes.add(str(owned[str(operation.id)]["list_id"]))
+        if operation.op == "update" and operation.update.list_id is not None:
+            scopes.add(str(operation.update.list_id))
+
+    # One version per operation, unused ones just leave a gap
+    first_version = await reserve_versions(
+        request.app.repository,
+        current_user.username,
+        count=len(batch.operations),
+        scopes=scopes,
+    )
+
+    # Build the writes, `positions` maps each write back to its operation
+    writes = []
+    positions: List[int] = []
+    created: Dict[int, TaskInDB] = {}
+    # Creates without a position go to the end of their list, in batch order
+    last_keys: Dict[str, Optional[str]] = {}
+    for index, operation in enumerate(batch.operations):
+        version = first_version + index
+
+        if operation.op != "create" and str(operation.id) not in owned:
+            failed[index] = invalid_document().detail
+            if batch.ordered:
+                break
+            continue
+
+        if operation.op == "create":
+            new_task = operation.task.dict()
+            if new_task["position"] is None:
+                list_key = str(operation.task.list_id)
+                if list_key not in last_keys:
+                    last_keys[list_key] = await last_position(
+                        collection, current_user.username, operation.task.list_id
+                    )
+                new_task["position"] = rank_between(last_keys[list_key], None)
+                last_keys[list_key] = new_task["position"]
+            new_task = TaskInDB(
+                **new_task, username=current_user.username, **stamp(version)
+            )
+            created[index] = new_task
+            writes.append(InsertOne(to_document(new_task)))
+
+        elif operation.op == "update":
+            current = owned[str(operation.id)]
+            changes = {
+                key: value
+                for key, value in task_changes(operation.update).items()
+                if not repeated_entry(current, key, value)
+            }
+            if not changes:
+                WRITES_SKIPPED.labels(route="/api/v1/tasks:batch").inc()
+                continue
+            # Later updates of the same task compare with this one
+            owned[str(operation.id)] = {**current, **changes}
+            writes.append(
+                UpdateOne(
+                    {"_id": match_id(operation.id), "username": current_user.username},
+                    {"$set": {**changes, **stamp(version)}},
+                )
+            )
+
+        else:
+            writes.append(
+                DeleteOne(
+                    {"_id": match_id(operation.id), "username": current_user.username}
+                )
+            )
+
+        positions.append(index)
+
+    if writes:
+        try:
+            await collection.bulk_write(writes, ordered=batch.ordered)
+        except BulkWriteError as exc:
+            for error in exc.details["writeErrors"]:
+                failed[positions[error["index"]]] = error["errmsg"]
+
+    if writes:
+        await read_cache.invalidate(current_user.username)
+
+    # In ordered batches nothing after the first failure was run
+    stop = min(failed) if batch.ordered and failed else len(batch.operations)
+
+    await write_tombstones(
+        request.app.repository,
+        current_user.username,
+        "task",
+        {
+            str(batch.operations[index].id): first_version + index
+            for index in positions
+            if batch.operations[index].op == "delete"
+            and index not in failed
+            and index < stop
+        },
+    )
+    if writes:
+        request.app.events.notify(current_user.username)
+    for index, new_task in created.items():
+        if index not in failed and index < stop:
+            _check_position(
+                request, current_user.username, new_task.list_id, new_task.position
+            )
+
+    # Read the updated entries back in one query
+    updated_ids = [
+        operation.id
+        for index, operation in enumerate(batch.operations[:stop])
+        if operation.op == "update" and index not in failed
+    ]
+    updated = {}
+    if updated_ids:
+        updated = {
+            str(document["_id"]): document
+            async for document in collection.find(
+                filter={
+                    "_id": match_ids(updated_ids),
+                    "username": current_user.username,
+                }
+            )
+        }
+
+    results = []
+    for index, operation in enumerate(batch.operations):
+        result = TaskBatchResult(index=index, status=200, _id=operation.id)
+
+        if index in failed:
+            result.status = 400
+            result.detail = failed[index]
+        elif index > stop:
+            result.status = 424
+            result.detail = "Not run, an earlier operation in the batch failed"
+        elif operation.op == "create":
+            result.task = created[index]
+            result.id = created[index].id
+        elif operation.op == "update":
+            if str(operation.id) in updated:
+                result.task = TaskInDB(**updated[str(operation.id)])
+            else:
+                result.status = 400
+                result.detail = invalid_document().detail
+
+        results.append(result)
+
+    return results
@@ -0,0 +1,83 @@
+"""Runs the API server, draining it as soon as it is asked to stop
+
+Uvicorn only runs the app's shutdown once every connection has closed, by
+which time it no longer accepts connections and the load balancer can never
+see `/readyz` fail. Here the first SIGTERM or SIGINT makes `/readyz` fail
+straight away, the server keeps serving for SHUTDOWN_DRAIN_SECONDS while the
+load balancer moves traffic away, then uvicorn shuts down as usual. A second
+signal shuts down straight away.
+
+    python -m main.serve [--host 0.0.0.0] [--port 80]
+"""
+
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from types import FrameType
+from typing import Awaitable, Callable, Optional
+import argparse
+import asyncio
+import logging
+
+# Other
+import uvicorn
+
+# ----------------------------------------------------------------------------
+# Set-up
+# ----------------------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+
+class DrainingServer(uvicorn.Server):
+    """A uvicorn server which runs `drain` before it stops accepting
+    connections
+
+    Args:
+        config (uvicorn.Config): the server config
+        drain (Callable[[], Awaitable[None]]): returns once the load balancer
+            has moved traffic away, e.g. main.server.drain
+    """
+
+    def __init__(self, config: uvicorn.Config, drain: Callable[[], Awaitable[None]]):
+        super().__init__(config)
+        self.drain = drain
+        self._draining: Optional[asyncio.Task] = None
+
+    def handle_exit(self, sig: int, frame: Optional[FrameType]) -> None:
+        if self._draining is not None or self.should_exit:
+            super().handle_exit(sig, frame)
+            return
+
+        logger.info("Draining before shutting down")
+        self._draining = asyncio.get_event_loop().create_task(self._drain())
+
+    async def _drain(self) -> None:
+        try:
+            await self.drain()
+        finally:
+            self.should_exit = True
+
+
+def _cli(host: str, port: int) -> None:
+    # pylint: disable=import-outside-toplevel
+    from main.server import app, drain
+
+    server = DrainingServer(uvicorn.Config(app, host=host, port=port), drain=drain)
+    server.run()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Run the API server")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind")
+    parser.add_argument("--port", type=int, default=8000, help="Port to bind")
+    arguments = parser.parse_args()
+    _cli(host=arguments.host, port=arguments.port)
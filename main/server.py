@@ -4,22 +4,91 @@
 # Imports
 # ----------------------------------------------------------------------------
 
+# Core
+from typing import Optional
+import asyncio
+import logging
+
 # Fast
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-
-# Other
-from pymongo import MongoClient
+from starlette.middleware.exceptions import ExceptionMiddleware
 
 # Module
+from main.admission import (
+    Admission,
+    AdmissionMiddleware,
+    ConcurrencyLimit,
+    TokenBuckets,
+)
+from main.cleanup import ListCleanup
 from main.config import config
-from main.routers import tasks, lists
+from main.events import EventFeed
+from main.dependencies.pagination import NEXT_CURSOR_HEADER
+from main.dependencies.user import jwks_cache, token_cache
+from main.indexes import verify_indexes
+from main.lifecycle import Lifecycle, LifecycleMiddleware, warm_up
+from main.metrics import MetricsMiddleware
+from main.rebalance import ListRebalancer
+from main.repository import create_repository
+from main.routers import tasks, lists, stats, sync, health, events, batch
+
+# ----------------------------------------------------------------------------
+# Set-up
+# ----------------------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+
+
+def _token_user(token: str) -> Optional[str]:
+    user = token_cache.peek(token)
+    return user.username if user is not None else None
+
 
 # ----------------------------------------------------------------------------
 # Main
 # ----------------------------------------------------------------------------
 
 app = FastAPI()
+app.lifecycle = Lifecycle()
+app.admission = Admission(
+    buckets=(
+        TokenBuckets(
+            rate=config["RATE_LIMIT_PER_SECOND"],
+            burst=config["RATE_LIMIT_BURST"],
+            max_size=config["RATE_LIMIT_USERS"],
+        )
+        if config["RATE_LIMIT_PER_SECOND"] > 0
+        else None
+    ),
+    database=(
+        ConcurrencyLimit(
+            limit=config["DB_MAX_CONCURRENCY"],
+            max_queue=config["DB_MAX_QUEUE"],
+            timeout=config["DB_QUEUE_SECONDS"],
+        )
+        if config["DB_MAX_CONCURRENCY"] > 0
+        else None
+    ),
+)
+
+# Inside CORS so rejections carry its headers
+app.add_middleware(AdmissionMiddleware, admission=app.admission, token_user=_token_user)
+
+# Runs the requests of POST /api/v1/batch straight on the routes, admitting
+# each of them
+app.batch_app = AdmissionMiddleware(
+    ExceptionMiddleware(
+        app.router,
+        handlers={
+            key: handler
+            for key, handler in app.exception_handlers.items()
+            if key not in (500, Exception)
+        },
+    ),
+    admission=app.admission,
+    token_user=_token_user,
+)
 
 # Allow the front-end dev server and the production server
 app.add_middleware(
@@ -28,21 +97,85 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "traceparent", "Retry-After"],
 )
 
-# 
+app.add_middleware(LifecycleMiddleware, lifecycle=app.lifecycle)
+
+# Outermost so the time spent in the other middleware is included
+app.add_middleware(MetricsMiddleware, tracing=config["TRACING"])
+
+
 @app.on_event("startup")
-def startup_db_client():
-    """Creates a database connection"""
-    app.mongodb_client = MongoClient(host=config["ATLAS_URI"])
-    app.database = app.mongodb_client[config["DB_NAME"]]
+async def startup_db_client():
+    """Creates the database repository and the indexes the routes use, then
+    warms the process up, see main/lifecycle.py"""
+    app.lifecycle.reset()
+    app.repository = create_repository(config)
+
+    if config["CREATE_INDEXES"]:
+        await verify_indexes(app.repository)
+
+    # Resumes any deletions left unfinished by the last run
+    app.cleanup = ListCleanup(
+        app.repository,
+        batch_size=config["CLEANUP_BATCH_SIZE"],
+        delay=config["CLEANUP_DELAY_SECONDS"],
+        poll_interval=config["CLEANUP_POLL_SECONDS"],
+        settle=config["CLEANUP_SETTLE_SECONDS"],
+        tombstone_ttl_days=config["TOMBSTONE_TTL_DAYS"],
+    )
+    app.cleanup.start()
+
+    app.events = EventFeed(
+        app.repository,
+        change_streams=config["EVENTS_CHANGE_STREAMS"],
+        retry_interval=config["EVENTS_POLL_SECONDS"],
+    )
+    app.events.start()
+
+    app.rebalancer = ListRebalancer(app.repository, app.events)
+    app.rebalancer.start()
+
+    # A failed warm up is reported by /readyz rather than stopping the server
+    imports = [name.strip() for name in config["WARMUP_IMPORTS"].split(",")]
+    try:
+        await asyncio.wait_for(
+            warm_up(
+                app.repository,
+                jwks_cache,
+                connections=config["WARMUP_CONNECTIONS"],
+                imports=[name for name in imports if name],
+            ),
+            timeout=config["WARMUP_TIMEOUT_SECONDS"],
+        )
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("Warm up failed, serving anyway")
+    app.lifecycle.warm = True
+
+
+async def drain() -> None:
+    """Ends the event streams, which would otherwise hold the server open, then
+    stops reporting ready and keeps serving for SHUTDOWN_DRAIN_SECONDS. Called
+    as soon as the process is asked to stop, see main/serve.py"""
+    await app.events.stop()
+    await app.lifecycle.drain(delay=config["SHUTDOWN_DRAIN_SECONDS"])
 
 
 @app.on_event("shutdown")
-def shutdown_db_client():
-    """Closes the database connection"""
-    app.mongodb_client.close()
+async def shutdown_db_client():
+    """Ends the event streams, stops the background workers and closes the
+    database connection, once the server has closed every connection"""
+    await app.events.stop()
+    await app.rebalancer.stop()
+    await app.cleanup.stop()
+    app.repository.close()
 
 
 app.include_router(tasks.router)
 app.include_router(lists.router)
+app.include_router(stats.router)
+app.include_router(sync.router)
+app.include_router(events.router)
+app.include_router(batch.router)
+app.include_router(health.router)
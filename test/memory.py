@@ -0,0 +1,41 @@
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Fast
+from fastapi.testclient import TestClient
+
+# Other
+import pytest
+
+# Module
+from main.config import config
+from main.dependencies.models import User
+from main.dependencies.user import get_current_user
+from main.server import app
+
+# ----------------------------------------------------------------------------
+# Fixtures
+# ----------------------------------------------------------------------------
+
+
+@pytest.fixture
+def memory_client(monkeypatch) -> TestClient:
+    """Runs the app on the in-memory backend, signed in as "a"
+
+    Yields:
+        TestClient: the client, the app is started and stopped around it
+    """
+    for key, value in {
+        "DB_BACKEND": "memory",
+        "ID_FORMAT": "string",
+        "CREATE_INDEXES": False,
+        "WARMUP_CONNECTIONS": 0,
+        "SYNC_SETTLE_SECONDS": 0,
+    }.items():
+        monkeypatch.setitem(config, key, value)
+
+    app.dependency_overrides[get_current_user] = lambda: User(username="a")
+    with TestClient(app) as client:
+        yield client
+    app.dependency_overrides.clear()
@@ -0,0 +1,77 @@
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+import asyncio
+
+# Module
+from main.admission import ConcurrencyLimit, TokenBuckets
+
+# ----------------------------------------------------------------------------
+# Tests
+# ----------------------------------------------------------------------------
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestTokenBuckets:
+    def test_burst_then_refill(self):
+        clock = Clock()
+        buckets = TokenBuckets(rate=2, burst=3, clock=clock)
+
+        assert [buckets.take("alice") for _ in range(3)] == [0, 0, 0]
+        assert buckets.take("alice") == 0.5
+        # Other users have their own bucket
+        assert buckets.take("bob") == 0
+
+        clock.now = 0.5
+        assert buckets.take("alice") == 0
+
+    def test_forgets_least_recent_users(self):
+        buckets = TokenBuckets(rate=1, burst=1, max_size=2, clock=Clock())
+        for user in ["alice", "bob", "carol"]:
+            buckets.take(user)
+
+        assert len(buckets) == 2
+        assert buckets.take("alice") == 0
+
+
+class TestConcurrencyLimit:
+    def test_queues_then_hands_over(self):
+        async def run():
+            limit = ConcurrencyLimit(limit=1, max_queue=1, timeout=1)
+            assert await limit.acquire()
+
+            waiting = asyncio.ensure_future(limit.acquire())
+            await asyncio.sleep(0)
+            # The queue is full
+            assert not await limit.acquire()
+
+            limit.release()
+            assert await waiting
+            limit.release()
+            return limit
+
+        limit = asyncio.run(run())
+
+        assert limit.in_flight == 0
+        assert limit.queued == 0
+
+    def test_times_out(self):
+        async def run():
+            limit = ConcurrencyLimit(limit=1, max_queue=1, timeout=0.01)
+            await limit.acquire()
+            return await limit.acquire(), limit
+
+        acquired, limit = asyncio.run(run())
+
+        assert not acquired
+        assert limit.in_flight == 1
+        assert limit.queued == 0
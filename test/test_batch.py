@@ -0,0 +1,121 @@
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from uuid import uuid4
+
+# Fast
+from fastapi.encoders import jsonable_encoder
+
+# Module
+from main.dependencies.models import (
+    BatchResponse,
+    Task,
+    TaskBatchResult,
+    TaskList,
+    TaskListInDB,
+)
+from test.memory import memory_client
+
+# ----------------------------------------------------------------------------
+# Tests
+# ----------------------------------------------------------------------------
+
+
+class TestBatch:
+    def test_batch_tasks(self, memory_client):
+        response = memory_client.post(
+            "/api/v1/lists",
+            json=jsonable_encoder(TaskList(name="Batch list")),
+        )
+        task_list_id = TaskListInDB(**response.json()).id
+
+        new_task = Task(task="Water the plants", list_id=task_list_id)
+        response = memory_client.post(
+            "/api/v1/tasks:batch",
+            json={
+                "operations": [
+                    {"op": "create", "task": jsonable_encoder(new_task)},
+                    {"op": "delete", "_id": str(uuid4())},
+                    {"op": "create", "task": jsonable_encoder(new_task)},
+                ],
+                "ordered": False,
+            },
+        )
+
+        assert response.status_code == 200
+
+        results = [TaskBatchResult(**result) for result in response.json()]
+        assert [result.status for result in results] == [200, 400, 200]
+        assert results[0].task.task == "Water the plants"
+
+        response = memory_client.post(
+            "/api/v1/tasks:batch",
+            json={
+                "operations": [
+                    {
+                        "op": "update",
+                        "_id": str(results[0].id),
+                        "update": {"complete": True},
+                    },
+                    {"op": "delete", "_id": str(results[2].id)},
+                ]
+            },
+        )
+
+        assert response.status_code == 200
+
+        results = [TaskBatchResult(**result) for result in response.json()]
+        assert [result.status for result in results] == [200, 200]
+        assert results[0].task.complete
+
+        memory_client.delete("/api/v1/lists", params={"_id": task_list_id})
+
+    def test_batch_requests(self, memory_client):
+        response = memory_client.post(
+            "/api/v1/lists",
+            json=jsonable_encoder(TaskList(name="Batch list")),
+        )
+        task_list_id = str(TaskListInDB(**response.json()).id)
+
+        response = memory_client.post(
+            "/api/v1/batch",
+            json={
+                "requests": [
+                    {"method": "GET", "path": "/api/v1/lists"},
+                    {
+                        "method": "GET",
+                        "path": "/api/v1/tasks",
+                        "params": {"list_id": task_list_id, "complete": False},
+                    },
+                    {"method": "GET", "path": "/metrics"},
+                ]
+            },
+        )
+
+        assert response.status_code == 200
+
+        results = [BatchResponse(**result) for result in response.json()]
+        assert [result.status for result in results] == [200, 200, 400]
+        assert task_list_id in [item["_id"] for item in results[0].body]
+        assert results[1].body == []
+        assert "etag" in results[1].headers
+
+        memory_client.delete("/api/v1/lists", params={"_id": task_list_id})
+
+    def test_batch_rejects_non_latin_1_headers(self, memory_client):
+        response = memory_client.post(
+            "/api/v1/batch",
+            json={
+                "requests": [
+                    {
+                        "method": "GET",
+                        "path": "/api/v1/lists",
+                        "headers": {"If-None-Match": "☃"},
+                    }
+                ]
+            },
+        )
+
+        assert response.status_code == 422
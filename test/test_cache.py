@@ -0,0 +1,196 @@
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from types import SimpleNamespace
+import asyncio
+
+# Module
+from main.dependencies.cache import MemoryCacheBackend, ReadCache
+
+# ----------------------------------------------------------------------------
+# Set-up
+# ----------------------------------------------------------------------------
+
+
+class CountingLoad:
+    """Load function which records how many times it was called"""
+
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+class SlowLoad(CountingLoad):
+    """Load function which takes a while, so calls overlap"""
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return self.value
+
+
+# ----------------------------------------------------------------------------
+# Tests
+# ----------------------------------------------------------------------------
+
+
+class TestReadCache:
+    def test_hit_after_load(self):
+        cache = ReadCache(MemoryCacheBackend())
+        load = CountingLoad({"documents": [], "next": None})
+
+        for _ in range(3):
+            asyncio.run(cache.get_or_load("a", "list", "1?", load))
+
+        assert load.calls == 1
+        assert cache.stats()["hits"] == 2
+
+    def test_not_stored_when_asked(self):
+        cache = ReadCache(MemoryCacheBackend())
+        load = CountingLoad({"documents": [], "next": None})
+
+        for _ in range(3):
+            asyncio.run(cache.get_or_load("a", "list", "1?", load, store=False))
+
+        assert load.calls == 3
+
+    def test_invalidate_scope(self):
+        cache = ReadCache(MemoryCacheBackend())
+        first, second = CountingLoad({}), CountingLoad({})
+
+        asyncio.run(cache.get_or_load("a", "first", "1?", first))
+        asyncio.run(cache.get_or_load("a", "second", "1?", second))
+        asyncio.run(cache.invalidate("a", "first"))
+        asyncio.run(cache.get_or_load("a", "first", "1?", first))
+        asyncio.run(cache.get_or_load("a", "second", "1?", second))
+
+        assert first.calls == 2
+        assert second.calls == 1
+
+    def test_invalidate_user(self):
+        cache = ReadCache(MemoryCacheBackend())
+        mine, theirs = CountingLoad({}), CountingLoad({})
+
+        asyncio.run(cache.get_or_load("a", "first", "1?", mine))
+        asyncio.run(cache.get_or_load("b", "first", "1?", theirs))
+        asyncio.run(cache.invalidate("a"))
+        asyncio.run(cache.get_or_load("a", "first", "1?", mine))
+        asyncio.run(cache.get_or_load("b", "first", "1?", theirs))
+
+        assert mine.calls == 2
+        assert theirs.calls == 1
+
+    def test_writes_to_other_lists_keep_entries(self):
+        cache = ReadCache(MemoryCacheBackend())
+        load = CountingLoad({})
+        request = SimpleNamespace(url=SimpleNamespace(query="complete=false"))
+
+        def counter(version, scopes):
+            return {
+                "version": version,
+                "updated_at": None,
+                "scopes": {
+                    scope: {"version": count, "updated_at": None}
+                    for scope, count in scopes.items()
+                },
+            }
+
+        for version, scopes in [
+            (1, {"first": 1}),
+            (2, {"first": 1, "second": 1}),
+            (3, {"first": 2, "second": 1}),
+        ]:
+            through = cache.read_through(
+                "a", "first", counter(version, scopes), request
+            )
+            asyncio.run(through(load))
+
+        assert load.calls == 2
+
+    def test_least_recently_used_evicted(self):
+        cache = ReadCache(MemoryCacheBackend(max_size=2))
+        load = CountingLoad({})
+
+        for key in ["1", "2", "1", "3", "1"]:
+            asyncio.run(cache.get_or_load("a", "list", key, load))
+
+        assert load.calls == 3
+        assert cache.stats()["evictions"] == 1
+
+    def test_expired_entry_is_a_miss(self):
+        cache = ReadCache(MemoryCacheBackend(ttl=0))
+        load = CountingLoad({})
+
+        asyncio.run(cache.get_or_load("a", "list", "1?", load))
+        asyncio.run(cache.get_or_load("a", "list", "1?", load))
+
+        assert load.calls == 2
+
+    def test_concurrent_loads_are_shared(self):
+        # Also without a backend
+        cache = ReadCache()
+        load = SlowLoad({"documents": [], "next": None})
+
+        async def run():
+            return await asyncio.gather(
+                *[cache.get_or_load("a", "list", "1?", load) for _ in range(5)]
+            )
+
+        values = asyncio.run(run())
+
+        assert load.calls == 1
+        assert all(value is values[0] for value in values)
+        assert cache.stats()["coalesced"] == 4
+
+    def test_unsettled_loads_are_not_shared(self):
+        cache = ReadCache(MemoryCacheBackend())
+        load = SlowLoad({})
+
+        async def run():
+            await asyncio.gather(
+                *[
+                    cache.get_or_load("a", "list", "1?", load, store=False)
+                    for _ in range(3)
+                ]
+            )
+
+        asyncio.run(run())
+
+        assert load.calls == 3
+
+    def test_cancelled_first_caller(self):
+        cache = ReadCache(MemoryCacheBackend())
+        first, second = SlowLoad({"from": "first"}), SlowLoad({"from": "second"})
+
+        async def run():
+            leading = asyncio.ensure_future(cache.get_or_load("a", "l", "1?", first))
+            await asyncio.sleep(0)
+            following = asyncio.ensure_future(cache.get_or_load("a", "l", "1?", second))
+            await asyncio.sleep(0.01)
+            leading.cancel()
+            return await following
+
+        # The other caller loads again with its own load
+        assert asyncio.run(run()) == {"from": "second"}
+        assert cache.stats()["coalesced"] == 0
+
+    def test_cancelled_second_caller(self):
+        cache = ReadCache(MemoryCacheBackend())
+        load = SlowLoad({})
+
+        async def run():
+            leading = asyncio.ensure_future(cache.get_or_load("a", "l", "1?", load))
+            await asyncio.sleep(0)
+            following = asyncio.ensure_future(cache.get_or_load("a", "l", "1?", load))
+            await asyncio.sleep(0.01)
+            following.cancel()
+            return await leading
+
+        assert asyncio.run(run()) == {}
+        assert load.calls == 1
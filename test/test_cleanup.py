@@ -0,0 +1,129 @@
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from datetime import datetime, timedelta
+import asyncio
+
+# Other
+from mongomock_motor import AsyncMongoMockClient
+import pytest
+
+# Module
+from main.cleanup import ListCleanup, expire_tombstones, start_list_deletion
+from main.dependencies.versions import changes_expired
+from main.repository import MemoryRepository
+
+# ----------------------------------------------------------------------------
+# Set-up
+# ----------------------------------------------------------------------------
+
+
+@pytest.fixture
+def repository():
+    return MemoryRepository(AsyncMongoMockClient(), "moshi")
+
+
+async def _add_list(repository, tasks=2):
+    await repository["lists"].insert_one({"_id": "l", "username": "a"})
+    await repository["tasks"].insert_many(
+        [
+            {"_id": "t" + str(index), "list_id": "l", "username": "a"}
+            for index in range(tasks)
+        ]
+    )
+
+
+async def _run(cleanup):
+    while await cleanup.run_once():
+        pass
+
+
+# ----------------------------------------------------------------------------
+# Tests
+# ----------------------------------------------------------------------------
+
+
+class TestListCleanup:
+    def test_deletes_the_tasks_of_a_deleted_list(self, repository):
+        async def run():
+            await _add_list(repository)
+            await start_list_deletion(repository, "a", "l")
+            await repository["lists"].delete_one({"_id": "l"})
+
+            await _run(ListCleanup(repository, batch_size=1))
+            return (
+                await repository["tasks"].count_documents({}),
+                await repository["deletions"].find_one({"_id": "l"}),
+            )
+
+        tasks, deletion = asyncio.run(run())
+
+        assert tasks == 0
+        assert deletion["status"] == "done"
+        assert deletion["deleted"] == 2
+
+    def test_waits_for_the_list_to_be_deleted(self, repository):
+        async def run():
+            await _add_list(repository)
+            await start_list_deletion(repository, "a", "l")
+
+            await _run(ListCleanup(repository, settle=60))
+            return (
+                await repository["tasks"].count_documents({}),
+                await repository["deletions"].find_one({"_id": "l"}),
+            )
+
+        tasks, deletion = asyncio.run(run())
+
+        assert tasks == 2
+        assert deletion["status"] == "pending"
+
+    def test_cancels_a_deletion_left_by_a_crash(self, repository):
+        async def run():
+            # The server stopped between recording the deletion and deleting
+            # the list
+            await _add_list(repository)
+            await start_list_deletion(repository, "a", "l")
+            await repository["deletions"].update_one(
+                {"_id": "l"},
+                {"$set": {"created_at": datetime.utcnow() - timedelta(minutes=5)}},
+            )
+
+            await _run(ListCleanup(repository, settle=60))
+            return (
+                await repository["tasks"].count_documents({}),
+                await repository["deletions"].count_documents({}),
+            )
+
+        tasks, deletions = asyncio.run(run())
+
+        assert tasks == 2
+        assert deletions == 0
+
+    def test_expired_tombstones_force_a_full_sync(self, repository):
+        async def run():
+            old = datetime.utcnow() - timedelta(days=31)
+            await repository["tombstones"].insert_many(
+                [
+                    {"_id": "t3", "username": "a", "version": 3, "updated_at": old},
+                    {"_id": "t5", "username": "a", "version": 5, "updated_at": old},
+                    {
+                        "_id": "t7",
+                        "username": "a",
+                        "version": 7,
+                        "updated_at": datetime.utcnow(),
+                    },
+                ]
+            )
+
+            removed = await expire_tombstones(repository, ttl_days=30, limit=10)
+            return removed, [
+                await changes_expired(repository, "a", since) for since in [0, 4, 5, 6]
+            ]
+
+        removed, expired = asyncio.run(run())
+
+        assert removed == 2
+        assert expired == [False, True, False, False]
@@ -0,0 +1,76 @@
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Module
+from main.server import app
+from test.memory import memory_client
+
+# ----------------------------------------------------------------------------
+# Set-up
+# ----------------------------------------------------------------------------
+
+
+def _create_task(client) -> dict:
+    list_id = client.post("/api/v1/lists", json={"name": "Groceries"}).json()["_id"]
+    response = client.post(
+        "/api/v1/tasks", json={"task": "Milk", "notes": "Oat", "list_id": list_id}
+    )
+    return response.json()
+
+
+def _version(client) -> int:
+    counter = client.portal.call(app.repository["versions"].find_one, {"_id": "a"})
+    return counter["version"]
+
+
+# ----------------------------------------------------------------------------
+# Tests
+# ----------------------------------------------------------------------------
+
+
+class TestUpdateTask:
+    def test_unchanged_update_writes_nothing(self, memory_client):
+        task = _create_task(memory_client)
+        version = _version(memory_client)
+
+        response = memory_client.put(
+            "/api/v1/tasks",
+            params={"_id": task["_id"]},
+            headers={"If-Match": '"' + str(task["version"]) + '"'},
+            json={"notes": "Oat"},
+        )
+
+        assert response.status_code == 200
+        assert response.headers["ETag"] == '"' + str(task["version"]) + '"'
+        assert _version(memory_client) == version
+
+    def test_changed_update_takes_a_version(self, memory_client):
+        task = _create_task(memory_client)
+        version = _version(memory_client)
+
+        response = memory_client.put(
+            "/api/v1/tasks", params={"_id": task["_id"]}, json={"notes": "Soy"}
+        )
+
+        assert response.status_code == 200
+        assert response.json()["notes"] == "Soy"
+        assert response.headers["ETag"] == '"' + str(version + 1) + '"'
+        assert _version(memory_client) == version + 1
+
+    def test_stale_if_match_writes_nothing(self, memory_client):
+        task = _create_task(memory_client)
+        memory_client.put(
+            "/api/v1/tasks", params={"_id": task["_id"]}, json={"notes": "Soy"}
+        )
+        version = _version(memory_client)
+
+        response = memory_client.put(
+            "/api/v1/tasks",
+            params={"_id": task["_id"]},
+            headers={"If-Match": '"' + str(task["version"]) + '"'},
+            json={"notes": "Rice"},
+        )
+
+        assert response.status_code == 412
+        assert _version(memory_client) == version
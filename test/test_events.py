@@ -0,0 +1,46 @@
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+import asyncio
+
+# Module
+from main.events import EventFeed
+
+# ----------------------------------------------------------------------------
+# Tests
+# ----------------------------------------------------------------------------
+
+
+class NoChangeStreams:
+    def watch(self, pipeline, **kwargs):
+        raise NotImplementedError("No change streams")
+
+
+class TestEventFeed:
+    def test_notify_wakes_the_users_streams(self):
+        feed = EventFeed(NoChangeStreams(), change_streams=False)
+
+        with feed.subscribe("a") as mine, feed.subscribe("b") as theirs:
+            feed.notify("a")
+
+            assert mine.is_set()
+            assert not theirs.is_set()
+            assert feed.subscribers() == 2
+
+        assert feed.subscribers() == 0
+
+    def test_stop_wakes_every_stream(self):
+        async def run():
+            feed = EventFeed(NoChangeStreams())
+            feed.start()
+            with feed.subscribe("a") as event:
+                await feed.stop()
+                return feed, event
+
+        feed, event = asyncio.run(run())
+
+        assert feed.closed
+        assert event.is_set()
+        assert not feed.watching
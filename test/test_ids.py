@@ -0,0 +1,58 @@
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from uuid import UUID, uuid4
+
+# Other
+import pytest
+
+# Module
+from main.config import config
+from main.dependencies.ids import after_id, match_id, match_ids, stored_id
+from main.dependencies.pagination import decode_cursor, encode_cursor
+
+# ----------------------------------------------------------------------------
+# Tests
+# ----------------------------------------------------------------------------
+
+
+@pytest.fixture
+def id_format(monkeypatch):
+    def set_format(value: str):
+        monkeypatch.setitem(config, "ID_FORMAT", value)
+
+    return set_format
+
+
+class TestIds:
+    def test_string_ids(self, id_format):
+        id_format("string")
+        _id = uuid4()
+
+        assert stored_id(_id) == str(_id)
+        assert match_id(_id) == str(_id)
+        assert after_id(_id) == {"_id": {"$gt": str(_id)}}
+
+    def test_uuid_ids(self, id_format):
+        id_format("uuid")
+        _id = uuid4()
+
+        assert stored_id(str(_id)) == _id
+        assert match_ids([str(_id)]) == {"$in": [_id]}
+
+    def test_mixed_ids_match_both_forms(self, id_format):
+        id_format("mixed")
+        _id = uuid4()
+
+        assert match_id(_id) == {"$in": [_id, str(_id)]}
+        assert "$or" in after_id(str(_id))
+        assert after_id(_id) == {"_id": {"$gt": _id}}
+
+    def test_cursor_keeps_id_type(self):
+        _id = uuid4()
+
+        assert decode_cursor(encode_cursor(_id)) == _id
+        assert isinstance(decode_cursor(encode_cursor(_id)), UUID)
+        assert decode_cursor(encode_cursor(str(_id))) == str(_id)
@@ -0,0 +1,103 @@
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from typing import Dict
+
+# Other
+import pytest
+
+# Module
+from main.dependencies.jwks import JWKSCache, JWKSUnavailable
+
+# ----------------------------------------------------------------------------
+# Set-up
+# ----------------------------------------------------------------------------
+
+
+class CountingSource:
+    """Key source which records how many times it was fetched"""
+
+    def __init__(self, jwks: Dict):
+        self.jwks = jwks
+        self.calls = 0
+        self.fail = False
+
+    def __call__(self) -> Dict:
+        self.calls += 1
+        if self.fail:
+            raise OSError("JWKS endpoint is down")
+        return self.jwks
+
+
+def make_jwks(*kids: str) -> Dict:
+    return {"keys": [{"kid": kid, "kty": "RSA", "use": "sig"} for kid in kids]}
+
+
+# ----------------------------------------------------------------------------
+# Tests
+# ----------------------------------------------------------------------------
+
+
+class TestJWKSCache:
+    def test_keys_are_cached(self):
+        source = CountingSource(make_jwks("a"))
+        cache = JWKSCache(source=source)
+
+        for _ in range(5):
+            assert cache.get_key("a")["kid"] == "a"
+
+        assert source.calls == 1
+
+    def test_unknown_kid_refresh_is_rate_limited(self):
+        source = CountingSource(make_jwks("a"))
+        cache = JWKSCache(source=source, min_refresh_interval=60)
+
+        cache.get_key("a")
+        for _ in range(5):
+            assert cache.get_key("bad") is None
+
+        assert source.calls == 1
+
+    def test_unknown_kid_picks_up_rotated_key(self):
+        source = CountingSource(make_jwks("a"))
+        cache = JWKSCache(source=source, min_refresh_interval=0)
+
+        cache.get_key("a")
+        source.jwks = make_jwks("b")
+
+        assert cache.get_key("b")["kid"] == "b"
+        assert source.calls == 2
+
+    def test_stale_keys_served_when_refresh_fails(self):
+        source = CountingSource(make_jwks("a"))
+        cache = JWKSCache(source=source, min_refresh_interval=0)
+
+        cache.get_key("a")
+        source.fail = True
+
+        assert not cache.refresh()
+        assert cache.get_key("a")["kid"] == "a"
+
+    def test_unavailable_when_never_loaded(self):
+        source = CountingSource(make_jwks("a"))
+        source.fail = True
+        cache = JWKSCache(source=source)
+
+        with pytest.raises(JWKSUnavailable):
+            cache.get_key("a")
+
+    def test_listeners_called_on_rotation(self):
+        source = CountingSource(make_jwks("a"))
+        cache = JWKSCache(source=source, min_refresh_interval=0)
+        rotations = []
+        cache.add_listener(lambda: rotations.append(True))
+
+        cache.get_key("a")
+        cache.refresh()
+        assert not rotations
+
+        source.jwks = make_jwks("b")
+        cache.refresh()
+        assert len(rotations) == 1
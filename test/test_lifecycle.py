@@ -0,0 +1,38 @@
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+import asyncio
+
+# Module
+from main.lifecycle import Lifecycle
+
+# ----------------------------------------------------------------------------
+# Tests
+# ----------------------------------------------------------------------------
+
+
+class TestLifecycle:
+    def test_drain_stops_reporting_ready_straight_away(self):
+        async def run():
+            lifecycle = Lifecycle()
+            draining = asyncio.ensure_future(lifecycle.drain(delay=0.05))
+            await asyncio.sleep(0)
+            started = lifecycle.draining
+            done = draining.done()
+            await draining
+            return started, done
+
+        started, done = asyncio.run(run())
+
+        assert started
+        assert not done
+
+    def test_counts_requests_in_flight(self):
+        lifecycle = Lifecycle()
+        lifecycle.request_started()
+        lifecycle.request_started()
+        lifecycle.request_finished()
+
+        assert lifecycle.in_flight == 1
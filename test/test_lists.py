@@ -2,6 +2,9 @@
 # Imports
 # ----------------------------------------------------------------------------
 
+# Core
+import time
+
 # Fast
 from fastapi.testclient import TestClient
 from fastapi.encoders import jsonable_encoder
@@ -12,6 +15,7 @@ from asgi_lifespan import LifespanManager
 from uuid import UUID
 
 # Module
+from main.config import config
 from main.server import app
 from main.dependencies.models import TaskList, TaskListInDB
 from test.dependencies import create_access_token, test_user
@@ -54,6 +58,44 @@ class TestLists:
                 global TASK_LIST_ID
                 TASK_LIST_ID = response_task_list.id
 
+    @pytest.mark.asyncio
+    async def test_get_task_lists_not_modified(self, create_access_token):
+        headers = {"Authorization": "Bearer " + create_access_token}
+
+        # Writes are never treated as finished within the settle window
+        time.sleep(config["SYNC_SETTLE_SECONDS"])
+
+        async with LifespanManager(app):
+            with TestClient(app) as client:
+                response = client.get("/api/v1/lists", headers=headers)
+
+                assert response.status_code == 200
+                assert "ETag" in response.headers
+
+                response = client.get(
+                    "/api/v1/lists",
+                    headers={**headers, "If-None-Match": response.headers["ETag"]},
+                )
+
+                assert response.status_code == 304
+
+    @pytest.mark.asyncio
+    async def test_get_task_list_overview(self, create_access_token):
+        async with LifespanManager(app):
+            with TestClient(app) as client:
+                response = client.get(
+                    "/api/v1/lists/overview",
+                    headers={"Authorization": "Bearer " + create_access_token},
+                )
+
+                assert response.status_code == 200
+
+                overview = {
+                    task_list["_id"]: task_list for task_list in response.json()
+                }
+                assert overview[str(TASK_LIST_ID)]["total"] == 0
+                assert overview[str(TASK_LIST_ID)]["incomplete"] == 0
+
     @pytest.mark.asyncio
     async def test_delete_task_list(self, create_access_token):
         async with LifespanManager(app):
@@ -65,3 +107,17 @@ class TestLists:
                 )
 
                 assert response.status_code == 200
+
+    @pytest.mark.asyncio
+    async def test_get_list_deletions(self, create_access_token):
+        async with LifespanManager(app):
+            with TestClient(app) as client:
+                response = client.get(
+                    "/api/v1/lists/deletions",
+                    headers={"Authorization": "Bearer " + create_access_token},
+                )
+
+                assert response.status_code == 200
+                assert str(TASK_LIST_ID) in [
+                    deletion["_id"] for deletion in response.json()
+                ]
@@ -0,0 +1,75 @@
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from types import SimpleNamespace
+
+# Module
+from main.metrics import (
+    MongoCommandListener,
+    WRITES_SKIPPED,
+    current_trace,
+    parse_traceparent,
+    registry,
+    span,
+    total,
+)
+
+# ----------------------------------------------------------------------------
+# Tests
+# ----------------------------------------------------------------------------
+
+
+class TestMetrics:
+    def test_total_sums_every_route(self):
+        before = total(WRITES_SKIPPED)
+        WRITES_SKIPPED.labels(route="/a").inc()
+        WRITES_SKIPPED.labels(route="/b").inc(2)
+
+        assert total(WRITES_SKIPPED) == before + 3
+
+    def test_traceparent(self):
+        context = parse_traceparent(
+            "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+        )
+
+        assert context.trace_id == "4bf92f3577b34da6a3ce929d0e0e4736"
+        assert parse_traceparent("not a traceparent") is None
+        assert parse_traceparent("00-" + "0" * 32 + "-00f067aa0ba902b7-01") is None
+
+    def test_span_is_a_child_of_the_current_trace(self):
+        parent = parse_traceparent(
+            "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+        )
+        token = current_trace.set(parent)
+        try:
+            with span("test") as child:
+                assert current_trace.get() is child
+            assert child.trace_id == parent.trace_id
+            assert child.span_id != parent.span_id
+            assert current_trace.get() is parent
+        finally:
+            current_trace.reset(token)
+
+    def test_command_listener_counts_documents(self):
+        listener = MongoCommandListener()
+        event = SimpleNamespace(
+            connection_id=("localhost", 27017),
+            request_id=1,
+            command_name="find",
+            command={"find": "tasks"},
+            duration_micros=1500,
+            reply={"cursor": {"firstBatch": [{}, {}, {}]}},
+        )
+
+        labels = {"collection": "tasks", "command": "find"}
+        before = registry.get_sample_value(
+            "moshi_mongo_command_documents_total", labels
+        )
+
+        listener.started(event)
+        listener.succeeded(event)
+
+        after = registry.get_sample_value("moshi_mongo_command_documents_total", labels)
+        assert after == (before or 0) + 3
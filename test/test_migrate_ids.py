@@ -0,0 +1,112 @@
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+from uuid import uuid4
+
+# Other
+import pytest
+import pytest_asyncio
+
+# Module
+from main.config import config
+from main.database import create_client
+from main.dependencies.ids import match_id
+from main.migrate_ids import COLLECTIONS, migrate_ids
+
+# ----------------------------------------------------------------------------
+# Set-up
+# ----------------------------------------------------------------------------
+
+
+@pytest_asyncio.fixture
+async def database(monkeypatch):
+    # A scratch database on the configured server, transactions need a
+    # replica set such as Atlas
+    monkeypatch.setitem(config, "ID_FORMAT", "mixed")
+    client = create_client(config)
+    name = config["DB_NAME"] + "_migrate_ids"
+
+    yield client[name]
+
+    await client.drop_database(name)
+    client.close()
+
+
+class _Interrupted:
+    """Wraps a database so `between` runs once each copy is written, before
+    the migration commits"""
+
+    def __init__(self, database, between):
+        self.database = database
+        self.between = between
+
+    def __getattr__(self, name):
+        return getattr(self.database, name)
+
+    def __getitem__(self, name):
+        return _InterruptedCollection(self.database[name], self.between)
+
+
+class _InterruptedCollection:
+    def __init__(self, collection, between):
+        self.collection = collection
+        self.between = between
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    async def insert_one(self, document, **kwargs):
+        result = await self.collection.insert_one(document, **kwargs)
+        await self.between(document["_id"])
+        return result
+
+
+# ----------------------------------------------------------------------------
+# Tests
+# ----------------------------------------------------------------------------
+
+
+class TestMigrateIds:
+    def test_every_collection_keyed_by_ids(self):
+        # Each collection whose _id is written with stored_id
+        assert set(COLLECTIONS) == {"tasks", "lists", "tombstones", "deletions"}
+        assert COLLECTIONS["deletions"] == []
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_reads_never_see_both_forms(self, database):
+        _id = uuid4()
+        await database["lists"].insert_one(
+            {"_id": str(_id), "name": "Groceries", "version": 1}
+        )
+
+        seen = []
+
+        async def read(new_id):
+            # What the app reads while the document is being swapped
+            seen.append(
+                await database["lists"].count_documents({"_id": match_id(new_id)})
+            )
+
+        result = await migrate_ids(_Interrupted(database, read), "lists")
+
+        assert result == {"converted": 1, "skipped": 0}
+        assert seen == [1]
+        assert await database["lists"].count_documents({"_id": match_id(_id)}) == 1
+
+    @pytest.mark.integration
+    @pytest.mark.asyncio
+    async def test_deletes_match_both_forms(self, database):
+        _id = uuid4()
+        list_id = uuid4()
+        await database["tasks"].insert_one(
+            {"_id": str(_id), "list_id": str(list_id), "version": 1}
+        )
+
+        await migrate_ids(database, "tasks")
+        result = await database["tasks"].delete_one({"_id": match_id(str(_id))})
+
+        assert result.deleted_count == 1
+        assert await database["tasks"].count_documents({}) == 0
@@ -0,0 +1,60 @@
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+import random
+import re
+
+# Other
+import pytest
+
+# Module
+from main.dependencies.ranks import (
+    RANK_PATTERN,
+    evenly_spaced,
+    rank_between,
+)
+
+# ----------------------------------------------------------------------------
+# Tests
+# ----------------------------------------------------------------------------
+
+
+class TestRanks:
+    def test_appending_and_prepending(self):
+        keys = [rank_between(None, None)]
+        for _ in range(100):
+            keys.append(rank_between(keys[-1], None))
+            keys.insert(0, rank_between(None, keys[0]))
+
+        assert keys == sorted(keys)
+        assert len(set(keys)) == len(keys)
+        assert max(len(key) for key in keys) <= 5
+
+    def test_keys_between_stay_valid(self):
+        rng = random.Random(0)
+        keys = [rank_between(None, None)]
+        for _ in range(500):
+            i = rng.randrange(len(keys) + 1)
+            before = keys[i - 1] if i > 0 else None
+            after = keys[i] if i < len(keys) else None
+            key = rank_between(before, after)
+
+            assert re.match(RANK_PATTERN, key)
+            keys.insert(i, key)
+
+        assert keys == sorted(keys)
+        assert len(set(keys)) == len(keys)
+
+    def test_evenly_spaced(self):
+        keys = evenly_spaced(1000)
+
+        assert keys == sorted(keys)
+        assert len(set(keys)) == 1000
+        assert all(re.match(RANK_PATTERN, key) for key in keys)
+        assert max(len(key) for key in keys) == 2
+
+    def test_out_of_order(self):
+        with pytest.raises(ValueError):
+            rank_between("b", "a")
@@ -0,0 +1,130 @@
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+import asyncio
+
+# Other
+from mongomock_motor import AsyncMongoMockClient
+import pytest
+
+# Module
+from main.dependencies.ranks import rank_between
+from main.events import EventFeed
+from main.rebalance import (
+    ListRebalancer,
+    ListReordering,
+    reorder_fence,
+    without_reorders,
+)
+from main.repository import MemoryRepository
+
+# ----------------------------------------------------------------------------
+# Set-up
+# ----------------------------------------------------------------------------
+
+
+class NoChangeStreams:
+    def watch(self, pipeline, **kwargs):
+        raise NotImplementedError("No change streams")
+
+
+@pytest.fixture
+def repository():
+    return MemoryRepository(AsyncMongoMockClient(), "moshi")
+
+
+async def _add_tasks(repository, positions):
+    await repository["versions"].insert_one({"_id": "a", "version": 0})
+    await repository["tasks"].insert_many(
+        [
+            {
+                "_id": name,
+                "list_id": "l",
+                "username": "a",
+                "complete": False,
+                "position": position,
+            }
+            for name, position in positions.items()
+        ]
+    )
+
+
+async def _order(repository):
+    return [
+        task["_id"]
+        async for task in repository["tasks"]
+        .find(filter={"list_id": "l"})
+        .sort([("position", 1), ("_id", 1)])
+    ]
+
+
+# ----------------------------------------------------------------------------
+# Tests
+# ----------------------------------------------------------------------------
+
+
+class TestRebalance:
+    def test_keeps_the_order(self, repository):
+        async def run():
+            await _add_tasks(repository, {"t1": "V", "t2": "VVVVV1", "t3": "W"})
+            rebalancer = ListRebalancer(repository, EventFeed(NoChangeStreams()))
+
+            rewritten = await rebalancer.rebalance("a", "l")
+            return rewritten, await _order(repository)
+
+        rewritten, order = asyncio.run(run())
+
+        assert rewritten == 3
+        assert order == ["t1", "t2", "t3"]
+
+    def test_move_overlapping_a_rebalance_is_placed_again(self, repository):
+        async def run():
+            await _add_tasks(repository, {"t1": "1", "t2": "2", "t3": "3", "t4": "4"})
+            rebalancer = ListRebalancer(repository, EventFeed(NoChangeStreams()))
+            runs = 0
+
+            async def place():
+                # Moves t4 after t1 from the keys read before the rebalance
+                nonlocal runs
+                runs += 1
+                tasks = repository["tasks"]
+                before = (await tasks.find_one({"_id": "t1"}))["position"]
+                after = (await tasks.find_one({"_id": "t2"}))["position"]
+                if runs == 1:
+                    await rebalancer.rebalance("a", "l")
+                await tasks.update_one(
+                    {"_id": "t4"}, {"$set": {"position": rank_between(before, after)}}
+                )
+
+            await without_reorders(repository, "a", place)
+            return runs, await _order(repository)
+
+        runs, order = asyncio.run(run())
+
+        assert runs == 2
+        assert order == ["t1", "t4", "t2", "t3"]
+
+    def test_moves_wait_for_a_running_rebalance(self, repository):
+        async def run():
+            await _add_tasks(repository, {"t1": "1"})
+            rebalancer = ListRebalancer(repository, EventFeed(NoChangeStreams()))
+            lease = await rebalancer._start_reordering("a")
+
+            async def place():
+                raise AssertionError("Placed during a rebalance")
+
+            with pytest.raises(ListReordering):
+                await without_reorders(repository, "a", place, attempts=2, wait=0)
+
+            running = await reorder_fence(repository, "a")
+            await repository["reorders"].update_one(
+                {"_id": "a"}, {"$pull": {"leases": {"_id": lease}}}
+            )
+            return running, await reorder_fence(repository, "a")
+
+        running, fence = asyncio.run(run())
+
+        assert running is None
+        assert fence == 1
@@ -0,0 +1,45 @@
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Other
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_concern import ReadConcern
+import pytest
+
+# Module
+from main.repository import Repository
+
+# ----------------------------------------------------------------------------
+# Tests
+# ----------------------------------------------------------------------------
+
+
+@pytest.fixture
+def client():
+    # Connects lazily so no server is needed
+    client = AsyncIOMotorClient("mongodb://localhost:27017")
+    yield client
+    client.close()
+
+
+class TestRepository:
+    def test_primary_reads_are_not_routed(self, client):
+        repository = Repository(client, "moshi")
+
+        assert repository.reads("tasks").read_preference.mode == 0
+        assert repository["tasks"].name == "tasks"
+
+    def test_secondary_reads_use_majority(self, client):
+        repository = Repository(client, "moshi", read_preference="secondaryPreferred")
+
+        assert (
+            repository.reads("tasks").read_preference.mongos_mode
+            == "secondaryPreferred"
+        )
+        assert repository.reads("tasks").read_concern == ReadConcern("majority")
+        assert repository["tasks"].read_preference.mongos_mode == "primary"
+
+    def test_unknown_read_preference(self, client):
+        with pytest.raises(ValueError):
+            Repository(client, "moshi", read_preference="closest")
@@ -0,0 +1,136 @@
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+import asyncio
+import signal
+
+# Other
+import httpx
+import pytest
+import uvicorn
+
+# Module
+from main.config import config
+from main.dependencies.models import User
+from main.dependencies.user import get_current_user
+from main.serve import DrainingServer
+from main.server import app, drain
+
+# ----------------------------------------------------------------------------
+# Set-up
+# ----------------------------------------------------------------------------
+
+
+class Server(DrainingServer):
+    # Signals are sent by the tests, not the terminal
+    def install_signal_handlers(self) -> None:
+        pass
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    for key, value in {
+        "DB_BACKEND": "memory",
+        "ID_FORMAT": "string",
+        "CREATE_INDEXES": False,
+        "WARMUP_CONNECTIONS": 0,
+        "WARMUP_TIMEOUT_SECONDS": 0.1,
+        "SHUTDOWN_DRAIN_SECONDS": 0.5,
+    }.items():
+        monkeypatch.setitem(config, key, value)
+
+    app.dependency_overrides[get_current_user] = lambda: User(username="a")
+    yield
+    app.dependency_overrides.clear()
+
+
+async def _start() -> tuple:
+    server = Server(
+        uvicorn.Config(app, port=0, log_level="warning", lifespan="on"), drain=drain
+    )
+    serving = asyncio.ensure_future(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, serving, "http://127.0.0.1:" + str(port)
+
+
+# ----------------------------------------------------------------------------
+# Tests
+# ----------------------------------------------------------------------------
+
+
+class TestServe:
+    def test_not_ready_while_still_serving(self, settings):
+        async def run():
+            server, serving, url = await _start()
+
+            server.handle_exit(signal.SIGTERM, None)
+            async with httpx.AsyncClient(base_url=url) as client:
+                response = await client.get("/readyz")
+            exiting = server.should_exit
+
+            await asyncio.wait_for(serving, timeout=5)
+            return response, exiting
+
+        response, exiting = asyncio.run(run())
+
+        assert response.status_code == 503
+        assert response.json() == {"status": "draining"}
+        assert not exiting
+
+    def test_second_signal_stops_straight_away(self, settings):
+        async def run():
+            server, serving, _ = await _start()
+
+            server.handle_exit(signal.SIGTERM, None)
+            server.handle_exit(signal.SIGTERM, None)
+            exiting = server.should_exit
+
+            await asyncio.wait_for(serving, timeout=5)
+            return exiting
+
+        assert asyncio.run(run())
+
+    def test_stop_ends_open_streams(self, settings):
+        async def run():
+            server, serving, url = await _start()
+
+            async with httpx.AsyncClient(base_url=url, timeout=5) as client:
+                async with client.stream("GET", "/api/v1/events") as response:
+                    chunks = response.aiter_text()
+                    first = await chunks.__anext__()
+
+                    server.handle_exit(signal.SIGTERM, None)
+                    rest = [chunk async for chunk in chunks]
+                    exiting = server.should_exit
+
+            await asyncio.wait_for(serving, timeout=5)
+            return first, rest, exiting
+
+        first, rest, exiting = asyncio.run(run())
+
+        assert first.startswith("retry:")
+        assert rest == []
+        # Ended before the drain delay was over
+        assert not exiting
+
+    def test_streams_end_after_a_while(self, settings, monkeypatch):
+        monkeypatch.setitem(config, "EVENTS_MAX_STREAM_SECONDS", 0.2)
+
+        async def run():
+            server, serving, url = await _start()
+
+            async with httpx.AsyncClient(base_url=url, timeout=5) as client:
+                response = await client.get("/api/v1/events")
+
+            server.handle_exit(signal.SIGTERM, None)
+            await asyncio.wait_for(serving, timeout=5)
+            return response
+
+        response = asyncio.run(run())
+
+        assert response.status_code == 200
+        assert response.text.startswith("retry:")
@@ -0,0 +1,34 @@
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Fast
+from fastapi.encoders import jsonable_encoder
+
+# Module
+from main.dependencies.models import SyncResponse, TaskList, TaskListInDB
+from test.memory import memory_client
+
+# ----------------------------------------------------------------------------
+# Tests
+# ----------------------------------------------------------------------------
+
+
+class TestSync:
+    def test_sync_create_and_delete(self, memory_client):
+        response = memory_client.get("/api/v1/sync")
+        assert response.status_code == 200
+        since = SyncResponse(**response.json()).version
+
+        response = memory_client.post(
+            "/api/v1/lists", json=jsonable_encoder(TaskList(name="Sync list"))
+        )
+        task_list = TaskListInDB(**response.json())
+        memory_client.delete("/api/v1/lists", params={"_id": task_list.id})
+
+        response = memory_client.get("/api/v1/sync", params={"since": since})
+        assert response.status_code == 200
+
+        changes = SyncResponse(**response.json())
+        assert changes.version > since
+        assert [tombstone.id for tombstone in changes.deleted] == [task_list.id]
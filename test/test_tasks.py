@@ -88,6 +88,69 @@ class TestTasks:
                 assert response_task.id.version == 4
 
                 context["task_id"] = response_task.id
+                context["list_id"] = task_list_id
+
+    @pytest.mark.asyncio
+    async def test_read_tasks_page(self, create_access_token, context):
+        async with LifespanManager(app):
+            with TestClient(app) as client:
+                response = client.get(
+                    "/api/v1/tasks",
+                    params={
+                        "list_id": context["list_id"],
+                        "complete": False,
+                        "limit": 1,
+                        "fields": "task",
+                    },
+                    headers={"Authorization": "Bearer " + create_access_token},
+                )
+
+                assert response.status_code == 200
+                assert response.json() == [
+                    {"_id": str(context["task_id"]), "task": "Water the plants"}
+                ]
+                assert "X-Next-Cursor" not in response.headers
+
+    @pytest.mark.asyncio
+    async def test_search_tasks(self, create_access_token, context):
+        async with LifespanManager(app):
+            with TestClient(app) as client:
+                response = client.get(
+                    "/api/v1/tasks/search",
+                    params={"q": "plant", "list_id": context["list_id"]},
+                    headers={"Authorization": "Bearer " + create_access_token},
+                )
+
+                assert response.status_code == 200
+                assert [task["_id"] for task in response.json()] == [
+                    str(context["task_id"])
+                ]
+                assert response.json()[0]["score"] > 0
+
+    @pytest.mark.asyncio
+    async def test_move_task(self, create_access_token, context):
+        async with LifespanManager(app):
+            with TestClient(app) as client:
+                response = client.post(
+                    "/api/v1/tasks:move",
+                    headers={"Authorization": "Bearer " + create_access_token},
+                    json={"_id": str(context["task_id"]), "after": None},
+                )
+
+                assert response.status_code == 200
+                assert response.json()["position"] is not None
+
+                response = client.get(
+                    "/api/v1/tasks",
+                    params={
+                        "list_id": context["list_id"],
+                        "complete": False,
+                        "sort": "position",
+                    },
+                    headers={"Authorization": "Bearer " + create_access_token},
+                )
+
+                assert response.json()[0]["_id"] == str(context["task_id"])
 
     @pytest.mark.asyncio
     async def test_update_task_complete(self, create_access_token, context):
@@ -146,6 +209,63 @@ class TestTasks:
                 response_task = TaskInDB(**response.json())
                 assert response_task.notes == "These notes are better :)"
 
+    @pytest.mark.asyncio
+    async def test_update_task_unchanged(self, create_access_token, context):
+        headers = {"Authorization": "Bearer " + create_access_token}
+        updated_task = TaskUpdate(notes="These notes are better :)")
+
+        async with LifespanManager(app):
+            with TestClient(app) as client:
+                response = client.put(
+                    "/api/v1/tasks",
+                    params={"_id": context["task_id"]},
+                    headers=headers,
+                    json=jsonable_encoder(updated_task),
+                )
+                etag = response.headers["ETag"]
+
+                # Nothing changed so nothing was written
+                response = client.put(
+                    "/api/v1/tasks",
+                    params={"_id": context["task_id"]},
+                    headers={**headers, "If-Match": etag},
+                    json=jsonable_encoder(updated_task),
+                )
+
+                assert response.status_code == 200
+                assert response.headers["ETag"] == etag
+
+    @pytest.mark.asyncio
+    async def test_update_task_if_match(self, create_access_token, context):
+        headers = {"Authorization": "Bearer " + create_access_token}
+
+        async with LifespanManager(app):
+            with TestClient(app) as client:
+                response = client.put(
+                    "/api/v1/tasks",
+                    params={"_id": context["task_id"]},
+                    headers=headers,
+                    json={"notes": "Written first"},
+                )
+                etag = response.headers["ETag"]
+
+                response = client.put(
+                    "/api/v1/tasks",
+                    params={"_id": context["task_id"]},
+                    headers=headers,
+                    json={"notes": "Written second"},
+                )
+
+                # The client's copy is out of date
+                response = client.put(
+                    "/api/v1/tasks",
+                    params={"_id": context["task_id"]},
+                    headers={**headers, "If-Match": etag},
+                    json={"notes": "Written third"},
+                )
+
+                assert response.status_code == 412
+
     @pytest.mark.asyncio
     async def test_delete_task(self, create_access_token, context):
         async with LifespanManager(app):
@@ -157,3 +277,15 @@ class TestTasks:
                 )
 
                 assert response.status_code == 200
+
+    @pytest.mark.asyncio
+    async def test_delete_task_missing(self, create_access_token, context):
+        async with LifespanManager(app):
+            with TestClient(app) as client:
+                response = client.delete(
+                    "/api/v1/tasks",
+                    params={"_id": context["task_id"]},
+                    headers={"Authorization": "Bearer " + create_access_token},
+                )
+
+                assert response.status_code == 400
@@ -0,0 +1,50 @@
+# ----------------------------------------------------------------------------
+# Imports
+# ----------------------------------------------------------------------------
+
+# Core
+import time
+
+# Module
+from main.dependencies.models import User
+from main.dependencies.token_cache import TokenCache
+
+# ----------------------------------------------------------------------------
+# Tests
+# ----------------------------------------------------------------------------
+
+
+class TestTokenCache:
+    def test_hit_after_put(self):
+        cache = TokenCache()
+        cache.put("token", User(username="a"), {"exp": time.time() + 60})
+
+        user, _ = cache.get("token")
+        assert user.username == "a"
+        assert cache.stats()["hits"] == 1
+
+    def test_expired_entry_is_a_miss(self):
+        cache = TokenCache()
+        cache.put("token", User(username="a"), {"exp": time.time() - 1})
+
+        assert cache.get("token") is None
+        assert cache.stats()["misses"] == 1
+
+    def test_least_recently_used_is_evicted(self):
+        cache = TokenCache(max_size=2)
+        claims = {"exp": time.time() + 60}
+        cache.put("a", User(username="a"), claims)
+        cache.put("b", User(username="b"), claims)
+        cache.get("a")
+        cache.put("c", User(username="c"), claims)
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.stats()["evictions"] == 1
+
+    def test_clear(self):
+        cache = TokenCache()
+        cache.put("token", User(username="a"), {"exp": time.time() + 60})
+        cache.clear()
+
+        assert cache.get("token") is None